@@ -0,0 +1,51 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.db.models import Base
+from app.db.session import create_db_engine
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL without connecting to the database."""
+    from app.core.config import settings
+
+    context.configure(
+        url=settings.DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    """Run the migrations against the configured database."""
+    connectable = config.attributes.get("connection") or create_db_engine()
+
+    def run(connection) -> None:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite cannot ALTER most constraints in place
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+    if hasattr(connectable, "connect"):
+        with connectable.connect() as connection:
+            run(connection)
+    else:
+        run(connectable)
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
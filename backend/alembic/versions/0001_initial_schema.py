@@ -0,0 +1,101 @@
+"""Initial schema
+
+Creates any missing tables and adds the columns that used to be added by the
+ad-hoc scripts in migrations/, so both fresh databases and databases created
+by Base.metadata.create_all can be upgraded from here.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if "users" not in tables:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("email", sa.String()),
+            sa.Column("hashed_password", sa.String()),
+            sa.Column("is_active", sa.Boolean()),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if "documents" not in tables:
+        op.create_table(
+            "documents",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("filename", sa.String()),
+            sa.Column("file_path", sa.String()),
+            sa.Column("content_type", sa.String()),
+            sa.Column("size", sa.Integer()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("processed", sa.Boolean()),
+            sa.Column("processing_progress", sa.Integer(), server_default="0"),
+            sa.Column("processing_status", sa.String(), server_default="pending"),
+            sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id")),
+        )
+        op.create_index("ix_documents_id", "documents", ["id"])
+        op.create_index("ix_documents_filename", "documents", ["filename"])
+    else:
+        columns = {column["name"] for column in inspector.get_columns("documents")}
+        if "processing_progress" not in columns:
+            op.add_column("documents", sa.Column("processing_progress", sa.Integer(), server_default="0"))
+        if "processing_status" not in columns:
+            op.add_column("documents", sa.Column("processing_status", sa.String(), server_default="pending"))
+
+    if "document_chunks" not in tables:
+        op.create_table(
+            "document_chunks",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("chunk_id", sa.String()),
+            sa.Column("content", sa.Text()),
+            sa.Column("page_number", sa.Integer(), nullable=True),
+            sa.Column("section", sa.String(), nullable=True),
+            sa.Column("document_id", sa.Integer(), sa.ForeignKey("documents.id")),
+        )
+        op.create_index("ix_document_chunks_id", "document_chunks", ["id"])
+        op.create_index("ix_document_chunks_chunk_id", "document_chunks", ["chunk_id"])
+
+    if "queries" not in tables:
+        op.create_table(
+            "queries",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("query_text", sa.Text()),
+            sa.Column("response", sa.Text()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("session_id", sa.String(), nullable=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        )
+        op.create_index("ix_queries_id", "queries", ["id"])
+        op.create_index("ix_queries_session_id", "queries", ["session_id"])
+    elif "session_id" not in {column["name"] for column in inspector.get_columns("queries")}:
+        op.add_column("queries", sa.Column("session_id", sa.String(), nullable=True))
+        op.create_index("ix_queries_session_id", "queries", ["session_id"])
+
+    if "query_sources" not in tables:
+        op.create_table(
+            "query_sources",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("chunk_id", sa.String()),
+            sa.Column("document_id", sa.Integer(), sa.ForeignKey("documents.id")),
+            sa.Column("query_id", sa.Integer(), sa.ForeignKey("queries.id")),
+        )
+        op.create_index("ix_query_sources_id", "query_sources", ["id"])
+
+def downgrade() -> None:
+    op.drop_table("query_sources")
+    op.drop_table("queries")
+    op.drop_table("document_chunks")
+    op.drop_table("documents")
+    op.drop_table("users")
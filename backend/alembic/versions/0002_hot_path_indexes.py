@@ -0,0 +1,43 @@
+"""Add indexes for the hot list and lookup filters
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # GET /documents/ and GET /queries/: owner filter plus (created_at, id) keyset order
+    op.create_index(
+        "ix_documents_owner_id_created_at_id", "documents",
+        ["owner_id", "created_at", "id"], if_not_exists=True
+    )
+    op.create_index(
+        "ix_queries_user_id_created_at_id", "queries",
+        ["user_id", "created_at", "id"], if_not_exists=True
+    )
+    # Chunk and source lookups by parent
+    op.create_index(
+        "ix_document_chunks_document_id", "document_chunks",
+        ["document_id"], if_not_exists=True
+    )
+    op.create_index(
+        "ix_query_sources_query_id", "query_sources",
+        ["query_id"], if_not_exists=True
+    )
+    op.create_index(
+        "ix_query_sources_document_id", "query_sources",
+        ["document_id"], if_not_exists=True
+    )
+
+def downgrade() -> None:
+    op.drop_index("ix_query_sources_document_id", table_name="query_sources")
+    op.drop_index("ix_query_sources_query_id", table_name="query_sources")
+    op.drop_index("ix_document_chunks_document_id", table_name="document_chunks")
+    op.drop_index("ix_queries_user_id_created_at_id", table_name="queries")
+    op.drop_index("ix_documents_owner_id_created_at_id", table_name="documents")
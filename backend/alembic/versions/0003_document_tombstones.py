@@ -0,0 +1,25 @@
+"""Add document tombstones for asynchronous deletion
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # The column already exists on databases created by Base.metadata.create_all
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("documents")}
+    if "deleted_at" not in columns:
+        op.add_column("documents", sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True))
+    op.create_index("ix_documents_deleted_at", "documents", ["deleted_at"], if_not_exists=True)
+
+def downgrade() -> None:
+    op.drop_index("ix_documents_deleted_at", table_name="documents")
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.drop_column("deleted_at")
@@ -0,0 +1,76 @@
+"""Store chunk text zstd-compressed in a single column
+
+Moves document_chunks.content into the compressed content_zstd column, which
+becomes the only copy of the chunk text.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.types import compress_text
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    columns = {column["name"] for column in sa.inspect(bind).get_columns("document_chunks")}
+
+    if "content_zstd" not in columns:
+        op.add_column("document_chunks", sa.Column("content_zstd", sa.LargeBinary(), nullable=True))
+
+    if "content" in columns:
+        chunks = sa.table(
+            "document_chunks",
+            sa.column("id", sa.Integer),
+            sa.column("content", sa.Text),
+            sa.column("content_zstd", sa.LargeBinary),
+        )
+        last_id = 0
+        while True:
+            rows = bind.execute(
+                sa.select(chunks.c.id, chunks.c.content)
+                .where(chunks.c.id > last_id, chunks.c.content.isnot(None))
+                .order_by(chunks.c.id)
+                .limit(BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            for row in rows:
+                bind.execute(
+                    chunks.update()
+                    .where(chunks.c.id == row.id)
+                    .values(content_zstd=compress_text(row.content))
+                )
+            last_id = rows[-1].id
+
+        with op.batch_alter_table("document_chunks") as batch_op:
+            batch_op.drop_column("content")
+
+def downgrade() -> None:
+    from app.db.types import decompress_text
+
+    bind = op.get_bind()
+    op.add_column("document_chunks", sa.Column("content", sa.Text(), nullable=True))
+    chunks = sa.table(
+        "document_chunks",
+        sa.column("id", sa.Integer),
+        sa.column("content", sa.Text),
+        sa.column("content_zstd", sa.LargeBinary),
+    )
+    for row in bind.execute(sa.select(chunks.c.id, chunks.c.content_zstd)).all():
+        if row.content_zstd is not None:
+            bind.execute(
+                chunks.update()
+                .where(chunks.c.id == row.id)
+                .values(content=decompress_text(row.content_zstd))
+            )
+    with op.batch_alter_table("document_chunks") as batch_op:
+        batch_op.drop_column("content_zstd")
@@ -0,0 +1,27 @@
+"""Add per-user change counters for list ETags
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+COUNTERS = ("documents_version", "queries_version")
+
+def upgrade() -> None:
+    # The columns already exist on databases created by Base.metadata.create_all
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("users")}
+    for name in COUNTERS:
+        if name not in columns:
+            op.add_column("users", sa.Column(name, sa.Integer(), server_default="0", nullable=False))
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        for name in COUNTERS:
+            batch_op.drop_column(name)
@@ -0,0 +1,25 @@
+"""Add upload batch IDs to documents
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # The column already exists on databases created by Base.metadata.create_all
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("documents")}
+    if "upload_batch_id" not in columns:
+        op.add_column("documents", sa.Column("upload_batch_id", sa.String(), nullable=True))
+    op.create_index("ix_documents_upload_batch_id", "documents", ["upload_batch_id"], if_not_exists=True)
+
+def downgrade() -> None:
+    op.drop_index("ix_documents_upload_batch_id", table_name="documents")
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.drop_column("upload_batch_id")
@@ -0,0 +1,37 @@
+"""Add versioned vector indexes for online re-embedding
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # The table already exists on databases created by Base.metadata.create_all
+    if "vector_indexes" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "vector_indexes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False, unique=True),
+        sa.Column("embedding_provider", sa.String(), nullable=False),
+        sa.Column("embedding_model", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("last_document_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("chunks_embedded", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("lease_owner", sa.String(), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("activated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_vector_indexes_id", "vector_indexes", ["id"])
+    op.create_index("ix_vector_indexes_status", "vector_indexes", ["status"])
+
+def downgrade() -> None:
+    op.drop_table("vector_indexes")
@@ -0,0 +1,29 @@
+"""Store SQLite created_at timestamps with a fraction
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # SQLite compares timestamps as text. CURRENT_TIMESTAMP wrote whole seconds
+    # ("2026-10-19 12:00:00"), which sort before the same second as SQLAlchemy
+    # binds it ("2026-10-19 12:00:00.000000"), so keyset cursors skipped or
+    # repeated rows. Rows are now written by the app with a fraction; bring the
+    # old ones to the same form. Other databases store real timestamps.
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for table in ("documents", "queries"):
+        op.execute(
+            f"UPDATE {table} SET created_at = created_at || '.000000' "
+            f"WHERE created_at IS NOT NULL AND length(created_at) = 19"
+        )
+
+def downgrade() -> None:
+    pass
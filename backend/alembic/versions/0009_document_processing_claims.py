@@ -0,0 +1,23 @@
+"""Record when a background ingestor last renewed its claim on a document
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # The column already exists on databases created by Base.metadata.create_all
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("documents")}
+    if "processing_claimed_at" not in columns:
+        op.add_column("documents", sa.Column("processing_claimed_at", sa.DateTime(timezone=True), nullable=True))
+
+def downgrade() -> None:
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.drop_column("processing_claimed_at")
@@ -0,0 +1,23 @@
+"""Add a per-user change counter checked by each worker's auth cache
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # The column already exists on databases created by Base.metadata.create_all
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("users")}
+    if "auth_version" not in columns:
+        op.add_column("users", sa.Column("auth_version", sa.Integer(), server_default="0", nullable=False))
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("auth_version")
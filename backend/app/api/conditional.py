@@ -0,0 +1,40 @@
+import hashlib
+from typing import Dict, Optional
+
+from fastapi import Request, Response, status
+from sqlalchemy.orm import Session
+
+from app.db.models import User
+
+# Clients may keep list responses but must revalidate them on every use
+LIST_CACHE_CONTROL = "private, no-cache"
+
+def list_etag(request: Request, db: Session, user_id: int, counter: str) -> str:
+    """Build a weak ETag for a user's list from its change counter and the query string.
+
+    Reads a single users row by primary key, so it never touches the list itself.
+    """
+    version = db.query(getattr(User, counter)).filter(User.id == user_id).scalar() or 0
+    params = hashlib.blake2b(
+        str(sorted(request.query_params.multi_items())).encode(), digest_size=8
+    ).hexdigest()
+    return f'W/"{counter}-{user_id}-{version}-{params}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check an ETag against the request's If-None-Match header (weak comparison)."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": LIST_CACHE_CONTROL}
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response if the client's cached list is still current, else None."""
+    if not etag_matches(request, etag):
+        return None
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
@@ -1,86 +1,149 @@
+import logging
+import time
 from typing import Generator, Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
 
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.core.security import verify_password
 from app.db.session import get_db
 from app.db.models import User
 from app.schemas.user import TokenPayload
 
+logger = logging.getLogger(__name__)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
+# Verify the secret key is not empty
+if not settings.SECRET_KEY or settings.SECRET_KEY == "your-secret-key-for-jwt":
+    logger.warning("Using default or empty SECRET_KEY for token validation. This is insecure!")
+
+# Decoded token payloads, keyed by the raw token
+_token_cache = TTLCache(max_size=settings.AUTH_CACHE_SIZE, ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS)
+# Detached snapshots of active users, keyed by user ID
+_user_cache = TTLCache(max_size=settings.AUTH_CACHE_SIZE, ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS)
+
+def invalidate_user_cache(user_id: int) -> None:
+    """Drop a cached user so the next request reloads it from the database."""
+    _user_cache.delete(str(user_id))
+
+@event.listens_for(User, "after_update")
+def _invalidate_updated_user(mapper, connection, target) -> None:
+    # Deactivation (or any other change) must take effect on the next request
+    invalidate_user_cache(target.id)
+
+@event.listens_for(User, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target) -> None:
+    invalidate_user_cache(target.id)
+
+def decode_token(token: str) -> TokenPayload:
+    """Decode and validate a JWT, caching the payload until the token expires."""
+    cached = _token_cache.get(token)
+    if cached is not None:
+        token_data, expires_at = cached
+        if expires_at is None or expires_at > time.time():
+            return token_data
+        _token_cache.delete(token)
+
+    payload = jwt.decode(
+        token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+    )
+    token_data = TokenPayload(**payload)
+
+    expires_at = payload.get("exp")
+    ttl = expires_at - time.time() if expires_at else None
+    _token_cache.set(token, (token_data, expires_at), ttl_seconds=ttl)
+    return token_data
+
 def get_current_user(
     db: Session = Depends(get_db),
     token: str = Depends(oauth2_scheme)
 ) -> User:
     """
     Get the current user from the token.
-    """
-    print(f"Authenticating user with token: {token[:10]}...")
 
+    Decoded tokens and active users are cached for AUTH_CACHE_TTL_SECONDS, so
+    repeated requests with the same token skip the JWT verification and load
+    the user from the cache. The cache is per process, so a hit is checked
+    against the user's auth_version, read by primary key: a user updated,
+    deactivated or deleted by any worker is reloaded on its next request.
+    """
     try:
-        # Verify the secret key is not empty
-        if not settings.SECRET_KEY or settings.SECRET_KEY == "your-secret-key-for-jwt":
-            print("WARNING: Using default or empty SECRET_KEY for token validation. This is insecure!")
-
-        # Decode the token
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        print(f"Token decoded successfully. Payload: {payload}")
-
-        token_data = TokenPayload(**payload)
-        print(f"User ID from token: {token_data.sub}")
+        token_data = decode_token(token)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Authenticated token for user ID: {token_data.sub}")
 
     except JWTError as jwt_error:
-        print(f"JWT Error: {str(jwt_error)}")
+        logger.info(f"JWT Error: {str(jwt_error)}")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"Could not validate credentials: {str(jwt_error)}",
         )
     except ValidationError as val_error:
-        print(f"Validation Error: {str(val_error)}")
+        logger.info(f"Validation Error: {str(val_error)}")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"Invalid token payload: {str(val_error)}",
         )
     except Exception as e:
-        print(f"Unexpected error during token validation: {str(e)}")
+        logger.error(f"Unexpected error during token validation: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Authentication error: {str(e)}",
         )
 
+    # Attach the cached user to this request's session without a SELECT
+    cached_user = _user_cache.get(token_data.sub)
+    if cached_user is not None:
+        auth_version = db.query(User.auth_version).filter(User.id == token_data.sub).scalar()
+        if auth_version == cached_user.auth_version:
+            return db.merge(cached_user, load=False)
+        # Changed since it was cached, possibly by another worker
+        _user_cache.delete(token_data.sub)
+
     # Get user from database
     try:
         user = db.query(User).filter(User.id == token_data.sub).first()
 
         if not user:
-            print(f"User not found with ID: {token_data.sub}")
+            logger.info(f"User not found with ID: {token_data.sub}")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
 
         if not user.is_active:
-            print(f"User is inactive: {user.email}")
+            logger.info(f"User is inactive: {user.email}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Inactive user"
             )
 
-        print(f"Authentication successful for user: {user.email}")
+        # Cache a detached copy so this request's session never shares state with the cache
+        snapshot = User(
+            id=user.id,
+            email=user.email,
+            hashed_password=user.hashed_password,
+            is_active=user.is_active,
+            auth_version=user.auth_version
+        )
+        make_transient_to_detached(snapshot)
+        _user_cache.set(token_data.sub, snapshot)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Authentication successful for user: {user.email}")
         return user
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Database error during user lookup: {str(e)}")
+        logger.error(f"Database error during user lookup: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Database error: {str(e)}",
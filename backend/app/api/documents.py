@@ -1,20 +1,32 @@
 import os
 import shutil
-from typing import Any, List
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+import uuid
+import zipfile
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional, Tuple
+from fastapi import APIRouter, Depends, File, HTTPException, Request, Response, UploadFile, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.db.models import Document, User
 from app.db.session import get_db
-from app.schemas.document import Document as DocumentSchema, DocumentCreate
+from app.schemas.document import Document as DocumentSchema, DocumentCreate, UploadBatch
 from app.api.deps import get_current_user
+from app.api.conditional import cache_headers, list_etag, not_modified
+from app.api.pagination import page_headers, paginate, parse_fields, project_columns, projection_response
 from app.rag.document_processor import process_document
+from app.rag.deletion import document_purger, invalidate_deleted_documents
+from app.rag.ingestion import document_ingestor
 
 router = APIRouter()
 
+# Content types of documents inside zip archives, which carry no content type of their own
+ARCHIVE_MEMBER_TYPES = {".pdf": "application/pdf", ".txt": "text/plain"}
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+
 @router.post("/upload", response_model=DocumentSchema)
-async def upload_document(
+def upload_document(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -62,15 +74,203 @@ async def upload_document(
 
     return document
 
+def collect_batch_files(files: List[UploadFile]) -> Tuple[List[Tuple[str, str, int, Callable]], List[str]]:
+    """List the documents of a batch upload without writing anything.
+
+    Returns (filename, content type, size, open function) for each document,
+    and the names of unsupported files found inside zip archives.
+    """
+    documents = []
+    skipped = []
+    for file in files:
+        filename = os.path.basename(file.filename or "")
+        if file.content_type in ZIP_CONTENT_TYPES or filename.lower().endswith(".zip"):
+            try:
+                archive = zipfile.ZipFile(file.file)
+            except zipfile.BadZipFile:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"{filename} is not a valid zip archive"
+                )
+            for info in archive.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or info.filename.startswith("__MACOSX/") or name.startswith("."):
+                    continue
+                content_type = ARCHIVE_MEMBER_TYPES.get(os.path.splitext(name)[1].lower())
+                if content_type is None:
+                    skipped.append(f"{filename}/{info.filename}")
+                    continue
+                documents.append((name, content_type, info.file_size, lambda archive=archive, info=info: archive.open(info)))
+        elif file.content_type in ["application/pdf", "text/plain"]:
+            file.file.seek(0)
+            documents.append((filename, file.content_type, file.size or 0, lambda file=file: file.file))
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{filename}: only PDF and TXT files, or zip archives of them, are supported"
+            )
+    return documents, skipped
+
+def batch_progress(db: Session, batch_id: str, owner_id: int) -> Optional[UploadBatch]:
+    """Aggregate the processing status of a batch's documents in one query."""
+    rows = (
+        db.query(Document.processing_status, func.count(Document.id), func.sum(Document.processing_progress))
+        .filter(
+            Document.upload_batch_id == batch_id,
+            Document.owner_id == owner_id,
+            Document.deleted_at.is_(None)
+        )
+        .group_by(Document.processing_status)
+        .all()
+    )
+    if not rows:
+        return None
+
+    counts = {processing_status: count for processing_status, count, _ in rows}
+    total = sum(counts.values())
+    progress = sum(progress or 0 for _, _, progress in rows) // total
+    return UploadBatch(
+        batch_id=batch_id,
+        status="processing" if counts.get("pending") or counts.get("processing") else "completed",
+        total=total,
+        progress=progress,
+        **{key: counts.get(key, 0) for key in ("pending", "processing", "completed", "error")}
+    )
+
+@router.post("/upload/batch", response_model=UploadBatch, status_code=status.HTTP_202_ACCEPTED)
+def upload_documents(
+    files: List[UploadFile] = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    Upload many PDF and TXT documents, or zip archives of them, in one request.
+
+    Each file or archive member is streamed to disk, all documents are created
+    in one transaction, and they are processed in the background. Poll
+    GET /documents/upload/batch/{batch_id} for the batch's aggregate progress.
+    Unsupported files inside archives are skipped and listed in `skipped`.
+    """
+    documents, skipped = collect_batch_files(files)
+    if not documents:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No PDF or TXT files found"
+        )
+    if len(documents) > settings.BATCH_UPLOAD_MAX_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.BATCH_UPLOAD_MAX_FILES} files can be uploaded at once"
+        )
+    # Archive members are checked by their declared size, which zipfile enforces on extraction
+    if sum(size for _, _, size, _ in documents) > settings.BATCH_UPLOAD_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A batch can hold at most {settings.BATCH_UPLOAD_MAX_BYTES} bytes of documents"
+        )
+
+    os.makedirs(settings.UPLOAD_FOLDER, exist_ok=True)
+    batch_id = uuid.uuid4().hex
+    rows = []
+    file_paths = []
+    try:
+        for i, (filename, content_type, _, open_file) in enumerate(documents):
+            # Prefixed with the batch and position, since files in a batch may share a name
+            file_path = os.path.join(settings.UPLOAD_FOLDER, f"{current_user.id}_{batch_id}_{i}_{filename}")
+            file_paths.append(file_path)
+            with open_file() as source, open(file_path, "wb") as buffer:
+                shutil.copyfileobj(source, buffer)
+            rows.append(Document(
+                filename=filename,
+                file_path=file_path,
+                content_type=content_type,
+                size=os.path.getsize(file_path),
+                processed=False,
+                upload_batch_id=batch_id,
+                owner_id=current_user.id
+            ))
+
+        db.add_all(rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        for file_path in file_paths:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        raise
+
+    document_ingestor.enqueue([document.id for document in rows])
+
+    return UploadBatch(
+        batch_id=batch_id,
+        status="processing",
+        total=len(rows),
+        pending=len(rows),
+        document_ids=[document.id for document in rows],
+        skipped=skipped
+    )
+
+@router.get("/upload/batch/{batch_id}", response_model=UploadBatch)
+def get_upload_batch(
+    batch_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    Get the aggregate processing progress of a batch upload.
+    """
+    progress = batch_progress(db, batch_id, current_user.id)
+    if progress is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload batch not found"
+        )
+    return progress
+
 @router.get("/", response_model=List[DocumentSchema])
 def get_documents(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = settings.DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None,
+    include_total: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> Any:
     """
-    Get all documents for the current user.
+    Get the documents of the current user, newest first.
+
+    Results are keyset-paginated: pass the X-Next-Cursor response header back
+    as `cursor` to fetch the next page. `fields` is a comma-separated list of
+    fields to return, and `include_total` adds an X-Total-Count header at the
+    cost of an extra COUNT query.
+
+    Responses carry an ETag derived from the user's list change counter; send
+    it back in If-None-Match to get a 304 without the list being queried.
     """
-    documents = db.query(Document).filter(Document.owner_id == current_user.id).all()
+    etag = list_etag(request, db, current_user.id, "documents_version")
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    query = db.query(Document).filter(
+        Document.owner_id == current_user.id,
+        Document.deleted_at.is_(None)
+    )
+    total = query.count() if include_total else None
+
+    projection = parse_fields(fields, DocumentSchema)
+    if projection:
+        query = project_columns(query, Document, projection)
+
+    documents, next_cursor = paginate(query, Document, cursor, limit)
+    headers = {**page_headers(next_cursor, total), **cache_headers(etag)}
+
+    if projection:
+        return projection_response(documents, DocumentSchema, projection, headers)
+
+    response.headers.update(headers)
     return documents
 
 @router.get("/{document_id}", response_model=DocumentSchema)
@@ -84,7 +284,8 @@ def get_document(
     """
     document = db.query(Document).filter(
         Document.id == document_id,
-        Document.owner_id == current_user.id
+        Document.owner_id == current_user.id,
+        Document.deleted_at.is_(None)
     ).first()
 
     if not document:
@@ -106,7 +307,8 @@ def get_document_status(
     """
     document = db.query(Document).filter(
         Document.id == document_id,
-        Document.owner_id == current_user.id
+        Document.owner_id == current_user.id,
+        Document.deleted_at.is_(None)
     ).first()
 
     if not document:
@@ -131,10 +333,15 @@ def delete_document(
 ):
     """
     Delete a document.
+
+    The document is tombstoned immediately, which hides it from listings and
+    retrieval; its chunks, vectors, and query source references are purged in
+    the background.
     """
     document = db.query(Document).filter(
         Document.id == document_id,
-        Document.owner_id == current_user.id
+        Document.owner_id == current_user.id,
+        Document.deleted_at.is_(None)
     ).first()
 
     if not document:
@@ -147,6 +354,8 @@ def delete_document(
     if os.path.exists(document.file_path):
         os.remove(document.file_path)
 
-    # Delete the document from the database
-    db.delete(document)
+    # Tombstone the document and hand it to the background purger
+    document.deleted_at = datetime.now(timezone.utc)
     db.commit()
+    invalidate_deleted_documents()
+    document_purger.enqueue(document.id)
@@ -0,0 +1,55 @@
+import logging
+import threading
+from typing import Any
+
+from fastapi import APIRouter, Response, status
+from sqlalchemy import text
+
+from app.db.session import engine
+from app.rag.vector_store import check_vector_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Set once the lifespan has started the worker, cleared when it starts shutting down
+_ready = threading.Event()
+
+def set_ready(ready: bool) -> None:
+    if ready:
+        _ready.set()
+    else:
+        _ready.clear()
+
+@router.get("/health/live", include_in_schema=False)
+def liveness() -> Any:
+    """Liveness probe: the worker process is up and serving requests."""
+    return {"status": "ok"}
+
+@router.get("/health/ready", include_in_schema=False)
+def readiness(response: Response) -> Any:
+    """
+    Readiness probe: the worker has started and can reach the database and
+    the vector store. Returns 503 otherwise, so load balancers stop routing
+    to it.
+    """
+    checks = {"startup": "ok" if _ready.is_set() else "pending"}
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        checks["database"] = "ok"
+    except Exception as e:
+        logger.warning(f"Readiness check failed for the database: {str(e)}")
+        checks["database"] = "unavailable"
+
+    try:
+        check_vector_store()
+        checks["vector_store"] = "ok"
+    except Exception as e:
+        logger.warning(f"Readiness check failed for the vector store: {str(e)}")
+        checks["vector_store"] = "unavailable"
+
+    ready = all(value == "ok" for value in checks.values())
+    response.status_code = status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"status": "ready" if ready else "unavailable", "checks": checks}
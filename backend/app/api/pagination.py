@@ -0,0 +1,111 @@
+import base64
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query as SQLQuery, load_only
+
+from app.core.config import settings
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode a (created_at, id) keyset position as an opaque cursor."""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[Tuple[str, ...]]:
+    """Parse a comma-separated field projection, always keeping the keyset columns."""
+    if not fields:
+        return None
+
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in schema.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+
+    return tuple(dict.fromkeys(["id", "created_at", *requested]))
+
+@lru_cache(maxsize=128)
+def projection_schema(schema: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """Build a schema containing only the projected fields of another schema."""
+    return create_model(
+        f"{schema.__name__}Projection",
+        __config__=ConfigDict(from_attributes=True),
+        **{field: (schema.model_fields[field].annotation, ...) for field in fields}
+    )
+
+@lru_cache(maxsize=128)
+def projection_adapter(schema: Type[BaseModel], fields: Tuple[str, ...]) -> TypeAdapter:
+    return TypeAdapter(List[projection_schema(schema, fields)])
+
+def projection_response(
+    rows: List[Any],
+    schema: Type[BaseModel],
+    fields: Tuple[str, ...],
+    headers: Dict[str, str]
+) -> Response:
+    """Serialize a projected page straight to JSON bytes with Pydantic, as response_model does."""
+    adapter = projection_adapter(schema, fields)
+    body = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+    return Response(body, media_type="application/json", headers=headers)
+
+def project_columns(query: SQLQuery, model, fields: Tuple[str, ...]) -> SQLQuery:
+    """Only load the projected columns of the model."""
+    columns = [getattr(model, field) for field in fields if field in model.__table__.columns]
+    return query.options(load_only(*columns))
+
+def paginate(
+    query: SQLQuery,
+    model,
+    cursor: Optional[str],
+    limit: int
+) -> Tuple[List[Any], Optional[str]]:
+    """Return one page of rows, newest first, and the cursor for the next page.
+
+    Uses keyset pagination on (created_at, id), so each page costs the same
+    regardless of how deep into the history it is.
+    """
+    limit = max(1, min(limit, settings.MAX_PAGE_SIZE))
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < row_id)
+        ))
+
+    # Fetch one extra row to learn whether there is a next page
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return rows, next_cursor
+
+def page_headers(next_cursor: Optional[str], total: Optional[int] = None) -> Dict[str, str]:
+    """Pagination metadata returned alongside the list body."""
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        headers["X-Total-Count"] = str(total)
+    return headers
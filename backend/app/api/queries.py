@@ -1,38 +1,99 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.orm import Session, selectinload
 
 from app.db.models import Query, User
 from app.db.session import get_db
-from app.schemas.query import Query as QuerySchema, QueryBase, QueryResponse
+from app.db.write_behind import query_writer
+from app.schemas.query import Query as QuerySchema, QueryRequest, QueryResponse
+from app.core.config import settings
 from app.api.deps import get_current_user
-from app.rag.query_engine import process_query
+from app.api.conditional import cache_headers, list_etag, not_modified
+from app.api.pagination import page_headers, paginate, parse_fields, project_columns, projection_response
+from app.rag.query_engine import AdmissionRejected, process_query
 
 router = APIRouter()
 
 @router.post("/", response_model=QueryResponse)
 def create_query(
-    query_in: QueryBase,
+    query_in: QueryRequest,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> Any:
     """
     Create a new query and get a response.
+
+    Pass the same session_id on follow-up questions to continue a conversation.
+    document_ids, created_after, and pages restrict the search to matching
+    chunks of the user's documents.
     """
-    # Process the query
-    result = process_query(query_in.query_text, current_user.id, db)
-    
+    # Process the query, failing fast when the LLM provider is saturated
+    try:
+        result = process_query(
+            query_in.query_text,
+            current_user.id,
+            db,
+            session_id=query_in.session_id,
+            document_ids=query_in.document_ids,
+            created_after=query_in.created_after,
+            pages=(query_in.pages.start, query_in.pages.end) if query_in.pages else None
+        )
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
     return result
 
 @router.get("/", response_model=List[QuerySchema])
 def get_queries(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = settings.DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None,
+    include_total: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> Any:
     """
-    Get all queries for the current user.
+    Get the queries of the current user, newest first.
+
+    Results are keyset-paginated: pass the X-Next-Cursor response header back
+    as `cursor` to fetch the next page. `fields` is a comma-separated list of
+    fields to return (e.g. `query_text,session_id` to skip response bodies),
+    and `include_total` adds an X-Total-Count header at the cost of an extra
+    COUNT query.
+
+    Responses carry an ETag derived from the user's list change counter; send
+    it back in If-None-Match to get a 304 without the list being queried.
     """
-    queries = db.query(Query).filter(Query.user_id == current_user.id).all()
+    # Include the user's queries still waiting in the write-behind buffer
+    query_writer.flush_user(current_user.id)
+    etag = list_etag(request, db, current_user.id, "queries_version")
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    query = db.query(Query).filter(Query.user_id == current_user.id)
+    total = query.count() if include_total else None
+
+    projection = parse_fields(fields, QuerySchema)
+    if projection:
+        query = project_columns(query, Query, projection)
+    if projection is None or "sources" in projection:
+        # Load all sources of the page in one SELECT instead of one per query
+        query = query.options(selectinload(Query.sources))
+
+    queries, next_cursor = paginate(query, Query, cursor, limit)
+    headers = {**page_headers(next_cursor, total), **cache_headers(etag)}
+
+    if projection:
+        return projection_response(queries, QuerySchema, projection, headers)
+
+    response.headers.update(headers)
     return queries
 
 @router.get("/{query_id}", response_model=QuerySchema)
@@ -44,7 +105,8 @@ def get_query(
     """
     Get a specific query.
     """
-    query = db.query(Query).filter(
+    query_writer.flush_user(current_user.id)
+    query = db.query(Query).options(selectinload(Query.sources)).filter(
         Query.id == query_id,
         Query.user_id == current_user.id
     ).first()
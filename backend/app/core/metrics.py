@@ -0,0 +1,103 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+
+from app.core.config import settings
+
+# Buckets from 1ms up to 2 minutes to cover both retrieval and slow local LLMs
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "qgenai_http_request_seconds",
+    "HTTP request latency",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+QUERY_STAGE_SECONDS = Histogram(
+    "qgenai_query_stage_seconds",
+    "Latency of each process_query stage",
+    ["stage", "provider", "model"],
+    buckets=LATENCY_BUCKETS,
+)
+
+DOCUMENT_STAGE_SECONDS = Histogram(
+    "qgenai_document_stage_seconds",
+    "Latency of each process_document stage",
+    ["stage", "content_type", "provider", "model"],
+    buckets=LATENCY_BUCKETS,
+)
+
+RERANK_FALLBACKS = Counter(
+    "qgenai_rerank_fallbacks_total",
+    "Queries that kept vector-search order because reranking did not finish",
+    ["reason"],
+)
+
+# Stage timings of the current request, reported in the Server-Timing header
+_server_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("server_timings", default=None)
+
+def llm_model_name() -> str:
+    """Get the model name of the configured LLM provider."""
+    return {
+        "openai": settings.LLM_MODEL,
+        "google": settings.GOOGLE_MODEL,
+        "ollama": settings.OLLAMA_MODEL,
+        "fake": "fake",
+    }.get(settings.LLM_PROVIDER, settings.LLM_MODEL)
+
+def start_server_timing() -> List[Tuple[str, float]]:
+    """Start collecting stage timings for the current request."""
+    timings: List[Tuple[str, float]] = []
+    _server_timings.set(timings)
+    return timings
+
+def format_server_timing(timings: List[Tuple[str, float]]) -> str:
+    """Format stage timings as a Server-Timing header value (durations in ms)."""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings)
+
+def record_server_timing(stage: str, seconds: float) -> None:
+    timings = _server_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+def observe_query_stage(stage: str, seconds: float) -> None:
+    """Record the duration of a query stage."""
+    QUERY_STAGE_SECONDS.labels(
+        stage=stage, provider=settings.LLM_PROVIDER, model=llm_model_name()
+    ).observe(seconds)
+    record_server_timing(stage, seconds)
+
+@contextmanager
+def query_stage(stage: str):
+    """Time a process_query stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_query_stage(stage, time.perf_counter() - start)
+
+def observe_document_stage(stage: str, content_type: str, seconds: float) -> None:
+    """Record the duration of a process_document stage."""
+    DOCUMENT_STAGE_SECONDS.labels(
+        stage=stage,
+        content_type=content_type,
+        provider=settings.EMBEDDING_PROVIDER,
+        model=settings.EMBEDDING_MODEL,
+    ).observe(seconds)
+    record_server_timing(stage, seconds)
+
+@contextmanager
+def document_stage(stage: str, content_type: str):
+    """Time a process_document stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_document_stage(stage, content_type, time.perf_counter() - start)
@@ -0,0 +1,43 @@
+import fcntl
+import os
+import threading
+from typing import Optional, Set
+
+class SharedSlots:
+    """Counting semaphore shared by the server's worker processes.
+
+    Each of `limit` lock files in `directory` is one slot, held with an
+    exclusive flock. The OS drops a process's locks when it exits, so a
+    crashed or killed worker never leaks a slot.
+    """
+
+    def __init__(self, directory: str, name: str, limit: int):
+        os.makedirs(directory, exist_ok=True)
+        self.limit = max(1, limit)
+        self._files = [
+            open(os.path.join(directory, f"{name}-{i}.lock"), "a+b")
+            for i in range(self.limit)
+        ]
+        # flock treats a second lock through the same file as already held, so
+        # the slots this process holds are tracked here
+        self._held: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> Optional[int]:
+        """Take a free slot without waiting; returns its number, or None if all are held."""
+        with self._lock:
+            for slot, file in enumerate(self._files):
+                if slot in self._held:
+                    continue
+                try:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                self._held.add(slot)
+                return slot
+        return None
+
+    def release(self, slot: int) -> None:
+        with self._lock:
+            fcntl.flock(self._files[slot].fileno(), fcntl.LOCK_UN)
+            self._held.discard(slot)
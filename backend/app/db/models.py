@@ -1,8 +1,15 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Text
-from sqlalchemy.orm import relationship
+from datetime import datetime, timezone
+from itertools import chain
+
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, DateTime, Text, event, update
+from sqlalchemy.orm import Session, relationship
 from sqlalchemy.sql import func
 
 from app.db.session import Base
+from app.db.types import CompressedText
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
 
 class User(Base):
     __tablename__ = "users"
@@ -11,22 +18,36 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
+    # Change counters of the user's document and query lists, used as list ETags
+    documents_version = Column(Integer, default=0, server_default="0", nullable=False)
+    queries_version = Column(Integer, default=0, server_default="0", nullable=False)
+    # Incremented on every change to the user, so each worker's cached copy can be checked
+    auth_version = Column(Integer, default=0, server_default="0", nullable=False)
 
     documents = relationship("Document", back_populates="owner")
     queries = relationship("Query", back_populates="user")
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        # Serves the owner filter and keyset ordering of GET /documents/
+        Index("ix_documents_owner_id_created_at_id", "owner_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, index=True)
     file_path = Column(String)
     content_type = Column(String)
     size = Column(Integer)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set by the app, since SQLite's CURRENT_TIMESTAMP drops the fraction the keyset cursor compares against
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
     processed = Column(Boolean, default=False)
     processing_progress = Column(Integer, default=0)  # Progress percentage (0-100)
     processing_status = Column(String, default="pending")  # pending, processing, completed, error
+    deleted_at = Column(DateTime(timezone=True), nullable=True, index=True)  # Tombstone until purged
+    upload_batch_id = Column(String, nullable=True, index=True)  # Set for documents uploaded together
+    # Renewed while a background ingestor processes the document; stale once its worker died
+    processing_claimed_at = Column(DateTime(timezone=True), nullable=True)
     owner_id = Column(Integer, ForeignKey("users.id"))
 
     owner = relationship("User", back_populates="documents")
@@ -37,20 +58,26 @@ class DocumentChunk(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     chunk_id = Column(String, index=True)
-    content = Column(Text)
+    # Canonical chunk text; the vector store only keeps IDs and metadata
+    content = Column("content_zstd", CompressedText)
     page_number = Column(Integer, nullable=True)
     section = Column(String, nullable=True)
-    document_id = Column(Integer, ForeignKey("documents.id"))
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True)
 
     document = relationship("Document", back_populates="chunks")
 
 class Query(Base):
     __tablename__ = "queries"
+    __table_args__ = (
+        # Serves the user filter and keyset ordering of GET /queries/
+        Index("ix_queries_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     query_text = Column(Text)
     response = Column(Text)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
+    session_id = Column(String, index=True, nullable=True)  # Conversation thread, if any
     user_id = Column(Integer, ForeignKey("users.id"))
 
     user = relationship("User", back_populates="queries")
@@ -61,7 +88,61 @@ class QuerySource(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     chunk_id = Column(String)
-    document_id = Column(Integer, ForeignKey("documents.id"))
-    query_id = Column(Integer, ForeignKey("queries.id"))
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True)
+    query_id = Column(Integer, ForeignKey("queries.id"), index=True)
 
     query = relationship("Query", back_populates="sources")
+
+class VectorIndex(Base):
+    """A generation of the vector store, embedded with a single model.
+
+    One index is "active" and serves queries. When the embedding model
+    changes, a "building" index is filled in the background, then swapped in
+    and the old one "retired" until its collections are dropped.
+    """
+    __tablename__ = "vector_indexes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)  # Chunk collection name
+    embedding_provider = Column(String, nullable=False)
+    embedding_model = Column(String, nullable=False)
+    status = Column(String, nullable=False, index=True)  # building, active, retired
+    # Re-embedding checkpoint: documents up to this ID are done
+    last_document_id = Column(Integer, default=0, nullable=False)
+    chunks_embedded = Column(Integer, default=0, nullable=False)
+    # Held on the active index by the one process re-embedding into the next, renewed after every batch
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    activated_at = Column(DateTime(timezone=True), nullable=True)
+
+def bump_list_versions(connection, column: str, user_ids) -> None:
+    """Increment a list change counter (documents_version or queries_version) of some users."""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        users = User.__table__
+        connection.execute(
+            update(users)
+            .where(users.c.id.in_(user_ids))
+            .values({column: users.c[column] + 1})
+        )
+
+@event.listens_for(User, "before_update")
+def _bump_auth_version(mapper, connection, target) -> None:
+    # Incremented in the UPDATE itself, so concurrent changes never share a version
+    target.auth_version = User.auth_version + 1
+
+@event.listens_for(Session, "before_flush")
+def _bump_changed_list_versions(session, flush_context, instances) -> None:
+    # Any flushed change to a document or query invalidates its owner's list ETag
+    changed = {"documents_version": set(), "queries_version": set()}
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if isinstance(obj, Document):
+            changed["documents_version"].add(obj.owner_id)
+        elif isinstance(obj, Query):
+            changed["queries_version"].add(obj.user_id)
+
+    for column, user_ids in changed.items():
+        bump_list_versions(session.connection(), column, user_ids)
@@ -0,0 +1,36 @@
+import threading
+from typing import Optional
+
+import zstandard
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+from app.core.config import settings
+
+# zstd (de)compressor objects must not be shared between threads
+_local = threading.local()
+
+def compress_text(text: str) -> bytes:
+    """Compress text with zstd."""
+    compressor = getattr(_local, "compressor", None)
+    if compressor is None:
+        compressor = _local.compressor = zstandard.ZstdCompressor(level=settings.CHUNK_COMPRESSION_LEVEL)
+    return compressor.compress(text.encode("utf-8"))
+
+def decompress_text(data: bytes) -> str:
+    """Decompress text produced by compress_text."""
+    decompressor = getattr(_local, "decompressor", None)
+    if decompressor is None:
+        decompressor = _local.decompressor = zstandard.ZstdDecompressor()
+    return decompressor.decompress(data).decode("utf-8")
+
+class CompressedText(TypeDecorator):
+    """Text column stored as a zstd-compressed blob."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[str], dialect) -> Optional[bytes]:
+        return compress_text(value) if value is not None else None
+
+    def process_result_value(self, value: Optional[bytes], dialect) -> Optional[str]:
+        return decompress_text(value) if value is not None else None
@@ -0,0 +1,202 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.db.models import Document, Query, QuerySource
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+class QueryWriteBehind:
+    """Buffers query history inserts and writes them in batches off the request path.
+
+    Records are queued by the request thread and flushed by a background thread
+    whenever a batch fills up or the flush interval elapses. stop() drains the
+    queue before returning, so every accepted record is written on a graceful
+    shutdown. flush_user() waits until a user's queued records are written, so
+    reads of that user's history can see their own writes.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_queue: int, max_retries: int = 3):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Records queued but not yet written (or dropped), per user
+        self._pending: Counter = Counter()
+        self._pending_cond = threading.Condition()
+
+    def start(self) -> None:
+        """Start the flusher thread if it is not already running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="query-write-behind", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self, timeout: float = 30) -> None:
+        """Flush everything that has been queued and stop the flusher thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.error("Query write-behind did not drain within %ss", timeout)
+
+    def submit(
+        self,
+        query_text: str,
+        answer: str,
+        user_id: int,
+        sources: List[Dict[str, Any]],
+        session_id: Optional[str] = None
+    ) -> None:
+        """Queue a query and its sources for persistence.
+
+        Blocks when the buffer is full, which applies backpressure if the
+        database falls behind instead of growing memory without bound.
+        """
+        self.start()
+        with self._pending_cond:
+            self._pending[user_id] += 1
+        self._queue.put({
+            "query_text": query_text,
+            "response": answer,
+            "user_id": user_id,
+            "session_id": session_id,
+            "created_at": datetime.now(timezone.utc),
+            "sources": sources,
+        })
+
+    def flush_user(self, user_id: int, timeout: float = 10) -> bool:
+        """Wait until every record queued for a user has been written.
+
+        The flusher picks up new records as soon as they are queued, so this
+        only waits for the batch in progress. Returns False on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self._pending_cond:
+            while self._pending[user_id] > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"Query history of user {user_id} was not written within {timeout}s")
+                    return False
+                self._pending_cond.wait(remaining)
+        return True
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                record = self._queue.get(timeout=self.flush_interval)
+                if record is None:
+                    stopping = True
+                else:
+                    batch.append(record)
+            except queue.Empty:
+                continue
+
+            # Drain whatever else is already waiting, up to the batch size
+            while not stopping and len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stopping = True
+                else:
+                    batch.append(record)
+
+            if batch:
+                try:
+                    self._flush(batch)
+                finally:
+                    self._done(batch)
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self._write(batch)
+                return
+            except IntegrityError as e:
+                # A bad record fails the same way every time, so don't retry the batch
+                logger.error(f"Error writing query history, writing records one by one: {str(e)}")
+                break
+            except Exception as e:
+                logger.error(f"Error writing query history (attempt {attempt}/{self.max_retries}): {str(e)}")
+                time.sleep(self.flush_interval * attempt)
+
+        # One by one, so a bad record doesn't take the others of its batch with it
+        dropped = 0
+        for record in batch:
+            try:
+                self._write([record], existing_documents_only=True)
+            except Exception as e:
+                dropped += 1
+                logger.error(f"Dropped query history record of user {record['user_id']}: {str(e)}")
+        if dropped:
+            logger.error(f"Dropped {dropped} of {len(batch)} query history records")
+
+    def _done(self, batch: List[Dict[str, Any]]) -> None:
+        with self._pending_cond:
+            self._pending.subtract(record["user_id"] for record in batch)
+            for user_id in {record["user_id"] for record in batch}:
+                if self._pending[user_id] <= 0:
+                    del self._pending[user_id]
+            self._pending_cond.notify_all()
+
+    def _write(self, records: List[Dict[str, Any]], existing_documents_only: bool = False) -> None:
+        db = SessionLocal()
+        try:
+            if existing_documents_only:
+                # Sources of documents deleted since the query was answered would break the
+                # foreign key once purged, and the purger may already have cleared them
+                document_ids = {source["document_id"] for record in records for source in record["sources"]}
+                existing = {
+                    row.id for row in
+                    db.query(Document.id)
+                    .filter(Document.id.in_(document_ids), Document.deleted_at.is_(None))
+                    .all()
+                } if document_ids else set()
+            db.add_all([
+                Query(
+                    query_text=record["query_text"],
+                    response=record["response"],
+                    user_id=record["user_id"],
+                    session_id=record["session_id"],
+                    created_at=record["created_at"],
+                    sources=[
+                        QuerySource(chunk_id=source["chunk_id"], document_id=source["document_id"])
+                        for source in record["sources"]
+                        if not existing_documents_only or source["document_id"] in existing
+                    ]
+                )
+                for record in records
+            ])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+query_writer = QueryWriteBehind(
+    batch_size=settings.QUERY_WRITE_BATCH_SIZE,
+    flush_interval=settings.QUERY_WRITE_FLUSH_INTERVAL,
+    max_queue=settings.QUERY_WRITE_QUEUE_SIZE
+)
@@ -0,0 +1,35 @@
+from typing import List, Dict, Any, Iterable
+
+from sqlalchemy.orm import Session
+
+from app.db.models import DocumentChunk
+
+def get_chunk_texts(db: Session, chunk_ids: Iterable[str]) -> Dict[str, str]:
+    """Read the text of several chunks in one query."""
+    chunk_ids = list(chunk_ids)
+    if not chunk_ids:
+        return {}
+
+    rows = (
+        db.query(DocumentChunk.chunk_id, DocumentChunk.content)
+        .filter(DocumentChunk.chunk_id.in_(chunk_ids))
+        .all()
+    )
+    return {row.chunk_id: row.content for row in rows}
+
+def attach_chunk_texts(db: Session, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Add the "text" of vector search hits that don't have it yet.
+
+    Hits whose chunk no longer exists in the store are dropped.
+    """
+    missing = [chunk["id"] for chunk in chunks if "text" not in chunk]
+    texts = get_chunk_texts(db, missing)
+
+    hydrated = []
+    for chunk in chunks:
+        if "text" not in chunk:
+            if chunk["id"] not in texts:
+                continue
+            chunk["text"] = texts[chunk["id"]]
+        hydrated.append(chunk)
+    return hydrated
@@ -0,0 +1,231 @@
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_paragraph_break = re.compile(r"\n\s*\n")
+_sentence_break = re.compile(r"(?<=[.!?])\s+")
+_word = re.compile(r"\S+\s*")
+
+# (sentence text, token count, whether it starts a paragraph)
+Unit = Tuple[str, int, bool]
+
+def approximate_token_count(text: str) -> int:
+    """Estimate BPE tokens at about four characters each, as for English text."""
+    return (len(text) + 3) // 4
+
+def _downloaded_marker(encoding_name: str) -> str:
+    return os.path.join(settings.TIKTOKEN_CACHE_DIR, f"{encoding_name}.downloaded")
+
+def download_encoding(encoding_name: str) -> None:
+    """Download a tiktoken encoding into TIKTOKEN_CACHE_DIR, for the chunker to load offline."""
+    if encoding_name == "approximate":
+        return
+    import tiktoken
+
+    os.makedirs(settings.TIKTOKEN_CACHE_DIR, exist_ok=True)
+    os.environ["TIKTOKEN_CACHE_DIR"] = settings.TIKTOKEN_CACHE_DIR
+    tiktoken.get_encoding(encoding_name)
+    with open(_downloaded_marker(encoding_name), "w"):
+        pass
+
+@lru_cache(maxsize=None)
+def get_token_counter(encoding_name: str) -> Callable[[str], int]:
+    """Get a token counting function for a tiktoken encoding.
+
+    Only encodings already downloaded into TIKTOKEN_CACHE_DIR, with
+    `python -m app.rag.chunker`, are loaded, so this never goes to the
+    network. Tokens are counted approximately for "approximate", and, with a
+    warning, for an encoding that isn't downloaded or can't be loaded.
+    """
+    if encoding_name == "approximate":
+        return approximate_token_count
+    if not os.path.exists(_downloaded_marker(encoding_name)):
+        logger.warning(
+            f"Tokenizer {encoding_name} is not downloaded, counting tokens approximately; "
+            f"download it with: python -m app.rag.chunker"
+        )
+        return approximate_token_count
+    try:
+        import tiktoken
+
+        os.environ["TIKTOKEN_CACHE_DIR"] = settings.TIKTOKEN_CACHE_DIR
+        encoding = tiktoken.get_encoding(encoding_name)
+        return lambda text: len(encoding.encode_ordinary(text))
+    except Exception as e:
+        logger.warning(f"Tokenizer {encoding_name} unavailable, counting tokens approximately: {str(e)}")
+        return approximate_token_count
+
+class TextChunker:
+    """Split text into chunks of at most ``chunk_tokens`` tokens in a single pass.
+
+    Whole paragraphs are packed greedily into chunks; a paragraph that doesn't
+    fit is packed sentence by sentence instead, unless the chunk is already at
+    least half full, in which case the chunk ends at the paragraph break.
+    Consecutive chunks share their trailing sentences up to
+    ``overlap_tokens``. Sentences longer than a chunk are split at word
+    boundaries. Tokens are counted once per paragraph, and once per sentence
+    only for paragraphs that have to be split. The separators that join
+    units into a chunk are counted too.
+    """
+
+    def __init__(self, chunk_tokens: int, overlap_tokens: int, count_tokens: Callable[[str], int]):
+        self.chunk_tokens = max(1, chunk_tokens)
+        # More overlap than half a chunk would make every chunk mostly repeated text
+        self.overlap_tokens = max(0, min(overlap_tokens, self.chunk_tokens // 2))
+        self.count_tokens = count_tokens
+        # Tokens of the separator _join puts before a unit that starts a paragraph, or not
+        self.separator_tokens = {True: count_tokens("\n\n"), False: count_tokens(" ")}
+
+    def split(self, text: str) -> List[str]:
+        return list(self.iter_chunks(_paragraph_break.split(text)))
+
+    def iter_chunks(self, paragraphs: Iterable[str]) -> Iterator[str]:
+        """Chunk a stream of paragraphs, yielding each chunk as soon as it is complete."""
+        current: List[Unit] = []
+        current_tokens = 0
+        new_units = 0  # Units in the current chunk that aren't overlap from the previous one
+
+        for paragraph in paragraphs:
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+
+            paragraph = (paragraph, self.count_tokens(paragraph), True)
+            if (
+                new_units
+                and current_tokens + self._added_tokens(current, paragraph) > self.chunk_tokens
+                and current_tokens * 2 >= self.chunk_tokens
+            ):
+                yield self._join(current)
+                current, current_tokens = self._overlap(current)
+                new_units = 0
+
+            if current_tokens + self._added_tokens(current, paragraph) <= self.chunk_tokens:
+                units: Iterable[Unit] = [paragraph]
+            else:
+                units = self._sentence_units(paragraph[0])
+
+            for unit in units:
+                if current_tokens + self._added_tokens(current, unit) > self.chunk_tokens:
+                    if new_units:
+                        yield self._join(current)
+                        current, current_tokens = self._overlap(current)
+                        new_units = 0
+                    if current_tokens + self._added_tokens(current, unit) > self.chunk_tokens:
+                        # The overlap alone would push this unit over the limit
+                        current, current_tokens = [], 0
+                current_tokens += self._added_tokens(current, unit)
+                current.append(unit)
+                new_units += 1
+
+        if new_units:
+            yield self._join(current)
+
+    def _added_tokens(self, current: List[Unit], unit: Unit) -> int:
+        """Tokens that appending a unit adds to a chunk, including its separator."""
+        return unit[1] + self.separator_tokens[unit[2]] if current else unit[1]
+
+    def _sentence_units(self, paragraph: str) -> Iterator[Unit]:
+        starts_paragraph = True
+        for sentence in _sentence_break.split(paragraph):
+            if not sentence:
+                continue
+            tokens = self.count_tokens(sentence)
+            pieces = [(sentence, tokens)] if tokens <= self.chunk_tokens else self._split_long(sentence)
+            for piece, piece_tokens in pieces:
+                yield piece, piece_tokens, starts_paragraph
+                starts_paragraph = False
+
+    def _split_long(self, sentence: str) -> List[Tuple[str, int]]:
+        pieces = []
+        words: List[str] = []
+        tokens = 0
+        for word in _word.findall(sentence):
+            word_tokens = self.count_tokens(word)
+            if words and tokens + word_tokens > self.chunk_tokens:
+                pieces.append(("".join(words).strip(), tokens))
+                words, tokens = [], 0
+            words.append(word)
+            tokens += word_tokens
+        if words:
+            pieces.append(("".join(words).strip(), tokens))
+        return pieces
+
+    def _overlap(self, current: List[Unit]) -> Tuple[List[Unit], int]:
+        """Return the trailing sentences of a finished chunk as the next chunk's overlap."""
+        overlap: List[Unit] = []
+        overlap_tokens = 0
+        for unit in reversed(current):
+            if overlap_tokens + self._prepended_tokens(unit, overlap) <= self.overlap_tokens:
+                overlap_tokens += self._prepended_tokens(unit, overlap)
+                overlap.append(unit)
+                continue
+            # Take the trailing sentences of a whole-paragraph unit that doesn't fit
+            for sentence in reversed(list(self._sentence_units(unit[0]))):
+                if overlap_tokens + self._prepended_tokens(sentence, overlap) > self.overlap_tokens:
+                    break
+                overlap_tokens += self._prepended_tokens(sentence, overlap)
+                overlap.append(sentence)
+            break
+        overlap.reverse()
+        return overlap, overlap_tokens
+
+    def _prepended_tokens(self, unit: Unit, reversed_units: List[Unit]) -> int:
+        """Tokens that putting a unit before others adds, including the separator after it."""
+        if not reversed_units:
+            return unit[1]
+        return unit[1] + self.separator_tokens[reversed_units[-1][2]]
+
+    @staticmethod
+    def _join(units: List[Unit]) -> str:
+        parts = []
+        for i, (text, _, starts_paragraph) in enumerate(units):
+            if i:
+                parts.append("\n\n" if starts_paragraph else " ")
+            parts.append(text)
+        return "".join(parts)
+
+def iter_paragraphs(blocks: Iterable[str], max_paragraph_chars: int) -> Iterator[str]:
+    """Split a stream of text blocks into paragraphs without holding the whole text.
+
+    Text without paragraph breaks (e.g. log files) is cut at the last line
+    break, or failing that the last space, once more than
+    ``max_paragraph_chars`` of it is pending, so memory stays bounded.
+    """
+    pending = ""
+    for block in blocks:
+        pending += block
+        paragraphs = _paragraph_break.split(pending)
+        pending = paragraphs.pop()
+        yield from paragraphs
+
+        if len(pending) > max_paragraph_chars:
+            cut = pending.rfind("\n")
+            if cut <= 0:
+                cut = pending.rfind(" ")
+            if cut <= 0:
+                cut = len(pending)
+            yield pending[:cut]
+            pending = pending[cut:]
+    if pending:
+        yield pending
+
+@lru_cache(maxsize=None)
+def get_chunker(content_type: str) -> TextChunker:
+    """Get the chunker configured for a document content type."""
+    if content_type == "application/pdf":
+        chunk_tokens, overlap_tokens = settings.PDF_CHUNK_TOKENS, settings.PDF_CHUNK_OVERLAP_TOKENS
+    else:
+        chunk_tokens, overlap_tokens = settings.TXT_CHUNK_TOKENS, settings.TXT_CHUNK_OVERLAP_TOKENS
+    return TextChunker(chunk_tokens, overlap_tokens, get_token_counter(settings.CHUNK_TOKENIZER))
+
+if __name__ == "__main__":
+    # Run where the network is available, e.g. at install time, so chunking works offline
+    download_encoding(settings.CHUNK_TOKENIZER)
+    print(f"Downloaded tokenizer {settings.CHUNK_TOKENIZER} into {settings.TIKTOKEN_CACHE_DIR}")
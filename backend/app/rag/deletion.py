@@ -0,0 +1,197 @@
+import logging
+import queue
+import threading
+import time
+from typing import Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.models import Document, DocumentChunk, Query, QuerySource, bump_list_versions
+from app.db.session import SessionLocal, engine
+from app.rag.vector_store import (
+    compact_vector_store,
+    delete_chunks_from_vector_store,
+    delete_document_from_vector_store,
+)
+
+logger = logging.getLogger(__name__)
+
+# IDs of tombstoned documents, shared briefly so retrieval doesn't hit the DB per query
+_tombstone_cache = TTLCache(max_size=1, ttl_seconds=settings.TOMBSTONE_CACHE_TTL_SECONDS)
+
+def get_deleted_document_ids(db: Session) -> Set[int]:
+    """Get the IDs of documents that are deleted but not yet purged."""
+    deleted_ids = _tombstone_cache.get("ids")
+    if deleted_ids is None:
+        rows = db.query(Document.id).filter(Document.deleted_at.isnot(None)).all()
+        deleted_ids = {row.id for row in rows}
+        _tombstone_cache.set("ids", deleted_ids)
+    return deleted_ids
+
+def invalidate_deleted_documents() -> None:
+    _tombstone_cache.clear()
+
+class DocumentPurger:
+    """Background job that purges tombstoned documents and compacts the indexes.
+
+    Deleting a document only tombstones it; this worker then removes its
+    chunks, vectors, and query source references in batches, deletes the
+    document row, and periodically compacts the vector store and database to
+    reclaim the freed space. Every step is idempotent, so the purgers of
+    several server workers may safely work on the same document.
+    """
+
+    def __init__(self, batch_size: int, compaction_interval: float):
+        self.batch_size = batch_size
+        self.compaction_interval = compaction_interval
+        self._queue: "queue.Queue[Optional[int]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._purged_since_compaction = 0
+        self._last_compaction = time.monotonic()
+
+    def start(self) -> None:
+        """Start the worker and re-queue documents left tombstoned by a previous run."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="document-purger", daemon=True)
+            self._thread.start()
+
+        db = SessionLocal()
+        try:
+            for row in db.query(Document.id).filter(Document.deleted_at.isnot(None)).all():
+                self._queue.put(row.id)
+        finally:
+            db.close()
+
+    def stop(self, timeout: float = 10) -> None:
+        """Stop the worker after the document it is currently purging.
+
+        Documents still queued stay tombstoned and are picked up on next start.
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def enqueue(self, document_id: int) -> None:
+        """Schedule a tombstoned document for purging."""
+        self.start()
+        self._queue.put(document_id)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                document_id = self._queue.get(timeout=self.compaction_interval)
+            except queue.Empty:
+                self._maybe_compact()
+                continue
+
+            if document_id is None:
+                return
+
+            try:
+                self.purge_document(document_id)
+                self._purged_since_compaction += 1
+            except Exception as e:
+                logger.error(f"Error purging document {document_id}: {str(e)}")
+
+            self._maybe_compact()
+
+    def purge_document(self, document_id: int) -> None:
+        """Remove a tombstoned document's chunks, vectors, and references in batches."""
+        db = SessionLocal()
+        try:
+            document = db.query(Document).filter(Document.id == document_id).first()
+            if document is None or document.deleted_at is None:
+                return
+
+            while True:
+                chunks = (
+                    db.query(DocumentChunk.id, DocumentChunk.chunk_id)
+                    .filter(DocumentChunk.document_id == document_id)
+                    .limit(self.batch_size)
+                    .all()
+                )
+                if not chunks:
+                    break
+                delete_chunks_from_vector_store([chunk.chunk_id for chunk in chunks])
+                db.query(DocumentChunk).filter(
+                    DocumentChunk.id.in_([chunk.id for chunk in chunks])
+                ).delete(synchronize_session=False)
+                db.commit()
+
+            # Catch vectors that never got a chunk row, e.g. from a failed ingestion
+            delete_document_from_vector_store(document_id)
+
+            # Bulk deletes skip the ORM flush hooks, so bump the query list counters here
+            affected_users = [
+                row.user_id for row in
+                db.query(Query.user_id)
+                .join(QuerySource, QuerySource.query_id == Query.id)
+                .filter(QuerySource.document_id == document_id)
+                .distinct()
+                .all()
+            ]
+            while True:
+                source_ids = [
+                    row.id for row in
+                    db.query(QuerySource.id)
+                    .filter(QuerySource.document_id == document_id)
+                    .limit(self.batch_size)
+                    .all()
+                ]
+                if not source_ids:
+                    break
+                db.query(QuerySource).filter(
+                    QuerySource.id.in_(source_ids)
+                ).delete(synchronize_session=False)
+                db.commit()
+            bump_list_versions(db.connection(), "queries_version", affected_users)
+
+            # Another worker may be purging the same document, so don't insist on the row
+            db.query(Document).filter(Document.id == document_id).delete(synchronize_session=False)
+            db.commit()
+            invalidate_deleted_documents()
+            logger.info(f"Purged document {document_id}")
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _maybe_compact(self) -> None:
+        if not self._purged_since_compaction:
+            return
+        if time.monotonic() - self._last_compaction < self.compaction_interval:
+            return
+        self.compact()
+
+    def compact(self) -> None:
+        """Reclaim space freed by purged documents."""
+        try:
+            compact_vector_store()
+
+            if engine.dialect.name == "sqlite":
+                # VACUUM cannot run inside a transaction
+                with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                    conn.execute(text("VACUUM"))
+
+            logger.info(f"Compacted indexes after purging {self._purged_since_compaction} documents")
+        except Exception as e:
+            logger.error(f"Error compacting indexes: {str(e)}")
+        finally:
+            self._purged_since_compaction = 0
+            self._last_compaction = time.monotonic()
+
+document_purger = DocumentPurger(
+    batch_size=settings.PURGE_BATCH_SIZE,
+    compaction_interval=settings.COMPACTION_INTERVAL_SECONDS
+)
@@ -1,92 +1,69 @@
+import codecs
 import os
+import re
 import tempfile
-from typing import List, Dict, Any, Tuple
+import time
+from collections import defaultdict
+from itertools import groupby, islice
+from typing import List, Dict, Any, Optional, Tuple, BinaryIO, Iterable, Iterator
 from pathlib import Path
 
-from pypdf import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-
 from app.core.config import settings
+from app.core.metrics import document_stage, observe_document_stage
 from app.db.models import Document, DocumentChunk
+from app.rag.chunker import get_chunker, iter_paragraphs
 from app.rag.embeddings import get_embeddings
-from app.rag.vector_store import add_chunks_to_vector_store
+from app.rag.vector_store import add_chunks_to_vector_store, delete_document_from_vector_store
+
+_page_marker = re.compile(r"\[Page (\d+)\]")
+# The start of a page marker that the next block may complete
+_partial_page_marker = re.compile(r"\[(?:P(?:a(?:g(?:e(?: \d*)?)?)?)?)?$")
 
 def process_document(document: Document, db) -> bool:
-    """Process a document by extracting text, splitting into chunks, and storing in vector DB."""
+    """Process a document by extracting text, splitting into chunks, and storing in vector DB.
+
+    Chunks are persisted and embedded INGEST_BATCH_SIZE at a time. TXT files
+    are read and chunked incrementally as well, so memory use stays flat
+    regardless of file size.
+    """
     try:
         # Update status to processing
         document.processing_status = "processing"
         document.processing_progress = 5
         db.commit()
 
-        # Extract text from document
-        text = extract_text(document.file_path, document.content_type)
+        # Stage times summed over batches, recorded once per document
+        timings: Dict[str, float] = defaultdict(float)
 
-        # Update progress
-        document.processing_progress = 30
-        db.commit()
+        if document.content_type == "text/plain":
+            chunks = timed(stream_txt_chunks(document.file_path, timings), timings, "split")
+        else:
+            # Extract text from document
+            with document_stage("extract", document.content_type):
+                text = extract_text(document.file_path, document.content_type)
 
-        # Split text into chunks
-        chunks = split_text(text)
+            # Split text into chunks
+            with document_stage("split", document.content_type):
+                chunk_list = split_text(text, document.content_type)
+            chunks = ((chunk, (i + 1) / len(chunk_list)) for i, chunk in enumerate(chunk_list))
 
-        # Update progress
-        document.processing_progress = 50
-        db.commit()
+        # Persist and embed chunks in batches, reporting progress from 5% to 95%
+        chunk_count = 0
+        while True:
+            batch = list(islice(chunks, settings.INGEST_BATCH_SIZE))
+            if not batch:
+                break
+            store_chunk_batch(document, db, [chunk for chunk, _ in batch], chunk_count, timings)
+            chunk_count += len(batch)
+            document.processing_progress = 5 + int(batch[-1][1] * 90)
+            db.commit()
 
-        # Create document chunks in database
-        db_chunks = []
-        for i, chunk in enumerate(chunks):
-            # Determine page number or section if possible
-            page_number = chunk.get("page_number")
-            section = chunk.get("section", "")
-
-            # Create a unique chunk ID
-            chunk_id = f"{document.id}-chunk-{i}"
-
-            # Create database record
-            db_chunk = DocumentChunk(
-                chunk_id=chunk_id,
-                content=chunk["text"],
-                page_number=page_number,
-                section=section,
-                document_id=document.id
-            )
-            db.add(db_chunk)
-            db_chunks.append(db_chunk)
-
-            # Update progress periodically (every 10 chunks or at the end)
-            if i % 10 == 0 or i == len(chunks) - 1:
-                progress = 50 + int((i / len(chunks)) * 25)  # 50-75% progress during chunking
-                document.processing_progress = min(progress, 75)
-                db.commit()
-
-        # Generate embeddings and store in vector DB
-        chunk_texts = [chunk.content for chunk in db_chunks]
-        chunk_ids = [chunk.chunk_id for chunk in db_chunks]
-        chunk_metadata = [
-            {
-                "document_id": document.id,
-                "document_name": document.filename,
-                "chunk_id": chunk.chunk_id,
-                "page_number": chunk.page_number,
-                "section": chunk.section
-            }
-            for chunk in db_chunks
-        ]
-
-        # Update progress
-        document.processing_progress = 80
-        db.commit()
+        if document.content_type == "text/plain":
+            # Reading the file happens while the chunker pulls text, so it's timed within "split"
+            timings["split"] -= timings["extract"]
+        for stage, seconds in timings.items():
+            observe_document_stage(stage, document.content_type, seconds)
 
-        try:
-            # Add chunks to vector store
-            add_chunks_to_vector_store(chunk_texts, chunk_ids, chunk_metadata)
-        except Exception as e:
-            print(f"Warning: Error adding chunks to vector store: {e}")
-            # Continue processing even if vector store fails
-            # This ensures the document is still marked as processed
-
-        # Mark document as processed regardless of vector store success
         document.processed = True
         document.processing_progress = 100
         document.processing_status = "completed"
@@ -95,11 +72,124 @@ def process_document(document: Document, db) -> bool:
         return True
     except Exception as e:
         print(f"Error processing document: {e}")
-        # Update status to error
-        document.processing_status = "error"
-        db.rollback()
+        try:
+            db.rollback()
+            document.processing_status = "error"
+            db.commit()
+            # Remove the chunks of the batches stored before the failure, so none of them are retrieved
+            db.query(DocumentChunk).filter(DocumentChunk.document_id == document.id).delete()
+            db.commit()
+            delete_document_from_vector_store(document.id)
+        except Exception as cleanup_error:
+            print(f"Error removing partial chunks of document {document.id}: {cleanup_error}")
+            db.rollback()
         return False
 
+def store_chunk_batch(
+    document: Document,
+    db,
+    chunks: List[Dict[str, Any]],
+    first_index: int,
+    timings: Dict[str, float]
+) -> None:
+    """Persist a batch of chunks, then add them to the vector store.
+
+    Embedding errors are raised, failing the document, rather than leaving it
+    completed with chunks missing from the vector store.
+    """
+    start = time.perf_counter()
+    chunk_ids = [f"{document.id}-chunk-{first_index + i}" for i in range(len(chunks))]
+    db.add_all([
+        DocumentChunk(
+            chunk_id=chunk_id,
+            content=chunk["text"],
+            page_number=chunk.get("page_number"),
+            section=chunk.get("section", ""),
+            document_id=document.id
+        )
+        for chunk_id, chunk in zip(chunk_ids, chunks)
+    ])
+    db.commit()
+    timings["persist"] += time.perf_counter() - start
+
+    # (texts come from the splitter output rather than reading back the compressed rows)
+    chunk_metadata = [
+        {
+            "document_id": document.id,
+            "document_name": document.filename,
+            "chunk_id": chunk_id,
+            "page_number": chunk.get("page_number"),
+            "section": chunk.get("section", "")
+        }
+        for chunk_id, chunk in zip(chunk_ids, chunks)
+    ]
+
+    start = time.perf_counter()
+    add_chunks_to_vector_store([chunk["text"] for chunk in chunks], chunk_ids, chunk_metadata)
+    timings["embed"] += time.perf_counter() - start
+
+def timed(iterator: Iterable, timings: Dict[str, float], stage: str) -> Iterator:
+    """Yield from an iterator, adding the time spent producing each item to a stage."""
+    iterator = iter(iterator)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            timings[stage] += time.perf_counter() - start
+            return
+        timings[stage] += time.perf_counter() - start
+        yield item
+
+def read_text_blocks(file: BinaryIO, block_size: int) -> Iterator[str]:
+    """Decode a UTF-8 file one block at a time."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        data = file.read(block_size)
+        if not data:
+            break
+        yield decoder.decode(data)
+    yield decoder.decode(b"", final=True)
+
+def iter_pages(blocks: Iterable[str]) -> Iterator[Tuple[Optional[int], str]]:
+    """Split a stream of text blocks at "[Page N]" markers into (page number, text) pieces.
+
+    Text before the first marker has no page number. A marker cut in two by
+    a block boundary is held back until the next block completes it.
+    """
+    page_number = None
+    pending = ""
+    for block in blocks:
+        pending += block
+        position = 0
+        for marker in _page_marker.finditer(pending):
+            if marker.start() > position:
+                yield page_number, pending[position:marker.start()]
+            page_number = int(marker.group(1))
+            position = marker.end()
+        partial = _partial_page_marker.search(pending, position)
+        end = partial.start() if partial else len(pending)
+        if end > position:
+            yield page_number, pending[position:end]
+        pending = pending[end:]
+    if pending:
+        yield page_number, pending
+
+def stream_txt_chunks(file_path: str, timings: Dict[str, float]) -> Iterator[Tuple[Dict[str, Any], float]]:
+    """Chunk a text file incrementally, yielding (chunk, fraction of the file read) pairs.
+
+    Like split_text, "[Page N]" markers set the page number of the chunks
+    after them, and no chunk spans two pages.
+    """
+    chunker = get_chunker("text/plain")
+    size = os.path.getsize(file_path) or 1
+    with open(file_path, "rb") as file:
+        blocks = timed(read_text_blocks(file, settings.TXT_READ_BLOCK_SIZE), timings, "extract")
+        for page_number, pieces in groupby(iter_pages(blocks), key=lambda piece: piece[0]):
+            paragraphs = iter_paragraphs((text for _, text in pieces), settings.TXT_READ_BLOCK_SIZE)
+            for chunk in chunker.iter_chunks(paragraphs):
+                yield {"text": chunk, "page_number": page_number, "section": ""}, min(file.tell() / size, 1.0)
+
 def extract_text(file_path: str, content_type: str) -> str:
     """Extract text from a document file."""
     if content_type == "application/pdf":
@@ -111,6 +201,8 @@ def extract_text(file_path: str, content_type: str) -> str:
 
 def extract_text_from_pdf(file_path: str) -> str:
     """Extract text from a PDF file."""
+    from pypdf import PdfReader
+
     reader = PdfReader(file_path)
     text = ""
     for i, page in enumerate(reader.pages):
@@ -124,14 +216,9 @@ def extract_text_from_txt(file_path: str) -> str:
     with open(file_path, 'r', encoding='utf-8') as file:
         return file.read()
 
-def split_text(text: str) -> List[Dict[str, Any]]:
-    """Split text into chunks with metadata."""
-    # Create a text splitter
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len,
-    )
+def split_text(text: str, content_type: str = "text/plain") -> List[Dict[str, Any]]:
+    """Split text into chunks with metadata, using the chunker for the content type."""
+    chunker = get_chunker(content_type)
 
     # Split the text
     chunks = []
@@ -151,23 +238,23 @@ def split_text(text: str) -> List[Dict[str, Any]]:
                     page_content = page_parts[1]
 
                     # Split the page content
-                    page_chunks = text_splitter.create_documents([page_content])
+                    page_chunks = chunker.split(page_content)
 
                     # Add chunks with page metadata
                     for chunk in page_chunks:
                         chunks.append({
-                            "text": chunk.page_content,
+                            "text": chunk,
                             "page_number": page_number,
                             "section": ""
                         })
                 except ValueError:
                     # If page number parsing fails, just use the current page counter
                     page_content = page
-                    page_chunks = text_splitter.create_documents([page_content])
+                    page_chunks = chunker.split(page_content)
 
                     for chunk in page_chunks:
                         chunks.append({
-                            "text": chunk.page_content,
+                            "text": chunk,
                             "page_number": current_page,
                             "section": ""
                         })
@@ -175,11 +262,9 @@ def split_text(text: str) -> List[Dict[str, Any]]:
                     current_page += 1
     else:
         # No page markers, just split the text
-        raw_chunks = text_splitter.create_documents([text])
-
-        for chunk in raw_chunks:
+        for chunk in chunker.split(text):
             chunks.append({
-                "text": chunk.page_content,
+                "text": chunk,
                 "page_number": None,
                 "section": ""
             })
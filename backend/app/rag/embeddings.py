@@ -1,12 +1,31 @@
-from typing import List
-from langchain_openai import OpenAIEmbeddings
+from typing import List, Tuple
 
 from app.core.config import settings
 
-def get_embeddings():
-    """Get the embedding model."""
+def embedding_signature() -> Tuple[str, str]:
+    """Get the configured (provider, model), which identifies the vectors it produces."""
+    if settings.EMBEDDING_PROVIDER == "fake":
+        # Fake embeddings differ only in their size
+        return "fake", f"fake-{settings.FAKE_EMBEDDING_DIM}"
+    return settings.EMBEDDING_PROVIDER, settings.EMBEDDING_MODEL
+
+def get_embeddings(provider: str = None, model: str = None):
+    """Get an embedding model, by default the configured one.
+
+    An index keeps being queried with the model it was built with, which is
+    passed explicitly while a re-embedding to a newly configured model runs.
+    Provider modules are imported here, on first use, rather than at startup.
+    """
+    if provider is None:
+        provider, model = embedding_signature()
+
+    if provider == "fake":
+        from app.rag.fake_embeddings import FakeEmbeddings
+        return FakeEmbeddings(dim=int(model.rsplit("-", 1)[1]))
+
+    from langchain_openai import OpenAIEmbeddings
     return OpenAIEmbeddings(
-        model=settings.EMBEDDING_MODEL,
+        model=model,
         openai_api_key=settings.OPENAI_API_KEY
     )
 
@@ -0,0 +1,43 @@
+import hashlib
+import math
+import re
+from typing import List
+from langchain.embeddings.base import Embeddings
+
+from app.core.config import settings
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic offline embeddings for load testing.
+
+    Each token is hashed into a signed bucket of a fixed-size vector (feature
+    hashing), so identical texts always embed identically and texts that share
+    words end up close together, without any model or network access.
+    """
+
+    _token_pattern = re.compile(r"\w+")
+
+    def __init__(self, dim: int = None):
+        self.dim = dim or settings.FAKE_EMBEDDING_DIM
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for token in self._token_pattern.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+
+        norm = math.sqrt(sum(value * value for value in vector))
+        if norm == 0:
+            # Give empty texts a stable non-zero vector
+            vector[0], norm = 1.0, 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        """Chroma embedding function interface."""
+        return self.embed_documents(input)
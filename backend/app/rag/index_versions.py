@@ -0,0 +1,80 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.models import VectorIndex
+from app.db.session import SessionLocal
+from app.rag.embeddings import embedding_signature
+
+# The chunk collection of stores created before indexes were versioned
+LEGACY_INDEX_NAME = "document_chunks"
+
+# Which indexes are active and building, shared briefly so queries don't hit the DB
+_index_cache = TTLCache(max_size=1, ttl_seconds=settings.VECTOR_INDEX_CACHE_TTL_SECONDS)
+
+def index_info(index: VectorIndex) -> Dict[str, Any]:
+    return {
+        "id": index.id,
+        "name": index.name,
+        "embedding_provider": index.embedding_provider,
+        "embedding_model": index.embedding_model,
+        "status": index.status,
+    }
+
+def centroid_collection_name(index_name: str) -> str:
+    """Name the centroid collection that belongs to a chunk collection."""
+    return index_name.replace("document_chunks", "document_centroids", 1)
+
+def load_indexes() -> Dict[str, Optional[Dict[str, Any]]]:
+    """Read the active index and the one being built, if any, from the database.
+
+    A store without any index yet adopts the legacy collection as its active
+    index, assuming it was embedded with the configured model.
+    """
+    db = SessionLocal()
+    try:
+        rows = db.query(VectorIndex).filter(VectorIndex.status.in_(["active", "building"])).all()
+        if not any(row.status == "active" for row in rows):
+            provider, model = embedding_signature()
+            db.add(VectorIndex(
+                name=LEGACY_INDEX_NAME,
+                embedding_provider=provider,
+                embedding_model=model,
+                status="active",
+                activated_at=datetime.now(timezone.utc)
+            ))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker adopted it first
+                db.rollback()
+            rows = db.query(VectorIndex).filter(VectorIndex.status.in_(["active", "building"])).all()
+
+        indexes: Dict[str, Optional[Dict[str, Any]]] = {"active": None, "building": None}
+        for row in rows:
+            indexes[row.status] = index_info(row)
+        return indexes
+    finally:
+        db.close()
+
+def get_indexes() -> Dict[str, Optional[Dict[str, Any]]]:
+    indexes = _index_cache.get("indexes")
+    if indexes is None:
+        indexes = load_indexes()
+        _index_cache.set("indexes", indexes)
+    return indexes
+
+def get_active_index() -> Dict[str, Any]:
+    """Get the index that serves queries."""
+    return get_indexes()["active"]
+
+def get_write_indexes() -> List[Dict[str, Any]]:
+    """Get the indexes new chunks go to: the active one, and the one being built."""
+    indexes = get_indexes()
+    return [index for index in (indexes["active"], indexes["building"]) if index is not None]
+
+def invalidate_index_cache() -> None:
+    _index_cache.clear()
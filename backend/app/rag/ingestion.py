@@ -0,0 +1,211 @@
+import logging
+import queue
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import or_, update
+
+from app.core.config import settings
+from app.db.models import Document, DocumentChunk
+from app.db.session import SessionLocal
+from app.rag.document_processor import process_document
+from app.rag.vector_store import delete_document_from_vector_store
+
+logger = logging.getLogger(__name__)
+
+class DocumentIngestor:
+    """Background workers that process uploaded documents off the request path.
+
+    Documents are queued by ID and processed by a small pool of threads. A
+    worker claims a document by moving it from "pending" to "processing" in
+    one conditional UPDATE, so the ingestors of several server workers never
+    process the same document twice. Claims are renewed while processing; a
+    document whose claim goes stale, because its server worker crashed or was
+    killed, is reset to "pending" without its partial chunks and processed
+    again.
+    """
+
+    def __init__(self, workers: int, claim_timeout: float):
+        self.workers = max(1, workers)
+        self.claim_timeout = claim_timeout
+        self._queue: "queue.Queue[Optional[int]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # Documents this process is processing, whose claims it renews
+        self._claimed: Set[int] = set()
+        self._claimed_lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the workers and re-queue uploaded documents that were never processed or were abandoned."""
+        with self._lock:
+            if any(thread.is_alive() for thread in self._threads):
+                return
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f"document-ingestor-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            self._threads.append(threading.Thread(target=self._renew_claims, name="document-ingestor-claims", daemon=True))
+            for thread in self._threads:
+                thread.start()
+
+        self.reclaim_stale()
+        db = SessionLocal()
+        try:
+            pending = (
+                db.query(Document.id)
+                .filter(
+                    Document.upload_batch_id.isnot(None),
+                    Document.processing_status == "pending",
+                    Document.deleted_at.is_(None),
+                )
+                .order_by(Document.id)
+                .all()
+            )
+            for row in pending:
+                self._queue.put(row.id)
+        finally:
+            db.close()
+
+    def stop(self, timeout: float = 10) -> None:
+        """Stop the workers after the documents they are currently processing.
+
+        Documents still queued stay pending and are picked up on next start.
+        """
+        with self._lock:
+            threads = self._threads
+            self._threads = []
+        alive = [thread for thread in threads if thread.is_alive()]
+        if not alive:
+            return
+        self._stop.set()
+        # Drop queued documents so the workers reach the stop markers promptly
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in range(self.workers):
+            self._queue.put(None)
+        for thread in alive:
+            thread.join(timeout)
+
+    def enqueue(self, document_ids: Iterable[int]) -> None:
+        """Schedule pending documents for processing."""
+        self.start()
+        for document_id in document_ids:
+            self._queue.put(document_id)
+
+    def _run(self) -> None:
+        while True:
+            document_id = self._queue.get()
+            if document_id is None:
+                return
+            try:
+                self.ingest_document(document_id)
+            except Exception as e:
+                logger.error(f"Error ingesting document {document_id}: {str(e)}")
+
+    def _renew_claims(self) -> None:
+        # Renewed several times per timeout, so one slow renewal doesn't let a claim lapse
+        while not self._stop.wait(self.claim_timeout / 4):
+            try:
+                with self._claimed_lock:
+                    claimed = list(self._claimed)
+                if claimed:
+                    db = SessionLocal()
+                    try:
+                        db.execute(
+                            update(Document)
+                            .where(Document.id.in_(claimed), Document.processing_status == "processing")
+                            .values(processing_claimed_at=datetime.now(timezone.utc))
+                        )
+                        db.commit()
+                    finally:
+                        db.close()
+                for document_id in self.reclaim_stale():
+                    self._queue.put(document_id)
+            except Exception as e:
+                logger.error(f"Error renewing document claims: {str(e)}")
+
+    def reclaim_stale(self) -> List[int]:
+        """Reset batch documents abandoned while processing to "pending"; returns their IDs."""
+        now = datetime.now(timezone.utc)
+        stale = or_(
+            Document.processing_claimed_at.is_(None),
+            Document.processing_claimed_at < now - timedelta(seconds=self.claim_timeout),
+        )
+        reclaimed = []
+        db = SessionLocal()
+        try:
+            abandoned = [
+                row.id for row in
+                db.query(Document.id)
+                .filter(
+                    Document.upload_batch_id.isnot(None),
+                    Document.processing_status == "processing",
+                    Document.deleted_at.is_(None),
+                    stale,
+                )
+                .all()
+            ]
+            for document_id in abandoned:
+                # Take the claim over first, so no other server worker resets the document too
+                taken = db.execute(
+                    update(Document)
+                    .where(Document.id == document_id, Document.processing_status == "processing", stale)
+                    .values(processing_claimed_at=now)
+                ).rowcount
+                db.commit()
+                if not taken:
+                    continue
+
+                # Drop its partial chunks before it can be claimed again
+                db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).delete()
+                db.commit()
+                delete_document_from_vector_store(document_id)
+                db.execute(
+                    update(Document)
+                    .where(Document.id == document_id)
+                    .values(processing_status="pending", processing_progress=0, processing_claimed_at=None)
+                )
+                db.commit()
+                reclaimed.append(document_id)
+                logger.warning(f"Document {document_id} was abandoned while processing; queued it again")
+            return reclaimed
+        finally:
+            db.close()
+
+    def ingest_document(self, document_id: int) -> None:
+        db = SessionLocal()
+        try:
+            claimed = db.execute(
+                update(Document)
+                .where(
+                    Document.id == document_id,
+                    Document.processing_status == "pending",
+                    Document.deleted_at.is_(None),
+                )
+                .values(processing_status="processing", processing_claimed_at=datetime.now(timezone.utc))
+            ).rowcount
+            db.commit()
+            if not claimed:
+                return
+
+            with self._claimed_lock:
+                self._claimed.add(document_id)
+            try:
+                document = db.query(Document).filter(Document.id == document_id).first()
+                process_document(document, db)
+            finally:
+                with self._claimed_lock:
+                    self._claimed.discard(document_id)
+        finally:
+            db.close()
+
+document_ingestor = DocumentIngestor(
+    workers=settings.INGEST_WORKERS,
+    claim_timeout=settings.INGEST_CLAIM_TIMEOUT_SECONDS
+)
@@ -0,0 +1,118 @@
+import logging
+import random
+import re
+import time
+from typing import List, Optional
+
+import requests
+from langchain.chat_models.base import BaseChatModel
+from langchain.schema import AIMessage, ChatGeneration, ChatResult
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class OllamaLLM(BaseChatModel):
+    """Custom LLM class for Ollama integration."""
+
+    model_name: Optional[str] = None
+    temperature: float = 0
+    base_url: Optional[str] = None
+    # Token context returned by the last generation, reusable for follow-ups
+    last_context: Optional[List[int]] = None
+
+    def __init__(self, model_name: str = None, temperature: float = 0, base_url: str = None):
+        """Initialize the Ollama LLM.
+
+        Args:
+            model_name: Name of the Ollama model to use
+            temperature: Temperature for generation (0-1)
+            base_url: Base URL for the Ollama API
+        """
+        super().__init__()
+        self.model_name = model_name or settings.OLLAMA_MODEL
+        self.temperature = temperature
+        self.base_url = base_url or settings.OLLAMA_URL
+
+    @property
+    def _llm_type(self) -> str:
+        return "ollama"
+
+    def _generate(self, messages, stop=None, run_manager=None, context: List[int] = None, **_):
+        """Generate a response from the Ollama API.
+
+        If ``context`` is given it is passed through to Ollama so the model
+        continues from a previous generation instead of re-reading its prompt.
+        """
+        try:
+            # Format messages for Ollama (ignore unused parameters for compatibility)
+            prompt = "\n".join([f"{m.type}: {m.content}" for m in messages])
+
+            payload = {
+                "model": self.model_name,
+                "prompt": prompt,
+                "temperature": self.temperature,
+                "stream": False,
+            }
+            if context:
+                payload["context"] = context
+
+            # Make API request
+            response = requests.post(f"{self.base_url}/api/generate", json=payload)
+
+            # Check for errors
+            if response.status_code != 200:
+                logger.error(f"Ollama API error: {response.status_code} - {response.text}")
+                raise Exception(f"Ollama API error: {response.text}")
+
+            # Return the response
+            data = response.json()
+            self.last_context = data.get("context")
+            return ChatResult(generations=[
+                ChatGeneration(message=AIMessage(content=data["response"]))
+            ])
+
+        except Exception as e:
+            logger.error(f"Error generating response with Ollama: {str(e)}")
+            raise
+
+# Seeded so error injection follows the same sequence on every run
+_fake_llm_rng = random.Random(settings.FAKE_LLM_SEED)
+
+class FakeLLM(BaseChatModel):
+    """Deterministic offline LLM for load testing.
+
+    Answers by echoing a citation for every document chunk in the prompt, after
+    sleeping for a configurable base latency plus a per-token generation time.
+    A configurable fraction of calls fails to exercise error handling.
+    """
+
+    latency_ms: float = 50
+    tokens_per_sec: float = 0
+    error_rate: float = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **_):
+        """Generate a canned answer that cites the chunks in the prompt."""
+        prompt = "\n".join(m.content for m in messages)
+
+        if _fake_llm_rng.random() < self.error_rate:
+            raise Exception("Fake LLM injected error")
+
+        citations = []
+        for match in re.finditer(r"Document: (.+)\n(?:Location: (.+)\n)?Content: (.*)", prompt):
+            doc_name, location, content = match.groups()
+            citation = f"[{doc_name} - {location}]" if location else f"[{doc_name}]"
+            citations.append(f"{content[:80].strip()} {citation}")
+
+        answer = "\n".join(citations) or "I couldn't find information about this in your documents."
+
+        delay = self.latency_ms / 1000
+        if self.tokens_per_sec > 0:
+            delay += len(answer.split()) / self.tokens_per_sec
+        time.sleep(delay)
+
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer))])
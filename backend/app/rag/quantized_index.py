@@ -0,0 +1,447 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Rows scored per block, bounding the temporary float copies of the codes
+SCAN_BLOCK_ROWS = 65536
+
+# Number of set bits in every byte value, for Hamming distances
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+# Stands in for a missing page number in the in-memory page column
+NO_PAGE = -1
+
+class QuantizedIndex:
+    """Chunk vectors quantized in memory, with full-precision copies on disk for rescoring.
+
+    In "int8" mode each vector is scaled into signed bytes (4x smaller than
+    float32); in "binary" mode only the sign of each dimension is kept (32x
+    smaller). Searches scan the codes for candidates, then rescore those
+    candidates with exact squared L2 distances read from a memory-mapped
+    float32 file, so only the codes and a few per-row columns stay resident.
+
+    Files under ``path``: ``codes-<generation>.bin`` and
+    ``vectors-<generation>.f32`` hold one row per chunk in insertion order,
+    and ``rows.sqlite`` holds each row's chunk ID, metadata, and deletion
+    flag. compact() writes the next generation without deleted rows and
+    switches to it in the same transaction that renumbers the rows.
+    """
+
+    def __init__(self, path: str, mode: str):
+        if mode not in ("int8", "binary"):
+            raise ValueError(f"Unsupported quantization mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.dim: Optional[int] = None
+        self.generation = 0
+        self.size = 0
+        self._lock = threading.RLock()
+        self._vectors = None
+
+        os.makedirs(path, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(path, "rows.sqlite"), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS rows (
+                row INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL,
+                document_id INTEGER NOT NULL,
+                page_number INTEGER,
+                norm REAL NOT NULL,
+                scale REAL NOT NULL,
+                metadata TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS ix_rows_chunk_id ON rows (chunk_id);
+            CREATE INDEX IF NOT EXISTS ix_rows_document_id ON rows (document_id);
+        """)
+        self._load()
+
+    @property
+    def code_size(self) -> int:
+        return self.dim if self.mode == "int8" else (self.dim + 7) // 8
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _codes_file(self, generation: int = None) -> str:
+        return self._file(f"codes-{self.generation if generation is None else generation}.bin")
+
+    def _vectors_file(self, generation: int = None) -> str:
+        return self._file(f"vectors-{self.generation if generation is None else generation}.f32")
+
+    def _load(self) -> None:
+        meta = dict(self._db.execute("SELECT key, value FROM meta").fetchall())
+        if meta.get("mode", self.mode) != self.mode:
+            raise ValueError(
+                f"Quantized index at {self.path} was built in {meta['mode']} mode; rebuild it for {self.mode}"
+            )
+        self.dim = int(meta["dim"]) if "dim" in meta else None
+        self.generation = int(meta.get("generation", 0))
+
+        # Remove files of other generations left by an interrupted or finished compaction
+        current = {os.path.basename(self._codes_file()), os.path.basename(self._vectors_file())}
+        for name in os.listdir(self.path):
+            if name.startswith(("codes-", "vectors-")) and name not in current:
+                os.remove(self._file(name))
+
+        rows = self._db.execute(
+            "SELECT document_id, page_number, norm, scale, deleted FROM rows ORDER BY row"
+        ).fetchall()
+        self.size = len(rows)
+        self._allocate(self.size)
+        if rows:
+            columns = list(zip(*rows))
+            self._document_ids[:self.size] = columns[0]
+            self._page_numbers[:self.size] = [NO_PAGE if page is None else page for page in columns[1]]
+            self._norms[:self.size] = columns[2]
+            self._scales[:self.size] = columns[3]
+            self._deleted[:self.size] = columns[4]
+
+        if self.dim is not None:
+            # Drop any trailing rows of an append interrupted before its rows were committed
+            self._truncate(self._codes_file(), self.size * self.code_size)
+            self._truncate(self._vectors_file(), self.size * self.dim * 4)
+            codes = np.fromfile(self._codes_file(), dtype=self._code_dtype()) if self.size else np.empty(0)
+            self._codes[:self.size] = codes.reshape(self.size, self.code_size)
+
+    def _truncate(self, path: str, length: int) -> None:
+        if os.path.exists(path) and os.path.getsize(path) > length:
+            with open(path, "r+b") as file:
+                file.truncate(length)
+
+    def _code_dtype(self):
+        return np.int8 if self.mode == "int8" else np.uint8
+
+    def _allocate(self, capacity: int) -> None:
+        """Size the in-memory columns for at least ``capacity`` rows, keeping current rows."""
+        capacity = max(capacity, 1024)
+        code_size = self.code_size if self.dim is not None else 0
+        columns = {
+            "_codes": np.zeros((capacity, code_size), dtype=self._code_dtype()),
+            "_document_ids": np.zeros(capacity, dtype=np.int64),
+            "_page_numbers": np.full(capacity, NO_PAGE, dtype=np.int32),
+            "_norms": np.zeros(capacity, dtype=np.float32),
+            "_scales": np.zeros(capacity, dtype=np.float32),
+            "_deleted": np.zeros(capacity, dtype=bool),
+        }
+        for name, column in columns.items():
+            current = getattr(self, name, None)
+            if current is not None and self.size:
+                column[:self.size] = current[:self.size]
+            setattr(self, name, column)
+
+    def _encode(self, vectors: np.ndarray) -> tuple:
+        """Quantize float32 rows; returns (codes, per-row scales)."""
+        if self.mode == "binary":
+            return np.packbits(vectors > 0, axis=1), np.ones(len(vectors), dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def _full_vectors(self) -> np.ndarray:
+        """Memory-map the full-precision rows, remapping after appends."""
+        if self._vectors is None or len(self._vectors) != self.size:
+            self._vectors = np.memmap(
+                self._vectors_file(), dtype=np.float32, mode="r", shape=(self.size, self.dim)
+            )
+        return self._vectors
+
+    def add(self, ids: List[str], embeddings: Sequence[Sequence[float]], metadatas: List[Dict[str, Any]]) -> None:
+        """Append chunks; a chunk ID that is already indexed replaces the old row."""
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    [("mode", self.mode), ("dim", str(self.dim))]
+                )
+                self._allocate(self.size)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {vectors.shape[1]}")
+
+            self._delete_rows(self._rows_for_chunk_ids(ids))
+
+            codes, scales = self._encode(vectors)
+            norms = (vectors ** 2).sum(axis=1)
+            with open(self._codes_file(), "ab") as file:
+                file.write(codes.tobytes())
+            with open(self._vectors_file(), "ab") as file:
+                file.write(vectors.tobytes())
+
+            start = self.size
+            self._db.executemany(
+                "INSERT INTO rows (row, chunk_id, document_id, page_number, norm, scale, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        start + i, chunk_id, metadata["document_id"], metadata.get("page_number"),
+                        float(norms[i]), float(scales[i]), json.dumps(metadata)
+                    )
+                    for i, (chunk_id, metadata) in enumerate(zip(ids, metadatas))
+                ]
+            )
+            self._db.commit()
+
+            end = start + len(ids)
+            if end > len(self._codes):
+                self._allocate(end * 2)
+            self._codes[start:end] = codes
+            self._document_ids[start:end] = [metadata["document_id"] for metadata in metadatas]
+            self._page_numbers[start:end] = [
+                NO_PAGE if metadata.get("page_number") is None else metadata["page_number"]
+                for metadata in metadatas
+            ]
+            self._norms[start:end] = norms
+            self._scales[start:end] = scales
+            self._deleted[start:end] = False
+            self.size = end
+
+    def _rows_for_chunk_ids(self, chunk_ids: Sequence[str]) -> List[int]:
+        rows = []
+        for start in range(0, len(chunk_ids), 500):
+            batch = list(chunk_ids[start:start + 500])
+            rows.extend(row for (row,) in self._db.execute(
+                f"SELECT row FROM rows WHERE deleted = 0 AND chunk_id IN ({','.join('?' * len(batch))})",
+                batch
+            ))
+        return rows
+
+    def _delete_rows(self, rows: Sequence[int]) -> None:
+        if not len(rows):
+            return
+        rows = [int(row) for row in rows]
+        self._db.executemany("UPDATE rows SET deleted = 1 WHERE row = ?", [(row,) for row in rows])
+        self._db.commit()
+        self._deleted[rows] = True
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        """Delete chunks by ID or by filter."""
+        with self._lock:
+            if ids is not None:
+                self._delete_rows(self._rows_for_chunk_ids(ids))
+            if where is not None:
+                self._delete_rows(np.flatnonzero(self._mask(where)))
+
+    def count(self) -> int:
+        return int(self.size - self._deleted[:self.size].sum())
+
+    def _mask(self, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        """Evaluate a Chroma-style where filter over the live rows."""
+        mask = ~self._deleted[:self.size]
+        if not where:
+            return mask
+        return mask & self._filter_mask(where)
+
+    def _filter_mask(self, where: Dict[str, Any]) -> np.ndarray:
+        if "$and" in where:
+            mask = np.ones(self.size, dtype=bool)
+            for condition in where["$and"]:
+                mask &= self._filter_mask(condition)
+            return mask
+        if "$or" in where:
+            mask = np.zeros(self.size, dtype=bool)
+            for condition in where["$or"]:
+                mask |= self._filter_mask(condition)
+            return mask
+
+        (key, condition), = where.items()
+        if key == "chunk_id":
+            # Chunk IDs aren't kept in memory; look their rows up instead
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            (op, value), = condition.items()
+            ids = [value] if op in ("$eq", "$ne") else value
+            mask = np.zeros(self.size, dtype=bool)
+            mask[self._rows_for_chunk_ids(ids)] = True
+            return mask if op in ("$eq", "$in") else ~mask
+
+        if key == "document_id":
+            column, present = self._document_ids[:self.size], np.ones(self.size, dtype=bool)
+        elif key == "page_number":
+            column = self._page_numbers[:self.size]
+            present = column != NO_PAGE
+        else:
+            raise ValueError(f"Unsupported filter key for the quantized index: {key}")
+
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        mask = present.copy()
+        for op, value in condition.items():
+            if op == "$eq":
+                mask &= column == value
+            elif op == "$ne":
+                mask &= column != value
+            elif op == "$in":
+                mask &= np.isin(column, value)
+            elif op == "$nin":
+                mask &= ~np.isin(column, value)
+            elif op == "$gt":
+                mask &= column > value
+            elif op == "$gte":
+                mask &= column >= value
+            elif op == "$lt":
+                mask &= column < value
+            elif op == "$lte":
+                mask &= column <= value
+            else:
+                raise ValueError(f"Unsupported filter operator for the quantized index: {op}")
+        return mask
+
+    def _approximate_distances(self, query: np.ndarray) -> np.ndarray:
+        """Score every row from its code alone: squared L2 for int8, Hamming distance for binary."""
+        distances = np.empty(self.size, dtype=np.float32)
+        if self.mode == "binary":
+            query_code = np.packbits(query > 0)
+            for start in range(0, self.size, SCAN_BLOCK_ROWS):
+                end = min(start + SCAN_BLOCK_ROWS, self.size)
+                distances[start:end] = POPCOUNT[self._codes[start:end] ^ query_code].sum(axis=1)
+        else:
+            query_norm = float(query @ query)
+            for start in range(0, self.size, SCAN_BLOCK_ROWS):
+                end = min(start + SCAN_BLOCK_ROWS, self.size)
+                dots = (self._codes[start:end].astype(np.float32) @ query) * self._scales[start:end]
+                distances[start:end] = self._norms[start:end] + query_norm - 2 * dots
+        return distances
+
+    def _results(self, rows: np.ndarray, distances: np.ndarray) -> List[Dict[str, Any]]:
+        stored = {
+            row: (chunk_id, metadata)
+            for row, chunk_id, metadata in self._db.execute(
+                f"SELECT row, chunk_id, metadata FROM rows WHERE row IN ({','.join('?' * len(rows))})",
+                [int(row) for row in rows]
+            )
+        } if len(rows) else {}
+        results = []
+        for row, distance in zip(rows, distances):
+            chunk_id, row_metadata = stored[int(row)]
+            row_metadata = json.loads(row_metadata)
+            results.append({
+                "id": chunk_id,
+                "metadata": {key: value for key, value in row_metadata.items() if value is not None},
+                "distance": float(distance)
+            })
+        return results
+
+    def _rescore(self, rows: np.ndarray, query: np.ndarray, n_results: int) -> List[Dict[str, Any]]:
+        rows = np.sort(rows)  # Sequential reads from the memory-mapped file
+        distances = ((self._full_vectors()[rows] - query) ** 2).sum(axis=1)
+        order = np.argsort(distances, kind="stable")[:n_results]
+        return self._results(rows[order], distances[order])
+
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+        candidates: int = 50
+    ) -> List[Dict[str, Any]]:
+        """Find candidates by code distance, then rescore them at full precision."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        with self._lock:
+            if not self.size:
+                return []
+            mask = self._mask(where)
+            eligible = int(mask.sum())
+            if not eligible:
+                return []
+
+            distances = self._approximate_distances(query)
+            distances[~mask] = np.inf
+            k = min(max(candidates, n_results), eligible)
+            rows = np.argpartition(distances, k - 1)[:k] if k < self.size else np.flatnonzero(mask)
+            return self._rescore(rows, query, n_results)
+
+    def exact_search(
+        self,
+        query_embedding: Sequence[float],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Rank every row matching the filter at full precision; for small scopes."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        with self._lock:
+            rows = np.flatnonzero(self._mask(where))
+            if not len(rows):
+                return []
+            return self._rescore(rows, query, n_results)
+
+    def get(self, where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Get the full-precision embeddings and metadata of the rows matching a filter."""
+        with self._lock:
+            rows = np.flatnonzero(self._mask(where))
+            results = self._results(rows, np.zeros(len(rows)))
+            return {
+                "ids": [result["id"] for result in results],
+                "embeddings": np.asarray(self._full_vectors()[rows]) if len(rows) else [],
+                "metadatas": [result["metadata"] for result in results],
+            }
+
+    def document_ids(self) -> List[int]:
+        with self._lock:
+            return sorted(set(self._document_ids[:self.size][~self._deleted[:self.size]].tolist()))
+
+    def memory_bytes(self) -> int:
+        """Resident bytes of the in-memory columns for the current rows."""
+        per_row = (
+            self._codes.itemsize * self.code_size
+            + self._document_ids.itemsize + self._page_numbers.itemsize
+            + self._norms.itemsize + self._scales.itemsize + self._deleted.itemsize
+        ) if self.dim is not None else 0
+        return per_row * self.size
+
+    def compact(self) -> None:
+        """Rewrite the index without deleted rows."""
+        with self._lock:
+            live = np.flatnonzero(~self._deleted[:self.size])
+            if len(live) == self.size:
+                return
+
+            generation = self.generation + 1
+            vectors = self._full_vectors()
+            with open(self._codes_file(generation), "wb") as codes_file, \
+                    open(self._vectors_file(generation), "wb") as vectors_file:
+                for start in range(0, len(live), SCAN_BLOCK_ROWS):
+                    rows = live[start:start + SCAN_BLOCK_ROWS]
+                    codes_file.write(self._codes[rows].tobytes())
+                    vectors_file.write(np.asarray(vectors[rows]).tobytes())
+
+            # Renumber the remaining rows in order, so row N is the Nth row of the new files
+            self._db.execute("DELETE FROM rows WHERE deleted = 1")
+            self._db.execute("CREATE TEMP TABLE renumbered (old_row INTEGER PRIMARY KEY, new_row INTEGER)")
+            self._db.execute(
+                "INSERT INTO renumbered SELECT row, ROW_NUMBER() OVER (ORDER BY row) - 1 FROM rows"
+            )
+            # Via negative numbers, so no row collides with one not yet renumbered
+            self._db.execute("UPDATE rows SET row = -1 - (SELECT new_row FROM renumbered WHERE old_row = rows.row)")
+            self._db.execute("UPDATE rows SET row = -1 - row")
+            self._db.execute("DROP TABLE renumbered")
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('generation', ?)", (str(generation),)
+            )
+            self._db.commit()
+
+            self._vectors = None
+            self._load()
+
+    def destroy(self) -> None:
+        """Close the index and delete its files; subdirectories (other indexes) are left alone."""
+        with self._lock:
+            self._vectors = None
+            self._db.close()
+            for name in os.listdir(self.path):
+                if name.startswith(("codes-", "vectors-", "rows.sqlite")):
+                    os.remove(self._file(name))
+            try:
+                os.rmdir(self.path)
+            except OSError:
+                # Still holds other indexes
+                pass
@@ -1,69 +1,191 @@
-from typing import List, Dict, Any, Tuple
-import requests
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import heapq
+import itertools
+import math
+import threading
+import time
 import logging
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import ChatPromptTemplate
-from langchain.schema import StrOutputParser
-from langchain.chat_models.base import BaseChatModel
 
 from app.core.config import settings
-from app.rag.vector_store import query_vector_store
-from app.db.models import Query, QuerySource, Document
+from app.core.metrics import observe_query_stage, query_stage
+from app.rag.chunk_store import attach_chunk_texts
+from app.rag.deletion import get_deleted_document_ids
+from app.rag.reranker import rerank_chunks, rerank_enabled
+from app.rag.session_cache import ConversationSession, session_cache
+from app.rag.vector_store import combine_filters, query_vector_store
+from app.db.models import Document, DocumentChunk, Query
+from app.db.write_behind import query_writer
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
+if TYPE_CHECKING:
+    # Provider and LangChain modules are slow to import; they load on first use
+    from langchain.chat_models.base import BaseChatModel
+    from langchain.prompts import ChatPromptTemplate
+
+    from app.core.slots import SharedSlots
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
-class OllamaLLM(BaseChatModel):
-    """Custom LLM class for Ollama integration."""
+# Slots freed by other worker processes don't wake this process's waiters, so they poll
+SHARED_SLOT_POLL_SECONDS = 0.05
 
-    def __init__(self, model_name: str = None, temperature: float = 0, base_url: str = None):
-        """Initialize the Ollama LLM.
+class AdmissionRejected(Exception):
+    """Raised when a provider's wait queue is full or the wait times out."""
 
-        Args:
-            model_name: Name of the Ollama model to use
-            temperature: Temperature for generation (0-1)
-            base_url: Base URL for the Ollama API
-        """
-        super().__init__()
-        self.model_name = model_name or settings.OLLAMA_MODEL
-        self.temperature = temperature
-        self.base_url = base_url or settings.OLLAMA_URL
+    def __init__(self, provider: str, retry_after: int):
+        super().__init__(f"LLM provider '{provider}' is overloaded, retry after {retry_after}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Bounds concurrent generations for one provider with a priority wait queue.
+
+    Interactive requests are always served before batch/background ones, and
+    batch requests may only fill half of the wait queue so that a backlog of
+    background work can never lock out interactive users. With shared_slots,
+    every generation also holds one of the slots shared by all worker
+    processes, so the limit applies to the whole server.
+    """
 
-    def _generate(self, messages, **_):
-        """Generate a response from the Ollama API."""
+    PRIORITIES = {"interactive": 0, "batch": 1}
+
+    def __init__(
+        self,
+        provider: str,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+        shared_slots: Optional["SharedSlots"] = None
+    ):
+        self.provider = provider
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.shared_slots = shared_slots
+        self._cond = threading.Condition()
+        self._active = 0
+        self._shared_held: List[int] = []
+        self._waiters: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._avg_service_time = 1.0
+
+    def retry_after(self) -> int:
+        """Estimate how many seconds until a slot is likely to free up."""
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self._avg_service_time * backlog / self.max_concurrency))
+
+    def _admit(self) -> bool:
+        """Take a generation slot if one is free; called with the condition held."""
+        if self._active >= self.max_concurrency:
+            return False
+        if self.shared_slots is not None:
+            slot = self.shared_slots.try_acquire()
+            if slot is None:
+                return False
+            self._shared_held.append(slot)
+        self._active += 1
+        return True
+
+    def acquire(self, priority: str = "interactive") -> None:
+        """Block until a generation slot is available or reject the request."""
+        rank = self.PRIORITIES.get(priority, self.PRIORITIES["batch"])
+        with self._cond:
+            if not self._waiters and self._admit():
+                return
+
+            queue_limit = self.max_queue if rank == 0 else self.max_queue // 2
+            if len(self._waiters) >= queue_limit:
+                raise AdmissionRejected(self.provider, self.retry_after())
+
+            ticket = (rank, next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self._waiters[0] != ticket or not self._admit():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise AdmissionRejected(self.provider, self.retry_after())
+                    if self.shared_slots is not None:
+                        remaining = min(remaining, SHARED_SLOT_POLL_SECONDS)
+                    self._cond.wait(remaining)
+            except BaseException:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+                raise
+
+            heapq.heappop(self._waiters)
+            self._cond.notify_all()
+
+    def release(self, service_time: float) -> None:
+        """Free a generation slot and update the service time estimate."""
+        with self._cond:
+            self._active -= 1
+            if self._shared_held:
+                # Shared slots are interchangeable, so any one held by this process is given back
+                self.shared_slots.release(self._shared_held.pop())
+            self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * service_time
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority: str = "interactive"):
+        """Context manager holding a generation slot for the duration of the block.
+
+        Yields the number of seconds spent waiting in the queue.
+        """
+        queued_at = time.monotonic()
+        self.acquire(priority)
+        start = time.monotonic()
         try:
-            # Format messages for Ollama (ignore unused parameters for compatibility)
-            prompt = "\n".join([f"{m.type}: {m.content}" for m in messages])
-
-            # Make API request
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model_name,
-                    "prompt": prompt,
-                    "temperature": self.temperature,
-                }
-            )
+            yield start - queued_at
+        finally:
+            self.release(time.monotonic() - start)
+
+_admission_controllers: Dict[str, AdmissionController] = {}
+_admission_lock = threading.Lock()
 
-            # Check for errors
-            if response.status_code != 200:
-                logger.error(f"Ollama API error: {response.status_code} - {response.text}")
-                raise Exception(f"Ollama API error: {response.text}")
+def get_admission_controller(provider: str = None) -> AdmissionController:
+    """Get this process's admission controller for an LLM provider.
 
-            # Return the response
-            return response.json()["response"]
+    The concurrency limit is for the whole server: with LLM_SLOT_DIR set,
+    the WORKERS processes take generation slots from one pool of lock files
+    there. Each process queues its share of LLM_MAX_QUEUE.
+    """
+    provider = provider or settings.LLM_PROVIDER
+    with _admission_lock:
+        controller = _admission_controllers.get(provider)
+        if controller is None:
+            max_concurrency = (
+                settings.OLLAMA_MAX_CONCURRENCY if provider == "ollama"
+                else settings.LLM_MAX_CONCURRENCY
+            )
+            shared_slots = None
+            if settings.LLM_SLOT_DIR:
+                from app.core.slots import SharedSlots
+                shared_slots = SharedSlots(settings.LLM_SLOT_DIR, provider, max_concurrency)
+            controller = AdmissionController(
+                provider,
+                max_concurrency=max_concurrency,
+                max_queue=math.ceil(settings.LLM_MAX_QUEUE / max(1, settings.WORKERS)),
+                queue_timeout=settings.LLM_QUEUE_TIMEOUT,
+                shared_slots=shared_slots
+            )
+            _admission_controllers[provider] = controller
+        return controller
 
-        except Exception as e:
-            logger.error(f"Error generating response with Ollama: {str(e)}")
-            raise
+def get_llm() -> "BaseChatModel":
+    """Get the appropriate LLM based on configuration settings.
 
-def get_llm() -> BaseChatModel:
-    """Get the appropriate LLM based on configuration settings."""
+    Provider modules are imported here, on first use, rather than at startup.
+    """
     try:
         if settings.LLM_PROVIDER == "openai":
             logger.info(f"Using OpenAI model: {settings.LLM_MODEL}")
+            from langchain_openai import ChatOpenAI
             return ChatOpenAI(
                 model=settings.LLM_MODEL,
                 temperature=0,
@@ -71,6 +193,7 @@ def get_llm() -> BaseChatModel:
             )
         elif settings.LLM_PROVIDER == "google":
             logger.info(f"Using Google model: {settings.GOOGLE_MODEL}")
+            from langchain_google_genai import ChatGoogleGenerativeAI
             return ChatGoogleGenerativeAI(
                 model=settings.GOOGLE_MODEL,
                 temperature=0,
@@ -78,14 +201,24 @@ def get_llm() -> BaseChatModel:
             )
         elif settings.LLM_PROVIDER == "ollama":
             logger.info(f"Using Ollama model: {settings.OLLAMA_MODEL}")
+            from app.rag.llms import OllamaLLM
             return OllamaLLM(
                 model_name=settings.OLLAMA_MODEL,
                 temperature=0,
                 base_url=settings.OLLAMA_URL
             )
+        elif settings.LLM_PROVIDER == "fake":
+            logger.info("Using fake offline LLM")
+            from app.rag.llms import FakeLLM
+            return FakeLLM(
+                latency_ms=settings.FAKE_LLM_LATENCY_MS,
+                tokens_per_sec=settings.FAKE_LLM_TOKENS_PER_SEC,
+                error_rate=settings.FAKE_LLM_ERROR_RATE
+            )
         else:
             # Default to OpenAI if provider is not recognized
             logger.warning(f"Unknown LLM provider: {settings.LLM_PROVIDER}. Defaulting to OpenAI.")
+            from langchain_openai import ChatOpenAI
             return ChatOpenAI(
                 model=settings.LLM_MODEL,
                 temperature=0,
@@ -114,8 +247,18 @@ def format_chunks(chunks: List[Dict[str, Any]]) -> List[str]:
 
     return formatted_chunks
 
-def get_rag_prompt() -> ChatPromptTemplate:
-    """Get the RAG prompt template."""
+def format_history(turns: List[Tuple[str, str]]) -> str:
+    """Format previous conversation turns for the prompt."""
+    return "\n\n".join(f"Question: {question}\nAnswer: {answer}" for question, answer in turns)
+
+def get_rag_prompt(with_history: bool = False) -> "ChatPromptTemplate":
+    """Get the RAG prompt template.
+
+    The document chunks come first so that, within a conversation, the prompt
+    prefix stays identical between turns and provider-side prompt caching applies.
+    """
+    from langchain.prompts import ChatPromptTemplate
+
     system_prompt = """You are a helpful assistant that answers questions based ONLY on the provided document chunks.
 Your task is to provide accurate answers with citations for every piece of information.
 
@@ -133,11 +276,17 @@ Format your response as follows:
 2. Include inline citations for every piece of information using [Document Name - Location] format
 """
 
+    history_prompt = """
+Earlier in this conversation:
+
+{history}
+""" if with_history else ""
+
     human_prompt = """
 Here are the relevant document chunks:
 
 {context}
-
+""" + history_prompt + """
 Question: {question}
 
 Remember to ONLY use information from these chunks and include citations for every piece of information.
@@ -148,60 +297,309 @@ Remember to ONLY use information from these chunks and include citations for eve
         ("human", human_prompt)
     ])
 
+def get_followup_prompt() -> "ChatPromptTemplate":
+    """Get the prompt for a follow-up turn that continues an Ollama context.
+
+    The model already holds the instructions, earlier chunks, and answers in its
+    context, so only the newly retrieved chunks and the question are sent.
+    """
+    from langchain.prompts import ChatPromptTemplate
+
+    human_prompt = """
+Here are additional relevant document chunks:
+
+{context}
+
+Follow-up question: {question}
+
+Remember to ONLY use information from the document chunks in this conversation and include citations for every piece of information.
+"""
+
+    return ChatPromptTemplate.from_messages([
+        ("human", human_prompt)
+    ])
+
 def save_query_to_db(
     query_text: str,
     answer: str,
     user_id: int,
     relevant_chunks: List[Dict[str, Any]],
-    db: Session
-) -> Tuple[Query, List[Dict[str, Any]]]:
-    """Save the query, response, and sources to the database."""
-    # Save the query and response
-    db_query = Query(
-        query_text=query_text,
-        response=answer,
-        user_id=user_id
-    )
-    db.add(db_query)
-    db.flush()  # Get the query ID
+    session_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Queue the query, response, and sources for persistence and build the response sources.
 
-    # Save the sources
+    Source details come straight from the chunk metadata, and the inserts are
+    written in batches by the write-behind buffer, so no database round trip
+    happens on the request path.
+    """
     sources_data = []
     for chunk in relevant_chunks:
-        # Get the document
-        document_id = chunk["metadata"]["document_id"]
-        document = db.query(Document).filter(Document.id == document_id).first()
-
-        if document:
-            # Create a query source
-            query_source = QuerySource(
-                chunk_id=chunk["id"],
-                document_id=document_id,
-                query_id=db_query.id
+        metadata = chunk["metadata"]
+        sources_data.append({
+            "document_id": metadata["document_id"],
+            "document_name": metadata["document_name"],
+            "chunk_id": chunk["id"],
+            "page_number": metadata.get("page_number"),
+            "section": metadata.get("section"),
+            "content": chunk["text"][:200] + "..." if len(chunk["text"]) > 200 else chunk["text"]
+        })
+
+    query_writer.submit(query_text, answer, user_id, sources_data, session_id=session_id)
+    return sources_data
+
+def candidate_count(n_results: int) -> int:
+    """Number of chunks to retrieve so that reranking has candidates to choose from."""
+    return max(n_results, settings.RERANK_CANDIDATES) if rerank_enabled() else n_results
+
+def resolve_document_scope(
+    db: Session,
+    user_id: int,
+    document_ids: Optional[List[int]] = None,
+    created_after: Optional[datetime] = None
+) -> Optional[List[int]]:
+    """Resolve document scoping to the IDs of the user's matching, non-deleted documents.
+
+    Returns None when the query isn't scoped to documents.
+    """
+    if document_ids is None and created_after is None:
+        return None
+
+    query = db.query(Document.id).filter(Document.owner_id == user_id, Document.deleted_at.is_(None))
+    if document_ids is not None:
+        query = query.filter(Document.id.in_(document_ids))
+    if created_after is not None:
+        if created_after.tzinfo is not None:
+            created_after = created_after.astimezone(timezone.utc)
+        # Inclusive, so documents created in the same (whole-second) timestamp aren't dropped
+        query = query.filter(Document.created_at >= created_after)
+    return [row.id for row in query.all()]
+
+def count_chunks(db: Session, document_ids: List[int]) -> int:
+    return (
+        db.query(func.count(DocumentChunk.id))
+        .filter(DocumentChunk.document_id.in_(document_ids))
+        .scalar()
+    )
+
+def page_range_filter(pages: Optional[Tuple[Optional[int], Optional[int]]]) -> Optional[Dict[str, Any]]:
+    """Translate an inclusive (start, end) page range into a where filter."""
+    if pages is None:
+        return None
+    start, end = pages
+    return combine_filters(
+        {"page_number": {"$gte": start}} if start is not None else None,
+        {"page_number": {"$lte": end}} if end is not None else None
+    )
+
+def retrieve_chunks(
+    db: Session,
+    query_text: str,
+    n_results: int = 5,
+    filter_dict: Dict[str, Any] = None,
+    document_ids: Optional[List[int]] = None,
+    pages: Optional[Tuple[Optional[int], Optional[int]]] = None
+) -> List[Dict[str, Any]]:
+    """Query the vector store, excluding documents that are deleted but not yet purged.
+
+    document_ids (from resolve_document_scope) and pages are pushed down into
+    the search as metadata filters. Scopes of at most EXACT_SEARCH_MAX_CHUNKS
+    chunks are searched exactly instead of through the index.
+    """
+    exact = False
+    if document_ids is not None:
+        if not document_ids:
+            return []
+        # Already resolved to live documents, so no tombstone filter is needed
+        document_filter = {"document_id": {"$in": document_ids}}
+        exact = count_chunks(db, document_ids) <= settings.EXACT_SEARCH_MAX_CHUNKS
+    else:
+        deleted_ids = get_deleted_document_ids(db)
+        document_filter = {"document_id": {"$nin": sorted(deleted_ids)}} if deleted_ids else None
+
+    return query_vector_store(
+        query_text,
+        n_results=n_results,
+        filter_dict=combine_filters(filter_dict, page_range_filter(pages)),
+        document_filter=document_filter,
+        exact=exact
+    )
+
+def generate_answer(
+    llm: "BaseChatModel",
+    prompt: "ChatPromptTemplate",
+    inputs: Dict[str, Any],
+    priority: str = "interactive",
+    **llm_kwargs
+) -> str:
+    """Format the prompt and run the LLM once the provider admits us."""
+    from langchain.schema import StrOutputParser
+
+    with query_stage("prompt"):
+        prompt_value = prompt.invoke(inputs)
+
+    chain = llm.bind(**llm_kwargs) | StrOutputParser()
+
+    with get_admission_controller().slot(priority) as queue_seconds:
+        observe_query_stage("queue", queue_seconds)
+        with query_stage("llm"):
+            return chain.invoke(prompt_value)
+
+def load_session_history(db: Session, session: ConversationSession) -> None:
+    """Restore a session's recent turns from the query history.
+
+    Sessions are cached per worker process, so a follow-up can land on a
+    worker that has not seen the conversation yet. Turns are written before
+    their response is returned (see process_session_query), so the latest
+    one is always there.
+    """
+    query_writer.flush_user(session.user_id)
+    rows = (
+        db.query(Query.query_text, Query.response)
+        .filter(Query.user_id == session.user_id, Query.session_id == session.session_id)
+        .order_by(Query.created_at.desc(), Query.id.desc())
+        .limit(settings.SESSION_MAX_TURNS)
+        .all()
+    )
+    for row in reversed(rows):
+        session.add_turn(row.query_text, row.response)
+    session.history_loaded = True
+
+def process_session_query(
+    query_text: str,
+    user_id: int,
+    db: Session,
+    session: ConversationSession,
+    priority: str = "interactive",
+    scope: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Answer one turn of a conversational session.
+
+    Follow-ups only retrieve chunks the session has not seen yet and append
+    them to the session's context, so earlier chunks are never re-sent in a
+    different order. With Ollama, the previous generation's context is reused
+    and only the new chunks and question are sent.
+    """
+    with query_stage("retrieval"):
+        if session.is_follow_up:
+            # Retrieve with the previous question so short follow-ups keep their topic
+            retrieval_text = f"{session.turns[-1][0]}\n{query_text}"
+            filter_dict = {"chunk_id": {"$nin": list(session.chunks)}} if session.chunks else None
+            n_results = settings.SESSION_FOLLOWUP_RESULTS
+            retrieved_chunks = retrieve_chunks(
+                db,
+                retrieval_text,
+                n_results=candidate_count(n_results),
+                filter_dict=filter_dict,
+                **(scope or {})
             )
-            db.add(query_source)
+        else:
+            retrieval_text, n_results = query_text, 5
+            retrieved_chunks = retrieve_chunks(
+                db, query_text, n_results=candidate_count(n_results), **(scope or {})
+            )
+
+    # Only the new chunks need their text; the session already holds the rest
+    with query_stage("fetch"):
+        retrieved_chunks = attach_chunk_texts(db, retrieved_chunks)
 
-            # Add to sources data for response
-            sources_data.append({
-                "document_name": document.filename,
-                "chunk_id": chunk["id"],
-                "page_number": chunk["metadata"].get("page_number"),
-                "section": chunk["metadata"].get("section"),
-                "content": chunk["text"][:200] + "..." if len(chunk["text"]) > 200 else chunk["text"]
-            })
+    with query_stage("rerank"):
+        retrieved_chunks = rerank_chunks(retrieval_text, retrieved_chunks, top_n=n_results)
 
-    db.commit()
-    return db_query, sources_data
+    session.drop_documents(get_deleted_document_ids(db))
+    new_chunks = session.add_chunks(retrieved_chunks)
+    context_chunks = list(session.chunks.values())
 
-def process_query(query_text: str, user_id: int, db: Session) -> Dict[str, Any]:
+    if not context_chunks:
+        return {
+            "answer": "I couldn't find any relevant information in your documents to answer this query.",
+            "sources": [],
+            "session_id": session.session_id
+        }
+
+    llm = get_llm()
+    # Checked by provider name so the Ollama model class isn't imported for other providers
+    is_ollama = settings.LLM_PROVIDER == "ollama"
+    reuse_context = is_ollama and session.ollama_context
+    if reuse_context:
+        prompt = get_followup_prompt()
+        inputs = {
+            "context": "\n".join(format_chunks(new_chunks)) or "(no new chunks)",
+            "question": query_text
+        }
+        llm_kwargs = {"context": session.ollama_context}
+    else:
+        prompt = get_rag_prompt(with_history=session.is_follow_up)
+        inputs = {
+            "context": "\n".join(format_chunks(context_chunks)),
+            "history": format_history(session.turns),
+            "question": query_text
+        }
+        llm_kwargs = {}
+
+    answer = generate_answer(llm, prompt, inputs, priority, **llm_kwargs)
+
+    if is_ollama:
+        session.ollama_context = llm.last_context
+    session.add_turn(query_text, answer)
+
+    with query_stage("save"):
+        sources_data = save_query_to_db(
+            query_text, answer, user_id, context_chunks, session_id=session.session_id
+        )
+        # The next turn may land on another worker, which rebuilds the session from the history
+        query_writer.flush_user(user_id)
+
+    return {
+        "answer": answer,
+        "sources": sources_data,
+        "session_id": session.session_id
+    }
+
+def process_query(
+    query_text: str,
+    user_id: int,
+    db: Session,
+    priority: str = "interactive",
+    session_id: Optional[str] = None,
+    document_ids: Optional[List[int]] = None,
+    created_after: Optional[datetime] = None,
+    pages: Optional[Tuple[Optional[int], Optional[int]]] = None
+) -> Dict[str, Any]:
     """
     Process a user query using RAG.
 
     This is the core RAG implementation with mandatory source citation.
+    Generation goes through the provider's admission controller; an
+    AdmissionRejected error is propagated so the API can answer with 429.
+    Queries with a session_id are answered as a turn of that conversation.
+    document_ids, created_after, and pages restrict retrieval to matching
+    chunks of the user's own documents.
     """
     try:
+        scope = {
+            "document_ids": resolve_document_scope(db, user_id, document_ids, created_after),
+            "pages": pages
+        }
+
+        if session_id:
+            session = session_cache.get_or_create(user_id, session_id)
+            with session.lock:
+                if not session.history_loaded:
+                    load_session_history(db, session)
+                return process_session_query(query_text, user_id, db, session, priority, scope)
+
         # Retrieve relevant chunks from vector store
-        relevant_chunks = query_vector_store(query_text, n_results=5)
+        with query_stage("retrieval"):
+            relevant_chunks = retrieve_chunks(db, query_text, n_results=candidate_count(5), **scope)
+
+        # Read the text of the chunks going into the prompt in one batch
+        with query_stage("fetch"):
+            relevant_chunks = attach_chunk_texts(db, relevant_chunks)
+
+        # Keep the 5 best chunks by cross-encoder score, or by vector order without reranking
+        with query_stage("rerank"):
+            relevant_chunks = rerank_chunks(query_text, relevant_chunks, top_n=5)
 
         if not relevant_chunks:
             return {
@@ -218,23 +616,23 @@ def process_query(query_text: str, user_id: int, db: Session) -> Dict[str, Any]:
         # Get the LLM
         llm = get_llm()
 
-        # Create the chain
-        chain = prompt | llm | StrOutputParser()
-
-        # Run the chain
-        answer = chain.invoke({
+        # Run the chain once the provider admits us
+        answer = generate_answer(llm, prompt, {
             "context": "\n".join(formatted_chunks),
             "question": query_text
-        })
+        }, priority)
 
         # Save to database
-        _, sources_data = save_query_to_db(query_text, answer, user_id, relevant_chunks, db)
+        with query_stage("save"):
+            sources_data = save_query_to_db(query_text, answer, user_id, relevant_chunks)
 
         return {
             "answer": answer,
             "sources": sources_data
         }
 
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}")
         # Return a graceful error message
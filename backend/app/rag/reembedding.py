@@ -0,0 +1,374 @@
+"""
+Online re-embedding, for changing the embedding model without wiping the vector store.
+
+When EMBEDDING_PROVIDER or EMBEDDING_MODEL no longer match the model the
+active index was built with, a new versioned index is created with status
+"building". From then on every server worker writes new chunks to both
+indexes, each embedded with its own model, while queries keep using the
+active one. A single process, holding a lease on the active index, re-embeds
+the stored chunk text of every document into the new index in document ID
+order, throttled to REEMBED_TOKENS_PER_MINUTE and checkpointed after each
+document, so it resumes where it stopped after a restart. Once every
+document is done, the new index is activated and the old one retired in one
+transaction; the old collections are dropped once no worker can still be
+using them.
+
+Usage:
+    python -m app.rag.reembedding          # Re-embed in the foreground
+    python -m app.rag.reembedding status
+"""
+import argparse
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Document, DocumentChunk, VectorIndex
+from app.db.session import SessionLocal
+from app.rag.chunker import get_token_counter
+from app.rag.embeddings import embedding_signature, get_embeddings
+from app.rag.index_versions import index_info, invalidate_index_cache, load_indexes
+from app.rag.vector_store import (
+    delete_document_from_vector_store,
+    drop_index,
+    store_chunk_vectors,
+    update_centroids,
+)
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingBudget:
+    """Token bucket that holds embedding calls under a tokens-per-minute rate; 0 means unlimited."""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.available = float(tokens_per_minute)
+        self._updated = time.monotonic()
+
+    def wait(self, tokens: int, stop: threading.Event) -> bool:
+        """Wait until ``tokens`` may be spent; returns False if stopped first."""
+        if self.capacity <= 0:
+            return True
+        # A batch over a minute's budget waits for a full bucket rather than forever
+        tokens = min(tokens, self.capacity)
+        while True:
+            now = time.monotonic()
+            self.available = min(self.capacity, self.available + (now - self._updated) * self.capacity / 60)
+            self._updated = now
+            if self.available >= tokens:
+                self.available -= tokens
+                return True
+            if stop.wait((tokens - self.available) * 60 / self.capacity):
+                return False
+
+def signature(index: VectorIndex) -> Tuple[str, str]:
+    return index.embedding_provider, index.embedding_model
+
+class ReembeddingJob:
+    """Background job that moves the vector store to the configured embedding model.
+
+    Every server worker runs one, but only the holder of the lease on the
+    active index does any work; the others retry after the lease would have
+    expired, and exit once the active index matches the configured model.
+    """
+
+    def __init__(self, batch_size: int, tokens_per_minute: int, lease_seconds: float, cache_ttl_seconds: float):
+        self.batch_size = batch_size
+        self.tokens_per_minute = tokens_per_minute
+        self.lease_seconds = lease_seconds
+        # How long workers may keep using an index list they cached
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="reembedding", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        """Stop after the current batch; the next start resumes from the last finished document."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None or not thread.is_alive():
+            return
+        self._stop.set()
+        thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    return
+            except Exception as e:
+                logger.error(f"Error re-embedding the vector store: {str(e)}")
+            # Another process holds the lease, or this attempt failed
+            self._stop.wait(self.lease_seconds)
+
+    def run_once(self) -> bool:
+        """Bring the vector store up to the configured model if this process gets the lease.
+
+        Returns True once the active index matches the configured model and
+        nothing is left to drop, False if another process holds the lease or
+        the job was stopped.
+        """
+        target = embedding_signature()
+        # Adopts the legacy collection as the active index on first run
+        indexes = load_indexes()
+        db = SessionLocal()
+        try:
+            active = db.get(VectorIndex, indexes["active"]["id"])
+            if indexes["building"] is None and signature(active) == target and not self.retired(db):
+                return True
+            if not self.renew_lease(db, active.id):
+                return False
+            try:
+                if not self.drop_retired(db):
+                    return False
+
+                building = db.query(VectorIndex).filter(VectorIndex.status == "building").first()
+                if building is not None and signature(building) != target:
+                    # The configured model changed again, or back, before the last build finished
+                    logger.info(f"Abandoning index {building.name} built for {building.embedding_model}")
+                    building.status = "retired"
+                    db.commit()
+                    invalidate_index_cache()
+                    if not self.drop_retired(db):
+                        return False
+                    building = None
+
+                if signature(active) == target:
+                    return True
+
+                if building is None:
+                    building = self.create_index(db, target)
+                # Every worker must be writing new chunks to the new index before the walk starts
+                if self._stop.wait(2 * self.cache_ttl_seconds):
+                    return False
+                if not self.reembed(db, active, building):
+                    return False
+                self.activate(db, active, building)
+                return self.drop_retired(db)
+            finally:
+                self.release_lease(db, active.id)
+        finally:
+            db.close()
+
+    def renew_lease(self, db: Session, active_id: int) -> bool:
+        """Take or extend the lease on the active index; False if another process holds it."""
+        now = datetime.now(timezone.utc)
+        renewed = db.execute(
+            update(VectorIndex)
+            .where(
+                VectorIndex.id == active_id,
+                VectorIndex.status == "active",
+                or_(
+                    VectorIndex.lease_owner.is_(None),
+                    VectorIndex.lease_owner == self.owner,
+                    VectorIndex.lease_expires_at < now,
+                ),
+            )
+            .values(lease_owner=self.owner, lease_expires_at=now + timedelta(seconds=self.lease_seconds))
+        ).rowcount
+        db.commit()
+        return bool(renewed)
+
+    def release_lease(self, db: Session, active_id: int) -> None:
+        db.rollback()
+        db.execute(
+            update(VectorIndex)
+            .where(VectorIndex.id == active_id, VectorIndex.lease_owner == self.owner)
+            .values(lease_owner=None, lease_expires_at=None)
+        )
+        db.commit()
+
+    def retired(self, db: Session) -> list:
+        return db.query(VectorIndex).filter(VectorIndex.status == "retired").all()
+
+    def drop_retired(self, db: Session) -> bool:
+        """Drop the collections of retired indexes and forget them; False if stopped first."""
+        retired = self.retired(db)
+        if not retired:
+            return True
+        # Workers may still be reading or writing an index their cache lists as active or building
+        if self._stop.wait(2 * self.cache_ttl_seconds):
+            return False
+        for index in retired:
+            drop_index(index_info(index))
+            db.delete(index)
+            db.commit()
+            logger.info(f"Dropped retired index {index.name}")
+        return True
+
+    def create_index(self, db: Session, target: Tuple[str, str]) -> VectorIndex:
+        provider, model = target
+        # Named after its ID, which is only known once the row is inserted
+        building = VectorIndex(
+            name=f"building-{self.owner}-{time.time_ns()}",
+            embedding_provider=provider,
+            embedding_model=model,
+            status="building"
+        )
+        db.add(building)
+        db.flush()
+        building.name = f"document_chunks_v{building.id}"
+        db.commit()
+        invalidate_index_cache()
+        logger.info(f"Re-embedding the vector store with {provider}/{model} into {building.name}")
+        return building
+
+    def reembed(self, db: Session, active: VectorIndex, building: VectorIndex) -> bool:
+        """Re-embed every document not yet done into the building index; False if stopped first.
+
+        Documents added after the walk starts are written to both indexes by
+        the ingestion path itself, so the walk stops at the highest ID it saw.
+        """
+        index = index_info(building)
+        embeddings = get_embeddings(building.embedding_provider, building.embedding_model)
+        count_tokens = get_token_counter(settings.CHUNK_TOKENIZER)
+        budget = EmbeddingBudget(self.tokens_per_minute)
+        last_document_id = db.query(func.max(Document.id)).scalar() or 0
+        db.commit()
+
+        done = 0
+        while True:
+            documents = (
+                db.query(Document.id, Document.filename)
+                .filter(
+                    Document.id > building.last_document_id,
+                    Document.id <= last_document_id,
+                    Document.deleted_at.is_(None),
+                )
+                .order_by(Document.id)
+                .limit(self.batch_size)
+                .all()
+            )
+            if not documents:
+                return True
+            for document in documents:
+                chunks = self.reembed_document(db, active.id, index, document, embeddings, count_tokens, budget)
+                if chunks is None:
+                    return False
+                building.last_document_id = document.id
+                building.chunks_embedded += chunks
+                db.commit()
+                done += 1
+                if done % 100 == 0:
+                    logger.info(
+                        f"Re-embedded documents up to {document.id} of {last_document_id} "
+                        f"({building.chunks_embedded} chunks) into {building.name}"
+                    )
+
+    def reembed_document(
+        self,
+        db: Session,
+        active_id: int,
+        index: Dict[str, Any],
+        document,
+        embeddings,
+        count_tokens,
+        budget: EmbeddingBudget
+    ) -> Optional[int]:
+        """Re-embed one document's chunks from the chunk store; returns how many, or None if stopped."""
+        # Cleared before reading the chunks, so chunks written concurrently by ingestion are kept
+        delete_document_from_vector_store(document.id, index)
+
+        rows = (
+            db.query(DocumentChunk.chunk_id, DocumentChunk.content, DocumentChunk.page_number, DocumentChunk.section)
+            .filter(DocumentChunk.document_id == document.id)
+            .order_by(DocumentChunk.id)
+            .all()
+        )
+        db.commit()
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            texts = [row.content for row in batch]
+            if not budget.wait(sum(count_tokens(text) for text in texts), self._stop):
+                return None
+            # The same metadata the ingestion path stores
+            metadatas = [
+                {
+                    key: value for key, value in {
+                        "document_id": document.id,
+                        "document_name": document.filename,
+                        "chunk_id": row.chunk_id,
+                        "page_number": row.page_number,
+                        "section": row.section,
+                    }.items() if value is not None
+                }
+                for row in batch
+            ]
+            vectors = embeddings.embed_documents(texts)
+            store_chunk_vectors([row.chunk_id for row in batch], vectors, metadatas, index)
+            update_centroids(vectors, metadatas, index)
+            if not self.renew_lease(db, active_id):
+                raise RuntimeError("Lost the re-embedding lease to another process")
+
+        # Deleted meanwhile: the purger may have removed its vectors before these were written
+        if db.query(Document.deleted_at).filter(Document.id == document.id).scalar() is not None:
+            delete_document_from_vector_store(document.id, index)
+        db.commit()
+        return len(rows)
+
+    def activate(self, db: Session, active: VectorIndex, building: VectorIndex) -> None:
+        """Swap the new index in for queries and retire the old one, in one transaction."""
+        active.status = "retired"
+        active.lease_owner = None
+        active.lease_expires_at = None
+        building.status = "active"
+        building.activated_at = datetime.now(timezone.utc)
+        db.commit()
+        invalidate_index_cache()
+        logger.info(
+            f"Switched queries to {building.name} ({building.embedding_provider}/{building.embedding_model}, "
+            f"{building.chunks_embedded} chunks re-embedded)"
+        )
+
+reembedding_job = ReembeddingJob(
+    batch_size=settings.REEMBED_BATCH_SIZE,
+    tokens_per_minute=settings.REEMBED_TOKENS_PER_MINUTE,
+    lease_seconds=settings.REEMBED_LEASE_SECONDS,
+    cache_ttl_seconds=settings.VECTOR_INDEX_CACHE_TTL_SECONDS
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-embed the vector store with the configured embedding model")
+    parser.add_argument("command", nargs="?", choices=["run", "status"], default="run")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "status":
+        load_indexes()
+        db = SessionLocal()
+        try:
+            total = db.query(func.count(Document.id)).filter(Document.deleted_at.is_(None)).scalar()
+            for index in db.query(VectorIndex).order_by(VectorIndex.id).all():
+                print(
+                    f"{index.name}: {index.status}, {index.embedding_provider}/{index.embedding_model}"
+                    + (
+                        f", documents up to {index.last_document_id} done, {index.chunks_embedded} chunks"
+                        if index.status == "building" else ""
+                    )
+                )
+            print(f"{total} documents; configured model: {'/'.join(embedding_signature())}")
+        finally:
+            db.close()
+    else:
+        start = time.perf_counter()
+        while not reembedding_job.run_once():
+            logger.info(f"Another process holds the re-embedding lease; retrying in {reembedding_job.lease_seconds}s")
+            time.sleep(reembedding_job.lease_seconds)
+        logger.info(f"The vector store is up to date with the configured model ({time.perf_counter() - start:.1f}s)")
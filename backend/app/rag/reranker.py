@@ -0,0 +1,161 @@
+import logging
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Any, Dict, List, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import RERANK_FALLBACKS
+
+logger = logging.getLogger(__name__)
+
+# Scores per (query text, chunk ID); a chunk's score for a query never changes
+_score_cache = TTLCache(max_size=settings.RERANK_CACHE_SIZE, ttl_seconds=settings.RERANK_CACHE_TTL_SECONDS)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# Scoring jobs submitted and not yet finished or cancelled
+_pending = 0
+
+_reranker = None
+_reranker_loaded = False
+_reranker_lock = threading.Lock()
+
+class CrossEncoderReranker:
+    """Scores (query, passage) pairs with a sentence-transformers cross-encoder on the CPU."""
+
+    def __init__(self, model_name: str, batch_size: int):
+        # sentence-transformers is optional and slow to import, so it is loaded on first use
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.batch_size = batch_size
+
+    def score(self, query_text: str, texts: List[str]) -> List[float]:
+        scores = self.model.predict(
+            [(query_text, text) for text in texts],
+            batch_size=self.batch_size,
+            show_progress_bar=False
+        )
+        return [float(score) for score in scores]
+
+class FakeReranker:
+    """Deterministic offline reranker for load testing: the share of query words in the passage."""
+
+    _token_pattern = re.compile(r"\w+")
+
+    def score(self, query_text: str, texts: List[str]) -> List[float]:
+        query_tokens = set(self._token_pattern.findall(query_text.lower()))
+        if not query_tokens:
+            return [0.0] * len(texts)
+        return [
+            len(query_tokens & set(self._token_pattern.findall(text.lower()))) / len(query_tokens)
+            for text in texts
+        ]
+
+def get_reranker():
+    """Get the configured reranker, loading it once; None when it is disabled or unavailable."""
+    global _reranker, _reranker_loaded
+    with _reranker_lock:
+        if not _reranker_loaded:
+            if settings.RERANK_PROVIDER == "fake":
+                _reranker = FakeReranker()
+            elif settings.RERANK_PROVIDER == "cross-encoder":
+                try:
+                    _reranker = CrossEncoderReranker(settings.RERANK_MODEL, settings.RERANK_BATCH_SIZE)
+                except Exception as e:
+                    logger.error(f"Reranker {settings.RERANK_MODEL} unavailable, keeping vector order: {str(e)}")
+            _reranker_loaded = True
+        return _reranker
+
+def rerank_enabled() -> bool:
+    return settings.RERANK_PROVIDER != "none"
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.RERANK_MAX_CONCURRENCY),
+                thread_name_prefix="rerank"
+            )
+        return _executor
+
+def submit_scoring(query_text: str, chunks: List[Dict[str, Any]], cancelled: threading.Event) -> Optional[Future]:
+    """Queue a scoring job, or return None when RERANK_MAX_PENDING jobs are already running or waiting."""
+    global _pending
+    with _executor_lock:
+        if _pending >= settings.RERANK_MAX_PENDING:
+            return None
+        _pending += 1
+    future = get_executor().submit(score_chunks, query_text, chunks, cancelled)
+    future.add_done_callback(_scoring_done)
+    return future
+
+def _scoring_done(future: Future) -> None:
+    global _pending
+    with _executor_lock:
+        _pending -= 1
+
+def score_chunks(query_text: str, chunks: List[Dict[str, Any]], cancelled: Optional[threading.Event] = None) -> None:
+    """Score chunks in batches, caching each batch as soon as it is scored.
+
+    Stops between batches once ``cancelled`` is set.
+    """
+    # Normally loaded at startup; loading here keeps it off the request thread otherwise
+    reranker = get_reranker()
+    if reranker is None:
+        return
+    for start in range(0, len(chunks), settings.RERANK_BATCH_SIZE):
+        if cancelled is not None and cancelled.is_set():
+            return
+        batch = chunks[start:start + settings.RERANK_BATCH_SIZE]
+        scores = reranker.score(query_text, [chunk["text"] for chunk in batch])
+        for chunk, score in zip(batch, scores):
+            _score_cache.set((query_text, chunk["id"]), score)
+
+def rerank_chunks(query_text: str, chunks: List[Dict[str, Any]], top_n: int) -> List[Dict[str, Any]]:
+    """
+    Reorder chunks (with text attached) by cross-encoder score and keep the best top_n.
+
+    Scoring runs on a small worker pool under a hard budget of RERANK_BUDGET_MS.
+    When the budget runs out, the pool already has RERANK_MAX_PENDING jobs, or
+    the reranker fails, the chunks keep their vector-search order. A job cut
+    off by the budget is cancelled: it stops after its current batch, keeping
+    the scores of the batches it finished cached for the next time.
+    """
+    if not rerank_enabled() or len(chunks) <= 1:
+        return chunks[:top_n]
+
+    uncached = [chunk for chunk in chunks if _score_cache.get((query_text, chunk["id"])) is None]
+    if uncached:
+        cancelled = threading.Event()
+        future = submit_scoring(query_text, uncached, cancelled)
+        if future is None:
+            # Queueing behind a backlog would only make this query miss its budget too
+            RERANK_FALLBACKS.labels(reason="saturated").inc()
+            return chunks[:top_n]
+        try:
+            future.result(timeout=settings.RERANK_BUDGET_MS / 1000)
+        except TimeoutError:
+            # Never runs if it hasn't started yet; otherwise stops after its current batch
+            future.cancel()
+            cancelled.set()
+            logger.warning(f"Reranking {len(uncached)} chunks exceeded {settings.RERANK_BUDGET_MS}ms, keeping vector order")
+            RERANK_FALLBACKS.labels(reason="budget").inc()
+            return chunks[:top_n]
+        except Exception as e:
+            logger.error(f"Reranking failed, keeping vector order: {str(e)}")
+            RERANK_FALLBACKS.labels(reason="error").inc()
+            return chunks[:top_n]
+
+    scores = [_score_cache.get((query_text, chunk["id"])) for chunk in chunks]
+    if any(score is None for score in scores):
+        # The reranker couldn't be loaded, or scores were evicted by a cache smaller than the candidates
+        RERANK_FALLBACKS.labels(reason="unscored").inc()
+        return chunks[:top_n]
+
+    # sorted() is stable, so ties keep their vector-search order
+    order = sorted(range(len(chunks)), key=lambda i: -scores[i])
+    return [dict(chunks[i], rerank_score=scores[i]) for i in order[:top_n]]
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.core.config import settings
+
+class ConversationSession:
+    """Retrieved context and turn history for one conversational thread.
+
+    Chunks are kept in insertion order and only ever appended, so the context
+    block of the prompt keeps a stable prefix across follow-up turns.
+    """
+
+    def __init__(self, session_id: str, user_id: int):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.chunks: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.turns: List[Tuple[str, str]] = []
+        self.ollama_context: Optional[List[int]] = None
+        # Whether earlier turns have been restored from the query history
+        self.history_loaded = False
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def is_follow_up(self) -> bool:
+        return bool(self.turns)
+
+    def add_chunks(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Add retrieved chunks, returning only the ones not already in the session."""
+        new_chunks = []
+        for chunk in chunks:
+            if chunk["id"] not in self.chunks:
+                self.chunks[chunk["id"]] = chunk
+                new_chunks.append(chunk)
+
+        # Evict the oldest chunks once the session exceeds its budget
+        while len(self.chunks) > settings.SESSION_MAX_CHUNKS:
+            self.chunks.popitem(last=False)
+            # The cached Ollama context still references the evicted text
+            self.ollama_context = None
+
+        return new_chunks
+
+    def drop_documents(self, document_ids) -> None:
+        """Remove chunks of deleted documents from the session context."""
+        stale = [
+            chunk_id for chunk_id, chunk in self.chunks.items()
+            if chunk["metadata"]["document_id"] in document_ids
+        ]
+        for chunk_id in stale:
+            del self.chunks[chunk_id]
+        if stale:
+            self.ollama_context = None
+
+    def add_turn(self, question: str, answer: str) -> None:
+        """Record a question/answer pair, keeping only the most recent turns."""
+        self.turns.append((question, answer))
+        del self.turns[:-settings.SESSION_MAX_TURNS]
+
+class SessionCache:
+    """Bounded LRU of conversation sessions with idle expiry."""
+
+    def __init__(self, max_sessions: int, ttl_seconds: float):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[Tuple[int, str], ConversationSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, user_id: int, session_id: str) -> ConversationSession:
+        """Get a user's session, creating it if it is new or has expired."""
+        key = (user_id, session_id)
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None and now - session.last_used > self.ttl_seconds:
+                session = None
+            if session is None:
+                session = ConversationSession(session_id, user_id)
+                self._sessions[key] = session
+            self._sessions.move_to_end(key)
+            session.last_used = now
+
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+            return session
+
+    def drop(self, user_id: int, session_id: str) -> None:
+        """Forget a session's cached context."""
+        with self._lock:
+            self._sessions.pop((user_id, session_id), None)
+
+session_cache = SessionCache(
+    max_sessions=settings.SESSION_CACHE_SIZE,
+    ttl_seconds=settings.SESSION_TTL_SECONDS
+)
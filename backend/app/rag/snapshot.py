@@ -0,0 +1,337 @@
+"""
+Vector index snapshots, for bootstrapping a backend node without re-embedding.
+
+A snapshot is an uncompressed tar archive with four members:
+
+- ``manifest.json``: format version, embedding model, dimensions, and counts;
+- ``documents.jsonl``: the rows of the documents in the snapshot;
+- ``chunks.jsonl``: one line per chunk with its relational row (text,
+  page, section) and vector store metadata, grouped by document;
+- ``vectors.f32``: the chunk embeddings as little-endian float32 rows, in
+  the same order as ``chunks.jsonl``.
+
+The archive is uncompressed so that import can memory-map ``vectors.f32``
+in place instead of reading it into memory.
+
+Usage:
+    python -m app.rag.snapshot export snapshot.tar
+    python -m app.rag.snapshot import snapshot.tar
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import tarfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Document, DocumentChunk, User
+from app.db.session import SessionLocal
+from app.rag.index_versions import get_active_index, get_indexes
+from app.rag.vector_store import get_chunk_vectors, rebuild_centroids, store_chunk_vectors
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = "qgenai-vector-snapshot"
+SNAPSHOT_VERSION = 1
+
+# Document columns copied into a snapshot; file contents are not included
+DOCUMENT_COLUMNS = ["id", "filename", "file_path", "content_type", "size", "created_at", "owner_id"]
+
+def embedding_signature(index: Dict[str, Any]) -> Dict[str, Any]:
+    """Identify the embedding model of an index, so vectors are never mixed across models."""
+    return {"provider": index["embedding_provider"], "model": index["embedding_model"]}
+
+def live_document_ids(db: Session, document_ids: List[int]) -> set:
+    """Of some documents, the IDs of those that are completed and not deleted."""
+    rows = (
+        db.query(Document.id)
+        .filter(
+            Document.id.in_(document_ids),
+            Document.processing_status == "completed",
+            Document.deleted_at.is_(None),
+        )
+        .all()
+    )
+    return {row.id for row in rows}
+
+def export_snapshot(output: str, batch_size: int = None) -> Dict[str, Any]:
+    """Write a snapshot of every completed document while the server keeps running.
+
+    Each batch of documents is read from the database, then from the vector
+    store, then checked again: documents deleted in the meantime, or with
+    chunks missing from the vector store, are left out, so every document in
+    the snapshot is complete. Returns the manifest.
+    """
+    import numpy as np
+
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    chunks_path, vectors_path = f"{output}.chunks.tmp", f"{output}.vectors.tmp"
+    documents: List[Dict[str, Any]] = []
+    chunk_count = 0
+    skipped = 0
+    dimensions = None
+    # The index queries are served from; a switch to a new one mid-export leaves the rest out as incomplete
+    index = get_active_index()
+
+    db = SessionLocal()
+    try:
+        document_ids = [
+            row.id for row in
+            db.query(Document.id)
+            .filter(Document.processing_status == "completed", Document.deleted_at.is_(None))
+            .order_by(Document.id)
+            .all()
+        ]
+
+        with open(chunks_path, "wb") as chunks_file, open(vectors_path, "wb") as vectors_file:
+            for start in range(0, len(document_ids), batch_size):
+                batch_ids = document_ids[start:start + batch_size]
+                rows = (
+                    db.query(DocumentChunk)
+                    .filter(DocumentChunk.document_id.in_(batch_ids))
+                    .order_by(DocumentChunk.document_id, DocumentChunk.id)
+                    .all()
+                )
+                vectors = {}
+                for chunk_start in range(0, len(rows), batch_size):
+                    vectors.update(get_chunk_vectors(
+                        [row.chunk_id for row in rows[chunk_start:chunk_start + batch_size]],
+                        index
+                    ))
+
+                with_chunks = {row.document_id for row in rows}
+                incomplete = {row.document_id for row in rows if row.chunk_id not in vectors}
+                complete = (live_document_ids(db, batch_ids) & with_chunks) - incomplete
+                skipped += len(batch_ids) - len(complete)
+                for row in rows:
+                    if row.document_id not in complete:
+                        continue
+                    embedding, metadata = vectors[row.chunk_id]
+                    embedding = np.asarray(embedding, dtype="<f4")
+                    dimensions = dimensions or len(embedding)
+                    vectors_file.write(embedding.tobytes())
+                    chunks_file.write(json.dumps({
+                        "chunk_id": row.chunk_id,
+                        "document_id": row.document_id,
+                        "page_number": row.page_number,
+                        "section": row.section,
+                        "content": row.content,
+                        "metadata": metadata,
+                    }).encode("utf-8") + b"\n")
+                    chunk_count += 1
+
+                for document in (
+                    db.query(Document).filter(Document.id.in_(complete)).order_by(Document.id).all()
+                ):
+                    row = {column: getattr(document, column) for column in DOCUMENT_COLUMNS}
+                    row["created_at"] = row["created_at"].isoformat() if row["created_at"] else None
+                    documents.append(row)
+                # Don't hold a read transaction open for the whole export
+                db.commit()
+    finally:
+        db.close()
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "embedding": embedding_signature(index),
+        "dimensions": dimensions,
+        "documents": len(documents),
+        "chunks": chunk_count,
+        "skipped_documents": skipped,
+    }
+
+    # Assemble under a temporary name, so a snapshot that exists is always complete
+    try:
+        with tarfile.open(f"{output}.tmp", "w", format=tarfile.PAX_FORMAT) as archive:
+            for name, data in (
+                ("manifest.json", json.dumps(manifest, indent=2).encode("utf-8")),
+                ("documents.jsonl", b"".join(json.dumps(row).encode("utf-8") + b"\n" for row in documents)),
+            ):
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = int(time.time())
+                archive.addfile(info, io.BytesIO(data))
+            archive.add(chunks_path, arcname="chunks.jsonl")
+            archive.add(vectors_path, arcname="vectors.f32")
+        os.replace(f"{output}.tmp", output)
+    finally:
+        for path in (chunks_path, vectors_path, f"{output}.tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+    return manifest
+
+def read_manifest(archive: tarfile.TarFile, index: Dict[str, Any]) -> Dict[str, Any]:
+    manifest = json.load(archive.extractfile("manifest.json"))
+    if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(
+            f"Unsupported snapshot {manifest.get('format')} v{manifest.get('version')}; "
+            f"expected {SNAPSHOT_FORMAT} v{SNAPSHOT_VERSION}"
+        )
+    if manifest["embedding"] != embedding_signature(index):
+        raise ValueError(
+            f"Snapshot was embedded with {manifest['embedding']}, but this node uses {embedding_signature(index)}"
+        )
+    return manifest
+
+def import_snapshot(path: str, batch_size: int = None) -> Dict[str, int]:
+    """Load a snapshot into this node's database and vector store.
+
+    Vectors are memory-mapped from the archive and written in batches.
+    Documents already in the database (e.g. one shared by all nodes) only get
+    their vectors loaded, for the chunks they still have; missing ones are
+    inserted with their chunks when their owner exists, and skipped
+    otherwise, as are documents deleted on this node. Importing the same snapshot
+    again replaces the vectors and centroids it loaded the first time.
+    Returns counts of what was imported.
+    """
+    import numpy as np
+
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    counts = {"documents": 0, "inserted_documents": 0, "chunks": 0, "skipped_documents": 0, "skipped_chunks": 0}
+    index = get_active_index()
+    if get_indexes()["building"] is not None:
+        # Its vectors would only reach the active index, not the one being re-embedded
+        raise ValueError("A re-embedding is in progress; import the snapshot once it has finished")
+
+    with tarfile.open(path, "r:") as archive:
+        manifest = read_manifest(archive, index)
+        documents = {
+            row["id"]: row
+            for row in (json.loads(line) for line in archive.extractfile("documents.jsonl"))
+        }
+        vectors_member = archive.getmember("vectors.f32")
+        vectors = np.memmap(
+            path,
+            dtype="<f4",
+            mode="r",
+            offset=vectors_member.offset_data,
+            shape=(manifest["chunks"], manifest["dimensions"] or 0),
+        ) if manifest["chunks"] else np.empty((0, 0), dtype="<f4")
+
+        db = SessionLocal()
+        try:
+            batch: List[Dict[str, Any]] = []
+            first_row = 0
+            for row_number, line in enumerate(archive.extractfile("chunks.jsonl")):
+                chunk = json.loads(line)
+                # Flush only between documents, so each document's centroids are rebuilt at once
+                if len(batch) >= batch_size and chunk["document_id"] != batch[-1]["document_id"]:
+                    import_batch(db, batch, vectors[first_row:row_number], documents, counts, index)
+                    batch, first_row = [], row_number
+                batch.append(chunk)
+            if batch:
+                import_batch(db, batch, vectors[first_row:first_row + len(batch)], documents, counts, index)
+
+            if counts["inserted_documents"] and db.get_bind().dialect.name == "postgresql":
+                # Documents keep their IDs, so move the ID sequence past them
+                db.execute(text(
+                    "SELECT setval(pg_get_serial_sequence('documents', 'id'), "
+                    "(SELECT MAX(id) FROM documents))"
+                ))
+                db.commit()
+        finally:
+            db.close()
+    return counts
+
+def import_batch(
+    db: Session,
+    chunks: List[Dict[str, Any]],
+    vectors,
+    documents: Dict[int, Dict[str, Any]],
+    counts: Dict[str, int],
+    index: Dict[str, Any]
+) -> None:
+    """Import the chunks of several whole documents, with their rows where missing.
+
+    Documents deleted on this node are skipped, and so are chunks whose row
+    this node doesn't have: vectors are only ever loaded for chunks that
+    retrieval can resolve and the purger can remove.
+    """
+    import numpy as np
+
+    document_ids = sorted({chunk["document_id"] for chunk in chunks})
+    rows = db.query(Document.id, Document.deleted_at).filter(Document.id.in_(document_ids)).all()
+    existing = {row.id for row in rows if row.deleted_at is None}
+    tombstoned = {row.id for row in rows if row.deleted_at is not None}
+    new_ids = [document_id for document_id in document_ids if document_id not in existing | tombstoned]
+    owners = {documents[document_id]["owner_id"] for document_id in new_ids}
+    known_owners = {row.id for row in db.query(User.id).filter(User.id.in_(owners)).all()} if owners else set()
+    inserted = [document_id for document_id in new_ids if documents[document_id]["owner_id"] in known_owners]
+
+    if inserted:
+        for document_id in inserted:
+            row = dict(documents[document_id])
+            if row["created_at"]:
+                row["created_at"] = datetime.fromisoformat(row["created_at"])
+            else:
+                del row["created_at"]
+            db.add(Document(**row, processed=True, processing_progress=100, processing_status="completed"))
+        db.flush()
+        db.execute(insert(DocumentChunk), [
+            {
+                "chunk_id": chunk["chunk_id"],
+                "content": chunk["content"],
+                "page_number": chunk["page_number"],
+                "section": chunk["section"],
+                "document_id": chunk["document_id"],
+            }
+            for chunk in chunks if chunk["document_id"] in inserted
+        ])
+        db.commit()
+
+    # Inserted documents got every chunk row above; existing ones may have been re-chunked since
+    existing_chunk_ids = [chunk["chunk_id"] for chunk in chunks if chunk["document_id"] in existing]
+    known_chunks = {
+        row.chunk_id for row in
+        db.query(DocumentChunk.chunk_id).filter(DocumentChunk.chunk_id.in_(existing_chunk_ids)).all()
+    } if existing_chunk_ids else set()
+    rows = [
+        i for i, chunk in enumerate(chunks)
+        if chunk["document_id"] in inserted or chunk["chunk_id"] in known_chunks
+    ]
+    keep = {chunks[i]["document_id"] for i in rows}
+    if rows:
+        ids = [chunks[i]["chunk_id"] for i in rows]
+        metadatas = [chunks[i]["metadata"] for i in rows]
+        embeddings = np.asarray(vectors[rows]) if len(rows) < len(chunks) else np.asarray(vectors)
+        store_chunk_vectors(ids, embeddings, metadatas, index)
+        rebuild_centroids(sorted(keep), embeddings, metadatas, index)
+
+    counts["documents"] += len(keep)
+    counts["inserted_documents"] += len(inserted)
+    counts["chunks"] += len(rows)
+    counts["skipped_documents"] += len(document_ids) - len(keep)
+    counts["skipped_chunks"] += len(chunks) - len(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or import a vector index snapshot")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="Snapshot archive")
+    parser.add_argument("--batch-size", type=int, default=None, help="Default: INGEST_BATCH_SIZE")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    if args.command == "export":
+        manifest = export_snapshot(args.path, args.batch_size)
+        logger.info(
+            f"Exported {manifest['chunks']} chunks of {manifest['documents']} documents to {args.path} "
+            f"({manifest['skipped_documents']} skipped) in {time.perf_counter() - start:.1f}s"
+        )
+    else:
+        counts = import_snapshot(args.path, args.batch_size)
+        logger.info(
+            f"Imported {counts['chunks']} chunks of {counts['documents']} documents "
+            f"({counts['inserted_documents']} new, {counts['skipped_documents']} documents and "
+            f"{counts['skipped_chunks']} chunks skipped) "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
@@ -1,75 +1,467 @@
+import argparse
+import logging
 import os
-from typing import List, Dict, Any
-import chromadb
-from chromadb.config import Settings
+import threading
+from typing import List, Dict, Any, Optional
 
 from app.core.config import settings as app_settings
 from app.rag.embeddings import get_embeddings
+from app.rag.index_versions import (
+    LEGACY_INDEX_NAME,
+    centroid_collection_name,
+    get_active_index,
+    get_write_indexes,
+)
+
+logger = logging.getLogger(__name__)
+
+# Centroid hits fetched per requested document, since each document has a
+# centroid of its own plus one per page
+CENTROIDS_PER_DOCUMENT = 4
+
+_client = None
+_client_lock = threading.Lock()
+
+# Quantized indexes opened by this process, by index name
+_quantized_indexes: Dict[str, Any] = {}
+_quantized_index_lock = threading.Lock()
 
-# Initialize ChromaDB
 def get_chroma_client():
-    """Get the ChromaDB client."""
-    return chromadb.Client(Settings(
-        chroma_db_impl="duckdb+parquet",
-        persist_directory=app_settings.VECTOR_DB_PATH
-    ))
-
-def get_collection():
-    """Get the ChromaDB collection."""
-    client = get_chroma_client()
-    # Create collection if it doesn't exist
-    try:
-        collection = client.get_collection("document_chunks")
-    except ValueError:
-        # Collection doesn't exist, create it
-        collection = client.create_collection(
-            name="document_chunks",
-            embedding_function=get_embeddings()
-        )
-    return collection
+    """Get this process's ChromaDB client.
+
+    In "embedded" mode the index lives in VECTOR_DB_PATH and may only be opened
+    by one process. In "server" mode every worker talks to a shared Chroma
+    server, which is the single writer of the index.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            # chromadb is slow to import, so it is loaded on first use
+            import chromadb
+            from chromadb.config import Settings
+
+            chroma_settings = Settings(anonymized_telemetry=False)
+            if app_settings.CHROMA_MODE == "server":
+                _client = chromadb.HttpClient(
+                    host=app_settings.CHROMA_HOST,
+                    port=app_settings.CHROMA_PORT,
+                    settings=chroma_settings
+                )
+            else:
+                _client = chromadb.PersistentClient(
+                    path=app_settings.VECTOR_DB_PATH,
+                    settings=chroma_settings
+                )
+        return _client
+
+def get_collection(index: Dict[str, Any] = None):
+    """Get the chunk collection of an index (default: the active one), creating it if it doesn't exist.
+
+    Embeddings are always computed by the app, so the collection has no
+    embedding function of its own.
+    """
+    name = (index or get_active_index())["name"]
+    return get_chroma_client().get_or_create_collection(name, embedding_function=None)
+
+def get_quantized_index(index: Dict[str, Any] = None):
+    """Get this process's quantized chunks of an index, or None when VECTOR_INDEX_MODE is "float".
+
+    In a quantized mode, chunk vectors live in the quantized index instead of
+    the Chroma chunk collection; centroids stay in Chroma.
+    """
+    if app_settings.VECTOR_INDEX_MODE == "float":
+        return None
+    name = (index or get_active_index())["name"]
+    with _quantized_index_lock:
+        if name not in _quantized_indexes:
+            # numpy is only needed here, so the index module is loaded on first use
+            from app.rag.quantized_index import QuantizedIndex
+
+            path = app_settings.QUANTIZED_INDEX_PATH or os.path.join(app_settings.VECTOR_DB_PATH, "quantized")
+            if name != LEGACY_INDEX_NAME:
+                path = os.path.join(path, name)
+            _quantized_indexes[name] = QuantizedIndex(path, app_settings.VECTOR_INDEX_MODE)
+        return _quantized_indexes[name]
+
+def get_centroid_collection(index: Dict[str, Any] = None):
+    """Get the collection of per-document and per-page centroid embeddings of an index.
+
+    Centroids are stored as the unnormalized mean of their chunk embeddings,
+    so the collection uses cosine distance, which ignores vector length.
+    """
+    return get_chroma_client().get_or_create_collection(
+        centroid_collection_name((index or get_active_index())["name"]),
+        embedding_function=None,
+        metadata={"hnsw:space": "cosine"}
+    )
+
+def combine_filters(*filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """AND together Chroma where filters, skipping empty ones."""
+    filters = [f for f in filters if f]
+    if not filters:
+        return None
+    return filters[0] if len(filters) == 1 else {"$and": filters}
+
+def check_vector_store() -> None:
+    """Raise if the vector store can't be reached."""
+    get_chroma_client().heartbeat()
 
 def add_chunks_to_vector_store(
     texts: List[str],
     ids: List[str],
     metadatas: List[Dict[str, Any]]
 ) -> None:
-    """Add document chunks to the vector store."""
-    collection = get_collection()
-    
-    # Add documents to collection
-    collection.add(
-        documents=texts,
-        ids=ids,
-        metadatas=metadatas
+    """Add document chunks to the vector store.
+
+    Only the embeddings, IDs, and metadata are stored; the chunk text lives in
+    the relational chunk store. While a re-embedding runs, chunks are also
+    embedded with the new model into the index being built.
+    """
+    # Chroma rejects None metadata values
+    metadatas = [
+        {key: value for key, value in metadata.items() if value is not None}
+        for metadata in metadatas
+    ]
+
+    for index in get_write_indexes():
+        embeddings = get_embeddings(index["embedding_provider"], index["embedding_model"]).embed_documents(texts)
+        store_chunk_vectors(ids, embeddings, metadatas, index)
+        update_centroids(embeddings, metadatas, index)
+
+def store_chunk_vectors(
+    ids: List[str],
+    embeddings,
+    metadatas: List[Dict[str, Any]],
+    index: Dict[str, Any] = None
+) -> None:
+    """Write precomputed chunk embeddings, replacing chunks that are already stored."""
+    quantized = get_quantized_index(index)
+    if quantized is not None:
+        quantized.add(ids, embeddings, metadatas)
+    else:
+        get_collection(index).upsert(ids=ids, embeddings=embeddings, metadatas=metadatas)
+
+def get_chunk_vectors(ids: List[str], index: Dict[str, Any] = None) -> Dict[str, tuple]:
+    """Get the stored (embedding, metadata) of chunks by ID; chunks that aren't stored are left out."""
+    if not ids:
+        return {}
+    quantized = get_quantized_index(index)
+    if quantized is not None:
+        found = quantized.get(where={"chunk_id": {"$in": ids}})
+    else:
+        found = get_collection(index).get(ids=ids, include=["embeddings", "metadatas"])
+    return {
+        chunk_id: (embedding, metadata)
+        for chunk_id, embedding, metadata in zip(found["ids"], found["embeddings"], found["metadatas"])
+    }
+
+def update_centroids(
+    embeddings: List[List[float]],
+    metadatas: List[Dict[str, Any]],
+    index: Dict[str, Any] = None
+) -> None:
+    """Fold a batch of chunk embeddings into their document and page centroids.
+
+    Each centroid keeps its chunk count, so a document ingested in several
+    batches ends up with the same centroids as one ingested at once.
+    """
+    import numpy as np
+
+    groups: Dict[str, Dict[str, Any]] = {}
+    for embedding, metadata in zip(embeddings, metadatas):
+        document_id = metadata["document_id"]
+        keys = [(f"{document_id}-doc", {"level": "document"})]
+        if metadata.get("page_number") is not None:
+            keys.append((
+                f"{document_id}-page-{metadata['page_number']}",
+                {"level": "page", "page_number": metadata["page_number"]}
+            ))
+        for centroid_id, centroid_metadata in keys:
+            group = groups.setdefault(centroid_id, {
+                "sum": np.zeros(len(embedding)),
+                "count": 0,
+                "metadata": {
+                    "document_id": document_id,
+                    "document_name": metadata.get("document_name") or "",
+                    **centroid_metadata
+                }
+            })
+            group["sum"] += embedding
+            group["count"] += 1
+
+    if not groups:
+        return
+
+    collection = get_centroid_collection(index)
+    existing = collection.get(ids=list(groups), include=["embeddings", "metadatas"])
+    for centroid_id, embedding, metadata in zip(existing["ids"], existing["embeddings"], existing["metadatas"]):
+        groups[centroid_id]["sum"] += np.asarray(embedding) * metadata["chunk_count"]
+        groups[centroid_id]["count"] += metadata["chunk_count"]
+
+    collection.upsert(
+        ids=list(groups),
+        embeddings=[(group["sum"] / group["count"]).tolist() for group in groups.values()],
+        metadatas=[{**group["metadata"], "chunk_count": group["count"]} for group in groups.values()]
     )
-    
-    # Persist the collection
-    client = get_chroma_client()
-    client.persist()
+
+def rebuild_centroids(
+    document_ids: List[int],
+    embeddings,
+    metadatas: List[Dict[str, Any]],
+    index: Dict[str, Any] = None
+) -> None:
+    """Replace the centroids of some documents with ones computed from all of their chunks."""
+    if document_ids:
+        get_centroid_collection(index).delete(where={"document_id": {"$in": list(document_ids)}})
+    update_centroids(embeddings, metadatas, index)
+
+def select_documents(
+    query_embedding: List[float],
+    n_documents: int,
+    document_filter: Dict[str, Any] = None,
+    index: Dict[str, Any] = None
+) -> List[int]:
+    """Pick the documents whose document or page centroids best match the query.
+
+    Page centroids let a document with one highly relevant page rank even
+    when its overall centroid is diluted by unrelated pages.
+    """
+    results = get_centroid_collection(index).query(
+        query_embeddings=[query_embedding],
+        n_results=n_documents * CENTROIDS_PER_DOCUMENT,
+        where=document_filter,
+        include=["metadatas"]
+    )
+
+    document_ids: List[int] = []
+    for metadata in results["metadatas"][0]:
+        if metadata["document_id"] not in document_ids:
+            document_ids.append(metadata["document_id"])
+            if len(document_ids) == n_documents:
+                break
+    return document_ids
 
 def query_vector_store(
     query_text: str,
     n_results: int = 5,
-    filter_dict: Dict[str, Any] = None
+    filter_dict: Dict[str, Any] = None,
+    document_filter: Dict[str, Any] = None,
+    coarse_documents: Optional[int] = None,
+    exact: bool = False
 ) -> List[Dict[str, Any]]:
-    """Query the vector store for relevant document chunks."""
-    collection = get_collection()
-    
+    """Query the vector store for relevant document chunks.
+
+    ``document_filter`` may only reference document-level metadata
+    (``document_id``, ``document_name``); it is applied to both search stages.
+    With ``coarse_documents`` > 0 (default COARSE_TOP_DOCUMENTS), the top
+    documents are picked by centroid first and only their chunks are
+    searched; 0 searches every chunk. With ``exact``, the chunks matching the
+    filters are compared to the query one by one instead of through the
+    index, which is exact and cheap when the filters leave few chunks.
+
+    With a quantized index (VECTOR_INDEX_MODE "int8" or "binary"), the
+    QUANTIZED_RESCORE_CANDIDATES x n_results closest chunks by code are
+    rescored at full precision.
+
+    Results carry IDs, metadata, and distances but no text; use
+    app.rag.chunk_store.attach_chunk_texts for the chunks that are needed.
+    """
+    # Queried with the model the active index was built with, which may not be the configured one yet
+    index = get_active_index()
+    query_embedding = get_embeddings(index["embedding_provider"], index["embedding_model"]).embed_query(query_text)
+
+    if exact:
+        return exact_search(query_embedding, n_results, combine_filters(filter_dict, document_filter), index)
+
+    if coarse_documents is None:
+        coarse_documents = app_settings.COARSE_TOP_DOCUMENTS
+    if coarse_documents > 0:
+        document_ids = select_documents(query_embedding, coarse_documents, document_filter, index)
+        # Without centroids (e.g. not yet backfilled) fall back to searching every chunk
+        if document_ids:
+            document_filter = {"document_id": {"$in": document_ids}}
+
+    quantized = get_quantized_index(index)
+    if quantized is not None:
+        return quantized.search(
+            query_embedding,
+            n_results,
+            where=combine_filters(filter_dict, document_filter),
+            candidates=n_results * app_settings.QUANTIZED_RESCORE_CANDIDATES
+        )
+
     # Query the collection
-    results = collection.query(
-        query_texts=[query_text],
+    results = get_collection(index).query(
+        query_embeddings=[query_embedding],
         n_results=n_results,
-        where=filter_dict
+        where=combine_filters(filter_dict, document_filter),
+        include=["metadatas", "distances"]
     )
-    
+
     # Format results
     formatted_results = []
     for i in range(len(results["ids"][0])):
         formatted_results.append({
             "id": results["ids"][0][i],
-            "text": results["documents"][0][i],
             "metadata": results["metadatas"][0][i],
-            "distance": results["distances"][0][i] if "distances" in results else None
+            "distance": results["distances"][0][i] if results.get("distances") else None
         })
-    
+
     return formatted_results
+
+def exact_search(
+    query_embedding: List[float],
+    n_results: int,
+    where: Optional[Dict[str, Any]],
+    index: Dict[str, Any] = None
+) -> List[Dict[str, Any]]:
+    """Brute-force the nearest chunks among those matching a filter.
+
+    Distances are squared L2, the same as the chunk collection reports.
+    """
+    import numpy as np
+
+    quantized = get_quantized_index(index)
+    if quantized is not None:
+        return quantized.exact_search(query_embedding, n_results, where)
+
+    candidates = get_collection(index).get(where=where, include=["embeddings", "metadatas"])
+    if not candidates["ids"]:
+        return []
+
+    distances = ((np.asarray(candidates["embeddings"]) - np.asarray(query_embedding)) ** 2).sum(axis=1)
+    return [
+        {
+            "id": candidates["ids"][i],
+            "metadata": candidates["metadatas"][i],
+            "distance": float(distances[i])
+        }
+        for i in np.argsort(distances, kind="stable")[:n_results]
+    ]
+
+def delete_chunks_from_vector_store(ids: List[str]) -> None:
+    """Delete document chunks from the vector store by chunk ID."""
+    if not ids:
+        return
+    for index in get_write_indexes():
+        quantized = get_quantized_index(index)
+        if quantized is not None:
+            quantized.delete(ids=ids)
+        else:
+            get_collection(index).delete(ids=ids)
+
+def delete_document_from_vector_store(document_id: int, index: Dict[str, Any] = None) -> None:
+    """Delete any remaining chunks of a document from one index, or from every index being written."""
+    for index in ([index] if index else get_write_indexes()):
+        quantized = get_quantized_index(index)
+        if quantized is not None:
+            quantized.delete(where={"document_id": document_id})
+        else:
+            get_collection(index).delete(where={"document_id": document_id})
+        get_centroid_collection(index).delete(where={"document_id": document_id})
+
+def iter_chunk_vectors(batch_size: int = 1000):
+    """Yield (ids, embeddings, metadatas) batches of the Chroma chunk collection."""
+    collection = get_collection()
+    offset = 0
+    while True:
+        batch = collection.get(include=["embeddings", "metadatas"], limit=batch_size, offset=offset)
+        if not batch["ids"]:
+            return
+        yield batch["ids"], batch["embeddings"], batch["metadatas"]
+        offset += len(batch["ids"])
+
+def backfill_centroids(batch_size: int = 1000) -> int:
+    """Build centroids for documents indexed before centroids were stored.
+
+    Returns the number of documents backfilled.
+    """
+    index = get_quantized_index()
+    centroid_collection = get_centroid_collection()
+
+    if index is not None:
+        document_ids = index.document_ids()
+    else:
+        document_ids = set()
+        offset = 0
+        while True:
+            batch = get_collection().get(include=["metadatas"], limit=batch_size, offset=offset)
+            if not batch["ids"]:
+                break
+            document_ids.update(metadata["document_id"] for metadata in batch["metadatas"])
+            offset += len(batch["ids"])
+
+    backfilled = 0
+    for document_id in sorted(document_ids):
+        if centroid_collection.get(ids=[f"{document_id}-doc"], include=[])["ids"]:
+            continue
+        if index is not None:
+            chunks = index.get(where={"document_id": document_id})
+        else:
+            chunks = get_collection().get(where={"document_id": document_id}, include=["embeddings", "metadatas"])
+        update_centroids(chunks["embeddings"], chunks["metadatas"])
+        backfilled += 1
+    return backfilled
+
+def build_quantized_index(batch_size: int = 1000) -> int:
+    """Copy the Chroma chunk collection into the quantized index configured by VECTOR_INDEX_MODE.
+
+    Returns the number of chunks copied. Re-running replaces chunks already copied.
+    """
+    index = get_quantized_index()
+    if index is None:
+        raise ValueError("Set VECTOR_INDEX_MODE to int8 or binary to build a quantized index")
+
+    copied = 0
+    for ids, embeddings, metadatas in iter_chunk_vectors(batch_size):
+        index.add(ids, embeddings, metadatas)
+        copied += len(ids)
+    return copied
+
+def compact_vector_store() -> None:
+    """Reclaim space held by deleted vectors.
+
+    Current Chroma versions compact their own segments, so this only persists
+    on clients that still expose an explicit persist(). A quantized index is
+    rewritten without its deleted rows.
+    """
+    for index in get_write_indexes():
+        quantized = get_quantized_index(index)
+        if quantized is not None:
+            quantized.compact()
+
+    client = get_chroma_client()
+    if hasattr(client, "persist"):
+        client.persist()
+
+def drop_index(index: Dict[str, Any]) -> None:
+    """Delete the collections and files of an index that no longer serves or receives chunks."""
+    client = get_chroma_client()
+    for name in (index["name"], centroid_collection_name(index["name"])):
+        try:
+            client.delete_collection(name)
+        except Exception:
+            # Never created, or already dropped by an earlier attempt
+            pass
+
+    quantized = get_quantized_index(index)
+    if quantized is not None:
+        with _quantized_index_lock:
+            _quantized_indexes.pop(index["name"], None)
+        quantized.destroy()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vector store maintenance")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default="backfill-centroids",
+        choices=["backfill-centroids", "build-quantized-index"]
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "build-quantized-index":
+        logger.info(f"Copied {build_quantized_index()} chunks into the {app_settings.VECTOR_INDEX_MODE} index")
+    else:
+        logger.info(f"Backfilled centroids for {backfill_centroids()} documents")
@@ -39,6 +39,19 @@ class Document(DocumentBase):
     class Config:
         from_attributes = True
 
+class UploadBatch(BaseModel):
+    """Aggregate processing progress of the documents of a batch upload."""
+    batch_id: str
+    status: str  # processing, completed
+    total: int
+    pending: int = 0
+    processing: int = 0
+    completed: int = 0
+    error: int = 0
+    progress: int = 0  # Mean processing progress of the documents (0-100)
+    document_ids: List[int] = []  # Only in the upload response
+    skipped: List[str] = []  # Unsupported files found in archives, only in the upload response
+
 class DocumentWithChunks(Document):
     chunks: List[DocumentChunk] = []
 
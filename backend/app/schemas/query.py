@@ -18,6 +18,17 @@ class QuerySource(QuerySourceBase):
 
 class QueryBase(BaseModel):
     query_text: str
+    session_id: Optional[str] = None
+
+class PageRange(BaseModel):
+    start: Optional[int] = None
+    end: Optional[int] = None
+
+class QueryRequest(QueryBase):
+    # Optional scoping; chunks without page numbers (TXT files without [Page N] markers) never match a page range
+    document_ids: Optional[List[int]] = None
+    created_after: Optional[datetime] = None
+    pages: Optional[PageRange] = None
 
 class QueryCreate(QueryBase):
     user_id: int
@@ -25,6 +36,7 @@ class QueryCreate(QueryBase):
 class QueryResponse(BaseModel):
     answer: str
     sources: List[dict]
+    session_id: Optional[str] = None
 
 class Query(QueryBase):
     id: int
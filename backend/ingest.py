@@ -0,0 +1,239 @@
+"""
+Bulk ingestion: load a directory or zip of documents for one owner without going through HTTP.
+
+Every PDF and TXT file is copied into UPLOAD_FOLDER, gets a Document row, and
+is processed by app.rag.document_processor on a pool of worker threads.
+Progress is appended to a checkpoint file as each file finishes, so running
+the same command again after a crash skips finished files and reprocesses
+the ones that were in flight.
+
+Usage:
+    python ingest.py /data/department --owner alice@example.com --workers 8
+    python ingest.py /data/department.zip --owner 42 --offline
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, Optional, Tuple
+
+from app.core.config import settings
+from app.db.models import Base, Document, DocumentChunk, User
+from app.db.session import SessionLocal, engine
+from app.rag.document_processor import process_document
+from app.rag.vector_store import delete_document_from_vector_store
+
+logger = logging.getLogger("ingest")
+
+CONTENT_TYPES = {".pdf": "application/pdf", ".txt": "text/plain"}
+
+class Checkpoint:
+    """Append-only JSONL record of each source file's document and status.
+
+    The last record of a source wins: "started" once its Document row exists,
+    then "completed" or "error".
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        cut_short = False
+        if os.path.exists(path):
+            with open(path) as file:
+                for line in file:
+                    cut_short = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash
+                        continue
+                    self.entries[entry["source"]] = entry
+        self._file = open(path, "a")
+        if cut_short:
+            # Otherwise the next record would be appended to the partial line and lost with it
+            self._file.write("\n")
+        self._lock = threading.Lock()
+
+    def record(self, source: str, document_id: int, status: str, **details) -> None:
+        entry = {"source": source, "document_id": document_id, "status": status, **details}
+        with self._lock:
+            self.entries[source] = entry
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+def iter_sources(path: str, archive: Optional[zipfile.ZipFile]) -> Iterator[Tuple[str, int]]:
+    """Yield the (source key, size) of every supported file in a directory or zip, in a stable order."""
+    if archive is not None:
+        for info in sorted(archive.infolist(), key=lambda info: info.filename):
+            name = info.filename
+            if info.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith("."):
+                continue
+            if os.path.splitext(name)[1].lower() in CONTENT_TYPES:
+                yield name, info.file_size
+        return
+
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if name.startswith(".") or os.path.splitext(name)[1].lower() not in CONTENT_TYPES:
+                continue
+            full_path = os.path.join(root, name)
+            yield os.path.relpath(full_path, path), os.path.getsize(full_path)
+
+def copy_source(path: str, archive: Optional[zipfile.ZipFile], source: str, destination: str) -> None:
+    if archive is not None:
+        # ZipFile serializes reads of its underlying file, so workers may share it
+        with archive.open(source) as src, open(destination, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+    else:
+        shutil.copyfile(os.path.join(path, source), destination)
+
+def ingest_file(
+    path: str,
+    archive: Optional[zipfile.ZipFile],
+    source: str,
+    owner_id: int,
+    checkpoint: Checkpoint
+) -> Tuple[str, int, int]:
+    """Ingest one source file; returns (status, bytes, chunks)."""
+    db = SessionLocal()
+    try:
+        previous = checkpoint.entries.get(source)
+        document = db.get(Document, previous["document_id"]) if previous else None
+        if document is not None and document.deleted_at is None:
+            # Interrupted or failed before: drop its partial chunks and start over
+            db.query(DocumentChunk).filter(DocumentChunk.document_id == document.id).delete()
+            db.commit()
+            delete_document_from_vector_store(document.id)
+        else:
+            filename = os.path.basename(source)
+            document = Document(
+                filename=filename,
+                content_type=CONTENT_TYPES[os.path.splitext(filename)[1].lower()],
+                processed=False,
+                owner_id=owner_id
+            )
+            db.add(document)
+            db.flush()
+            # Named by document ID, since files in different folders may share a name
+            document.file_path = os.path.join(settings.UPLOAD_FOLDER, f"{owner_id}_{document.id}_{filename}")
+            db.commit()
+            checkpoint.record(source, document.id, "started")
+
+        copy_source(path, archive, source, document.file_path)
+        document.size = os.path.getsize(document.file_path)
+        db.commit()
+
+        succeeded = process_document(document, db)
+        chunks = db.query(DocumentChunk).filter(DocumentChunk.document_id == document.id).count()
+        status = "completed" if succeeded else "error"
+        checkpoint.record(source, document.id, status, chunks=chunks)
+        return status, document.size, chunks
+    finally:
+        db.close()
+
+def get_owner(db, owner: str) -> User:
+    query = db.query(User)
+    user = query.filter(User.id == int(owner)).first() if owner.isdigit() else query.filter(User.email == owner).first()
+    if user is None:
+        raise SystemExit(f"No user {owner}")
+    return user
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingest a directory or zip of PDF and TXT files for one owner")
+    parser.add_argument("path", help="Directory or .zip file")
+    parser.add_argument("--owner", required=True, help="Email or ID of the user who will own the documents")
+    parser.add_argument("--workers", type=int, default=4, help="Files processed in parallel")
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="Progress file to resume from (default: ingest-<name>.checkpoint.jsonl in the current directory)"
+    )
+    parser.add_argument("--retry-failed", action="store_true", help="Process files that failed in an earlier run again")
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="The server is stopped, so the embedded or quantized vector index may be opened here"
+    )
+    args = parser.parse_args()
+
+    if not args.offline and (settings.CHROMA_MODE != "server" or settings.VECTOR_INDEX_MODE != "float"):
+        # The embedded and quantized indexes can only be opened safely by a single process
+        raise RuntimeError(
+            "Ingesting alongside a running server requires CHROMA_MODE=server and VECTOR_INDEX_MODE=float; "
+            "stop the server and pass --offline to use the local index"
+        )
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    path = os.path.abspath(args.path)
+    checkpoint_path = args.checkpoint or f"ingest-{os.path.basename(path.rstrip(os.sep))}.checkpoint.jsonl"
+
+    Base.metadata.create_all(bind=engine)
+    os.makedirs(settings.UPLOAD_FOLDER, exist_ok=True)
+    db = SessionLocal()
+    try:
+        owner_id = get_owner(db, args.owner).id
+    finally:
+        db.close()
+
+    archive = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+    checkpoint = Checkpoint(checkpoint_path)
+    sources = list(iter_sources(path, archive))
+    skip = {"completed"} if args.retry_failed else {"completed", "error"}
+    pending = [source for source, _ in sources if checkpoint.entries.get(source, {}).get("status") not in skip]
+    logger.info(
+        f"{len(sources)} files found, {len(sources) - len(pending)} already done per {checkpoint_path}, "
+        f"{len(pending)} to ingest with {args.workers} workers"
+    )
+
+    totals = {"completed": 0, "error": 0, "bytes": 0, "chunks": 0}
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix="ingest") as executor:
+            futures = {
+                executor.submit(ingest_file, path, archive, source, owner_id, checkpoint): source
+                for source in pending
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                source = futures[future]
+                try:
+                    status, size, chunks = future.result()
+                except Exception as e:
+                    logger.error(f"{source}: {str(e)}")
+                    status, size, chunks = "error", 0, 0
+                totals[status] += 1
+                totals["bytes"] += size
+                totals["chunks"] += chunks
+                if status == "error" or done % 100 == 0 or done == len(pending):
+                    elapsed = time.perf_counter() - start
+                    logger.info(f"[{done}/{len(pending)}] {source}: {status} ({done / elapsed:.1f} files/s)")
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; run the same command again to resume")
+        raise
+    finally:
+        checkpoint.close()
+        if archive is not None:
+            archive.close()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"\nIngested {totals['completed']} files ({totals['error']} failed) in {elapsed:.1f}s: "
+        f"{totals['completed'] / elapsed if elapsed else 0:.1f} files/s, "
+        f"{totals['bytes'] / 1e6 / elapsed if elapsed else 0:.2f} MB/s, "
+        f"{totals['chunks'] / elapsed if elapsed else 0:.0f} chunks/s ({totals['chunks']} chunks)"
+    )
+    if totals["error"]:
+        print(f"Failed files are recorded in {checkpoint_path}; rerun with --retry-failed to try them again")
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,76 @@
 import os
-from fastapi import FastAPI, Depends
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest, multiprocess
 from sqlalchemy.orm import Session
 
 from app.api import api_router
+from app.api.health import router as health_router, set_ready
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
+from app.core.metrics import HTTP_REQUEST_SECONDS, format_server_timing, start_server_timing
 from app.db.session import get_db, engine
 from app.db.models import Base
+from app.db.write_behind import query_writer
+from app.rag.deletion import document_purger
+from app.rag.ingestion import document_ingestor
+from app.rag.reembedding import reembedding_job
+from app.rag.reranker import get_reranker, rerank_enabled
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepare storage and background workers on startup and stop them on shutdown.
 
-# Create upload directory if it doesn't exist
-os.makedirs(settings.UPLOAD_FOLDER, exist_ok=True)
+    Nothing here runs at import time, so importing the app (and every
+    --reload) stays fast; production schemas are managed with Alembic.
+    """
+    if settings.WORKERS > 1 and settings.CHROMA_MODE != "server":
+        # The embedded index can only be opened safely by a single process
+        raise RuntimeError("Running more than one worker requires CHROMA_MODE=server")
+    if settings.WORKERS > 1 and not settings.LLM_SLOT_DIR:
+        # Without shared slots each worker would apply the LLM concurrency limit on its own
+        raise RuntimeError("Running more than one worker requires LLM_SLOT_DIR")
+    if settings.WORKERS > 1 and settings.VECTOR_INDEX_MODE != "float":
+        # The quantized index is held in each process's memory and written to local files
+        raise RuntimeError("Running more than one worker requires VECTOR_INDEX_MODE=float")
 
-# Create vector DB directory if it doesn't exist
-os.makedirs(settings.VECTOR_DB_PATH, exist_ok=True)
+    # Create database tables
+    Base.metadata.create_all(bind=engine)
+
+    # Create upload directory if it doesn't exist
+    os.makedirs(settings.UPLOAD_FOLDER, exist_ok=True)
+
+    # Create vector DB directory if it doesn't exist
+    os.makedirs(settings.VECTOR_DB_PATH, exist_ok=True)
+
+    query_writer.start()
+    # Resumes purging documents that were deleted before a restart
+    document_purger.start()
+    # Resumes processing batch uploads that were queued before a restart
+    document_ingestor.start()
+    # Re-embeds the vector store in the background when the embedding model has changed
+    reembedding_job.start()
+    if rerank_enabled():
+        # A cross-encoder takes far longer to load than the first query's RERANK_BUDGET_MS
+        get_reranker()
+    set_ready(True)
+
+    yield
+
+    # Stop receiving traffic from the load balancer while draining
+    set_ready(False)
+    # Flush buffered query history before the process exits
+    query_writer.stop()
+    document_purger.stop()
+    document_ingestor.stop()
+    reembedding_job.stop()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Set up CORS
@@ -29,15 +80,57 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Retry-After", "X-Next-Cursor", "X-Total-Count", "ETag"],
+)
+
+@app.middleware("http")
+async def record_request_timing(request: Request, call_next):
+    """Time each request and report its per-stage breakdown in a Server-Timing header."""
+    timings = start_server_timing()
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.labels(
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=response.status_code
+    ).observe(elapsed)
+
+    timings.append(("total", elapsed))
+    response.headers["Server-Timing"] = format_server_timing(timings)
+    return response
+
+# Added last so it wraps the other middleware and compresses the final body
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.GZIP_COMPRESSION_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
 )
 
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
+app.include_router(health_router)
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Knowledge Navigator API"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics.
+
+    With several workers, PROMETHEUS_MULTIPROC_DIR is set and the metrics of
+    all worker processes are aggregated.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,44 @@
+"""
+Migration script to add the session_id field to the queries table.
+"""
+import os
+import sys
+from sqlalchemy import create_engine, inspect, text
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+
+def run_migration():
+    """Run the migration to add the session_id field."""
+    print("Starting migration to add session_id to queries table...")
+
+    # Create engine
+    engine = create_engine(settings.DATABASE_URL)
+    inspector = inspect(engine)
+
+    # Get existing columns
+    existing_columns = [col['name'] for col in inspector.get_columns('queries')]
+    print(f"Existing columns: {existing_columns}")
+
+    with engine.connect() as conn:
+        try:
+            if 'session_id' not in existing_columns:
+                print("Adding session_id column...")
+                conn.execute(text("ALTER TABLE queries ADD COLUMN session_id VARCHAR"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_queries_session_id ON queries (session_id)"))
+            else:
+                print("session_id column already exists.")
+
+            # Commit the transaction
+            conn.commit()
+        except Exception as e:
+            print(f"Error during migration: {e}")
+            conn.rollback()
+            raise
+
+    print("Migration completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
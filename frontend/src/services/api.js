@@ -82,4 +82,16 @@ api.interceptors.response.use(
   }
 )
 
+// Fetch every page of a keyset-paginated list, following the X-Next-Cursor header
+export const getAllPages = async (url) => {
+  const items = []
+  let cursor = null
+  do {
+    const response = await api.get(url, { params: cursor ? { cursor } : {} })
+    items.push(...response.data)
+    cursor = response.headers['x-next-cursor']
+  } while (cursor)
+  return items
+}
+
 export default api
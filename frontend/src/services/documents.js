@@ -1,4 +1,4 @@
-import api from './api'
+import api, { getAllPages } from './api'
 
 export const uploadDocument = async (file) => {
   const formData = new FormData()
@@ -14,8 +14,7 @@ export const uploadDocument = async (file) => {
 }
 
 export const getDocuments = async () => {
-  const response = await api.get('/documents/')
-  return response.data
+  return getAllPages('/documents/')
 }
 
 export const getDocument = async (id) => {
@@ -1,4 +1,4 @@
-import api from './api'
+import api, { getAllPages } from './api'
 
 export const submitQuery = async (queryText) => {
   const response = await api.post('/queries/', {
@@ -9,8 +9,7 @@ export const submitQuery = async (queryText) => {
 }
 
 export const getQueries = async () => {
-  const response = await api.get('/queries/')
-  return response.data
+  return getAllPages('/queries/')
 }
 
 export const getQuery = async (id) => {
@@ -3,6 +3,14 @@
 # Set error handling
 set -e
 
+# Usage: ./start_backend.sh [--prod]
+#   default: single auto-reloading development server with an embedded vector store
+#   --prod:  $WORKERS worker processes (default: one per CPU) sharing a local Chroma server
+MODE="dev"
+if [ "$1" == "--prod" ]; then
+  MODE="prod"
+fi
+
 echo "Starting QGenAI backend server..."
 
 # Check for required dependencies
@@ -33,8 +41,51 @@ source venv/bin/activate
 echo "Installing backend dependencies with uv..."
 uv pip install -r requirements.txt
 
-# Start the backend server
-echo "Starting backend server..."
-python3 -m uvicorn main:app --host 0.0.0.0 --port 8000 --reload
+# The chunker only loads its tokenizer from the local cache, so fetch it while online
+echo "Downloading the chunking tokenizer..."
+python3 -m app.rag.chunker || echo "Tokenizer download failed; token counts will be approximate."
+
+if [ "$MODE" == "dev" ]; then
+  # Start the backend server
+  echo "Starting backend server..."
+  python3 -m uvicorn main:app --host 0.0.0.0 --port 8000 --reload
+else
+  export WORKERS=${WORKERS:-$(python3 -c "import os; print(os.cpu_count() or 1)")}
+  export CHROMA_MODE=server
+  export CHROMA_HOST=${CHROMA_HOST:-localhost}
+  export CHROMA_PORT=${CHROMA_PORT:-8001}
+  VECTOR_DB_PATH=${VECTOR_DB_PATH:-./vector_db}
+
+  # Aggregate Prometheus metrics across workers
+  export PROMETHEUS_MULTIPROC_DIR=$(mktemp -d)
+  # Lock files through which the workers share the LLM concurrency limit
+  export LLM_SLOT_DIR=$(mktemp -d)
+
+  # The Chroma server is the single writer of the vector index; workers are its clients
+  echo "Starting Chroma server on $CHROMA_HOST:$CHROMA_PORT..."
+  chroma run --path "$VECTOR_DB_PATH" --host "$CHROMA_HOST" --port "$CHROMA_PORT" &
+  CHROMA_PID=$!
+
+  cleanup() {
+    kill $CHROMA_PID 2>/dev/null || true
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR" "$LLM_SLOT_DIR"
+  }
+  trap cleanup EXIT
+
+  echo "Waiting for Chroma server..."
+  for i in $(seq 1 30); do
+    if python3 -c "import chromadb; chromadb.HttpClient(host='$CHROMA_HOST', port=$CHROMA_PORT).heartbeat()" &> /dev/null; then
+      break
+    fi
+    sleep 1
+  done
+
+  # Migrate once up front so the workers don't race to create the schema
+  echo "Applying database migrations..."
+  alembic upgrade head
+
+  echo "Starting backend server with $WORKERS workers..."
+  python3 -m uvicorn main:app --host 0.0.0.0 --port 8000 --workers "$WORKERS" --timeout-graceful-shutdown 30
+fi
 
 echo "Backend server stopped."
@@ -0,0 +1,94 @@
+"""
+Tests for the per-process token and user caches behind get_current_user.
+
+Another worker is played by putting back the cached copy of a user it would
+still hold after the user was changed.
+
+Run with: python -m pytest tests/api
+"""
+import copy
+
+import pytest
+from jose import jwt
+
+from app.api import deps
+from app.core.security import create_access_token
+from app.db.models import User
+from app.db.session import SessionLocal
+
+from conftest import auth_headers
+
+def update_user(user_id: int, **values) -> None:
+    db = SessionLocal()
+    try:
+        user = db.get(User, user_id)
+        for name, value in values.items():
+            setattr(user, name, value)
+        db.commit()
+    finally:
+        db.close()
+
+@pytest.fixture
+def decodes(monkeypatch) -> list:
+    """Count the JWT verifications, starting with an empty token cache."""
+    deps._token_cache.clear()
+    calls = []
+    jwt_decode = jwt.decode
+
+    def decode(*args, **kwargs):
+        calls.append(args)
+        return jwt_decode(*args, **kwargs)
+
+    monkeypatch.setattr(deps.jwt, "decode", decode)
+    return calls
+
+def test_decoded_token_is_cached(decodes):
+    token = create_access_token(subject=1)
+    assert deps.decode_token(token).sub == deps.decode_token(token).sub
+    assert len(decodes) == 1
+
+def test_expired_cached_token_is_decoded_again(decodes):
+    token = create_access_token(subject=1)
+    token_data = deps.decode_token(token)
+    deps._token_cache.set(token, (token_data, 1.0))
+    deps.decode_token(token)
+    assert len(decodes) == 2
+
+def test_active_user_is_cached(client, user_id):
+    assert client.get("/api/v1/documents/", headers=auth_headers(user_id)).status_code == 200
+    cached = deps._user_cache.get(str(user_id))
+    assert cached is not None and cached.is_active
+
+    assert client.get("/api/v1/documents/", headers=auth_headers(user_id)).status_code == 200
+    assert deps._user_cache.get(str(user_id)) is cached
+
+def test_deactivated_user_is_rejected_at_once(client, user_id):
+    assert client.get("/api/v1/documents/", headers=auth_headers(user_id)).status_code == 200
+    update_user(user_id, is_active=False)
+    response = client.get("/api/v1/documents/", headers=auth_headers(user_id))
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Inactive user"
+
+def test_user_deactivated_by_another_worker_is_rejected(client, user_id):
+    assert client.get("/api/v1/documents/", headers=auth_headers(user_id)).status_code == 200
+    stale = copy.copy(deps._user_cache.get(str(user_id)))
+
+    update_user(user_id, is_active=False)
+    # Another worker's cache wasn't invalidated and still holds the active user
+    deps._user_cache.set(str(user_id), stale)
+    response = client.get("/api/v1/documents/", headers=auth_headers(user_id))
+    assert response.status_code == 400
+    assert deps._user_cache.get(str(user_id)) is None
+
+def test_user_deleted_by_another_worker_is_rejected(client, user_id):
+    assert client.get("/api/v1/documents/", headers=auth_headers(user_id)).status_code == 200
+    stale = copy.copy(deps._user_cache.get(str(user_id)))
+
+    db = SessionLocal()
+    try:
+        db.delete(db.get(User, user_id))
+        db.commit()
+    finally:
+        db.close()
+    deps._user_cache.set(str(user_id), stale)
+    assert client.get("/api/v1/documents/", headers=auth_headers(user_id)).status_code == 404
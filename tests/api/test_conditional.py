@@ -0,0 +1,82 @@
+"""
+Tests for the ETags and 304 responses of the list endpoints.
+
+Run with: python -m pytest tests/api
+"""
+import pytest
+from sqlalchemy import event
+
+from app.db.models import Query
+from app.db.session import SessionLocal, engine
+
+from conftest import auth_headers, ingest_text
+
+PATHS = ["/api/v1/documents/", "/api/v1/queries/"]
+
+@pytest.fixture
+def captured_sql():
+    """Record every SELECT statement issued on the engine."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
+
+def add_query(user_id: int) -> None:
+    db = SessionLocal()
+    try:
+        db.add(Query(query_text="question", response="answer", user_id=user_id))
+        db.commit()
+    finally:
+        db.close()
+
+@pytest.mark.parametrize("path", PATHS)
+def test_lists_carry_an_etag_to_revalidate(client, user_id, path):
+    response = client.get(path, headers=auth_headers(user_id))
+    assert response.headers["ETag"].startswith('W/"')
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+@pytest.mark.parametrize("path", PATHS)
+def test_not_modified_skips_list_query(client, user_id, captured_sql, path):
+    headers = auth_headers(user_id)
+    etag = client.get(path, headers=headers).headers["ETag"]
+    captured_sql.clear()
+
+    response = client.get(path, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    # Only the users row holding the change counter may be read
+    assert captured_sql
+    assert all("FROM users" in statement for statement in captured_sql), captured_sql
+
+def test_etag_changes_when_the_list_changes(client, user_id):
+    headers = auth_headers(user_id)
+    documents_etag = client.get("/api/v1/documents/", headers=headers).headers["ETag"]
+    queries_etag = client.get("/api/v1/queries/", headers=headers).headers["ETag"]
+
+    ingest_text(user_id, "A new document.")
+    add_query(user_id)
+    for path, etag in [("/api/v1/documents/", documents_etag), ("/api/v1/queries/", queries_etag)]:
+        response = client.get(path, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert len(response.json()) == 1
+
+def test_etag_depends_on_the_query_string(client, user_id):
+    headers = auth_headers(user_id)
+    etag = client.get("/api/v1/queries/", headers=headers).headers["ETag"]
+    response = client.get("/api/v1/queries/?limit=5", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+@pytest.mark.parametrize("if_none_match", ["*", 'W/"other", {etag}', "{strong}"])
+def test_if_none_match_forms(client, user_id, if_none_match):
+    headers = auth_headers(user_id)
+    etag = client.get("/api/v1/queries/", headers=headers).headers["ETag"]
+    value = if_none_match.format(etag=etag, strong=etag.removeprefix("W/"))
+    assert client.get("/api/v1/queries/", headers={**headers, "If-None-Match": value}).status_code == 304
@@ -0,0 +1,66 @@
+"""
+Tests for keyset pagination and field projection of the list endpoints.
+
+Rows are inserted in one commit, so many share a created_at value and the
+cursor must resume within it.
+
+Run with: python -m pytest tests/api
+"""
+import pytest
+
+from app.db.models import Document, Query
+from app.db.session import SessionLocal
+
+from conftest import auth_headers
+
+ROWS = 25
+
+@pytest.fixture
+def seeded_user(user_id) -> int:
+    db = SessionLocal()
+    try:
+        for i in range(ROWS):
+            db.add(Document(
+                filename=f"doc{i}.pdf", file_path=f"/tmp/doc{i}.pdf",
+                content_type="application/pdf", size=1000, processed=True, owner_id=user_id
+            ))
+            db.add(Query(query_text=f"question {i}", response="answer", user_id=user_id))
+        db.commit()
+    finally:
+        db.close()
+    return user_id
+
+def all_pages(client, path: str, user_id: int) -> list:
+    pages, cursor = [], None
+    while True:
+        response = client.get(path + (f"&cursor={cursor}" if cursor else ""), headers=auth_headers(user_id))
+        assert response.status_code == 200, response.text
+        pages.append([row["id"] for row in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+
+@pytest.mark.parametrize("path", ["/api/v1/documents/?limit=10", "/api/v1/queries/?limit=10"])
+def test_pages_walk_every_row_once_newest_first(client, seeded_user, path):
+    pages = all_pages(client, path, seeded_user)
+    assert [len(page) for page in pages] == [10, 10, 5]
+    ids = [row_id for page in pages for row_id in page]
+    assert ids == sorted(ids, reverse=True)
+    assert len(set(ids)) == ROWS
+
+@pytest.mark.parametrize("path", ["/api/v1/documents/", "/api/v1/queries/"])
+def test_total_is_only_counted_on_request(client, seeded_user, path):
+    assert "X-Total-Count" not in client.get(path, headers=auth_headers(seeded_user)).headers
+    response = client.get(f"{path}?include_total=true", headers=auth_headers(seeded_user))
+    assert response.headers["X-Total-Count"] == str(ROWS)
+
+def test_projection_returns_only_the_requested_fields(client, seeded_user):
+    response = client.get("/api/v1/queries/?fields=query_text", headers=auth_headers(seeded_user))
+    assert response.status_code == 200
+    # The keyset columns are always included
+    assert set(response.json()[0]) == {"id", "created_at", "query_text"}
+
+def test_unknown_fields_and_bad_cursors_are_rejected(client, seeded_user):
+    headers = auth_headers(seeded_user)
+    assert client.get("/api/v1/queries/?fields=password", headers=headers).status_code == 400
+    assert client.get("/api/v1/queries/?cursor=not-a-cursor", headers=headers).status_code == 400
@@ -0,0 +1,126 @@
+"""
+Tests for batch uploads and their aggregate progress.
+
+Uploaded documents are processed by the app's background ingestor, which
+the test client starts with the app.
+
+Run with: python -m pytest tests/api
+"""
+import io
+import time
+import uuid
+import zipfile
+
+import pytest
+
+from app.api import documents
+from app.core.config import settings
+from app.db.models import User
+from app.db.session import SessionLocal
+
+from conftest import auth_headers
+
+TEXT = "\n\n".join(f"Paragraph {i} about uploading many documents at once." for i in range(20))
+
+def text_file(name: str) -> tuple:
+    return ("files", (name, TEXT.encode(), "text/plain"))
+
+def zip_file(name: str, members: dict) -> tuple:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for member, content in members.items():
+            archive.writestr(member, content)
+    return ("files", (name, buffer.getvalue(), "application/zip"))
+
+def other_user() -> int:
+    db = SessionLocal()
+    try:
+        user = User(email=f"{uuid.uuid4().hex}@example.com", hashed_password="x", is_active=True)
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+def wait_for_batch(client, batch_id: str, user_id: int, timeout: float = 10) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        response = client.get(f"/api/v1/documents/upload/batch/{batch_id}", headers=auth_headers(user_id))
+        assert response.status_code == 200, response.text
+        if response.json()["status"] == "completed":
+            return response.json()
+        assert time.monotonic() < deadline, response.json()
+        time.sleep(0.05)
+
+def test_batch_is_processed_in_the_background(client, user_id):
+    response = client.post(
+        "/api/v1/documents/upload/batch",
+        files=[
+            text_file("a.txt"),
+            text_file("a.txt"),
+            zip_file("more.zip", {"docs/b.txt": TEXT, "docs/readme.md": "skipped", "__MACOSX/docs/._b.txt": "x"}),
+        ],
+        headers=auth_headers(user_id)
+    )
+    assert response.status_code == 202, response.text
+    batch = response.json()
+    assert batch["status"] == "processing"
+    assert batch["total"] == batch["pending"] == len(batch["document_ids"]) == 3
+    assert batch["skipped"] == ["more.zip/docs/readme.md"]
+
+    progress = wait_for_batch(client, batch["batch_id"], user_id)
+    assert progress["total"] == progress["completed"] == 3
+    assert progress["progress"] == 100
+    # Only returned by the upload
+    assert progress["document_ids"] == [] and progress["skipped"] == []
+    for document_id in batch["document_ids"]:
+        status = client.get(f"/api/v1/documents/{document_id}/status", headers=auth_headers(user_id)).json()
+        assert status["processing_status"] == "completed"
+
+def test_progress_counts_documents_by_status(client, user_id, monkeypatch):
+    # Nothing is processed, so the batch stays pending
+    monkeypatch.setattr(documents.document_ingestor, "enqueue", lambda document_ids: None)
+    response = client.post(
+        "/api/v1/documents/upload/batch", files=[text_file("a.txt"), text_file("b.txt")],
+        headers=auth_headers(user_id)
+    )
+    batch_id = response.json()["batch_id"]
+    progress = client.get(f"/api/v1/documents/upload/batch/{batch_id}", headers=auth_headers(user_id)).json()
+    assert progress["status"] == "processing"
+    assert (progress["pending"], progress["completed"], progress["progress"]) == (2, 0, 0)
+
+    # Deleted documents leave the batch
+    first_id = response.json()["document_ids"][0]
+    assert client.delete(f"/api/v1/documents/{first_id}", headers=auth_headers(user_id)).status_code == 204
+    progress = client.get(f"/api/v1/documents/upload/batch/{batch_id}", headers=auth_headers(user_id)).json()
+    assert progress["total"] == 1
+
+def test_batches_of_other_users_are_not_found(client, user_id):
+    response = client.post(
+        "/api/v1/documents/upload/batch", files=[text_file("a.txt")], headers=auth_headers(user_id)
+    )
+    batch_id = response.json()["batch_id"]
+    assert client.get(f"/api/v1/documents/upload/batch/{batch_id}", headers=auth_headers(other_user())).status_code == 404
+    assert client.get(
+        "/api/v1/documents/upload/batch/0123456789abcdef", headers=auth_headers(user_id)
+    ).status_code == 404
+
+def test_invalid_batches_are_rejected(client, user_id):
+    headers = auth_headers(user_id)
+    unsupported = ("files", ("image.png", b"\x89PNG", "image/png"))
+    assert client.post("/api/v1/documents/upload/batch", files=[unsupported], headers=headers).status_code == 400
+    bad_zip = ("files", ("broken.zip", b"not a zip", "application/zip"))
+    assert client.post("/api/v1/documents/upload/batch", files=[bad_zip], headers=headers).status_code == 400
+    empty = zip_file("empty.zip", {"readme.md": "nothing to ingest"})
+    assert client.post("/api/v1/documents/upload/batch", files=[empty], headers=headers).status_code == 400
+
+@pytest.mark.parametrize("setting, value", [("BATCH_UPLOAD_MAX_FILES", 1), ("BATCH_UPLOAD_MAX_BYTES", len(TEXT))])
+def test_oversized_batches_are_rejected(client, user_id, monkeypatch, setting, value):
+    monkeypatch.setattr(settings, setting, value)
+    response = client.post(
+        "/api/v1/documents/upload/batch", files=[text_file("a.txt"), text_file("b.txt")],
+        headers=auth_headers(user_id)
+    )
+    assert response.status_code == 413
+    listed = client.get("/api/v1/documents/?include_total=true", headers=auth_headers(user_id))
+    assert listed.headers["X-Total-Count"] == "0"
@@ -0,0 +1,161 @@
+"""
+Quantization benchmark: recall, latency and memory of the quantized chunk index.
+
+Ingests a synthetic corpus into a throwaway vector store, copies the chunk
+embeddings into int8 and binary quantized indexes, and runs the same queries
+against Chroma (float32 HNSW) and against each quantized index, with and
+without full-precision rescoring. "No rescore" ranks by code distance alone;
+"rescore" ranks QUANTIZED_RESCORE_CANDIDATES x k candidates by code distance
+and reorders them against the float32 vectors on disk. Recall@k is measured
+against an exact brute-force search over all chunk embeddings.
+
+The fake embeddings are sparse (most dimensions are exactly zero), which
+binary codes represent poorly; measure binary recall with a real embedding
+model before relying on it.
+
+Use --dim to set the fake embedding size, e.g. --dim 1536 for an OpenAI-sized model.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from benchmark_rag import configure_environment, git_commit, latency_summary, rate  # noqa: E402
+from benchmark_retrieval import exact_top_k, ingest  # noqa: E402
+
+def directory_bytes(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+def bench_mode(label: str, search, questions: list, query_embeddings: list, truth: list, args) -> dict:
+    for question, query_embedding in list(zip(questions, query_embeddings))[:args.warmup]:
+        search(question, query_embedding)
+
+    samples = []
+    hits = 0
+    start = time.perf_counter()
+    for question, query_embedding, expected in zip(questions, query_embeddings, truth):
+        query_start = time.perf_counter()
+        results = search(question, query_embedding)
+        samples.append(time.perf_counter() - query_start)
+        hits += len(expected & {result["id"] for result in results})
+    elapsed = time.perf_counter() - start
+
+    result = dict(
+        latency_summary(samples),
+        mode=label,
+        recall=hits / (len(questions) * args.top_k),
+        queries_per_sec=rate(len(samples), elapsed),
+    )
+    print(
+        f"{label:>16} | recall@{args.top_k} {result['recall']:.3f} | "
+        f"p50 {result['p50_ms']:6.2f}ms | p95 {result['p95_ms']:6.2f}ms | {result['queries_per_sec']:7.1f} q/s"
+    )
+    return result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the int8 and binary quantized indexes against Chroma")
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=None, help="Fake embedding dimensions (default: FAKE_EMBEDDING_DIM)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="JSON results path (default: results/quantization-<commit>.json)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="qgenai-bench-") as work_dir:
+        if args.dim:
+            os.environ["FAKE_EMBEDDING_DIM"] = str(args.dim)
+        # Chunks go to Chroma first; the quantized indexes are built from its embeddings
+        os.environ["VECTOR_INDEX_MODE"] = "float"
+        configure_environment(work_dir)
+        from app.core.config import settings
+        from app.rag.embeddings import get_embeddings
+        from app.rag.quantized_index import QuantizedIndex
+        from app.rag.vector_store import query_vector_store
+
+        print("\n=== Starting QGenAI Quantization Benchmark ===\n")
+        chunk_ids, chunk_texts, embeddings = ingest(args)
+        dim = len(embeddings[0])
+        float_bytes = len(embeddings) * dim * 4
+        print(f"📐 {dim} dimensions, {float_bytes / 1e6:.1f} MB of float32 vectors")
+
+        rng = random.Random(args.seed)
+        questions = []
+        for _ in range(args.queries):
+            sentences = [s for s in rng.choice(chunk_texts).split(". ") if s.strip()]
+            questions.append(rng.choice(sentences))
+        query_embeddings = get_embeddings().embed_documents(questions)
+        truth = exact_top_k(query_embeddings, embeddings, chunk_ids, args.top_k)
+
+        print()
+        results = [
+            bench_mode(
+                "chroma float32",
+                lambda question, _: query_vector_store(question, n_results=args.top_k, coarse_documents=0),
+                questions, query_embeddings, truth, args
+            ),
+        ]
+        results[0]["disk_bytes"] = directory_bytes(settings.VECTOR_DB_PATH)
+
+        candidates = args.top_k * settings.QUANTIZED_RESCORE_CANDIDATES
+        for mode in ("int8", "binary"):
+            path = os.path.join(work_dir, f"quantized-{mode}")
+            index = QuantizedIndex(path, mode)
+            metadatas = [{"document_id": int(chunk_id.split("-", 1)[0])} for chunk_id in chunk_ids]
+            for start in range(0, len(chunk_ids), 1000):
+                end = start + 1000
+                index.add(chunk_ids[start:end], embeddings[start:end], metadatas[start:end])
+
+            footprint = {
+                "resident_bytes": index.memory_bytes(),
+                "disk_bytes": directory_bytes(path),
+                "resident_ratio": index.memory_bytes() / float_bytes,
+            }
+            print(
+                f"💾 {mode}: {footprint['resident_bytes'] / 1e6:.1f} MB resident "
+                f"({footprint['resident_ratio']:.1%} of float32), {footprint['disk_bytes'] / 1e6:.1f} MB on disk"
+            )
+            for rescore in (False, True):
+                result = bench_mode(
+                    f"{mode} {'rescore' if rescore else 'no rescore'}",
+                    lambda _, query_embedding: index.search(
+                        query_embedding,
+                        args.top_k,
+                        candidates=candidates if rescore else args.top_k
+                    ),
+                    questions, query_embeddings, truth, args
+                )
+                result.update(footprint, candidates=candidates if rescore else args.top_k)
+                results.append(result)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "params": vars(args),
+        "chunks": len(chunk_ids),
+        "dimensions": dim,
+        "float32_bytes": float_bytes,
+        "results": results,
+    }
+    output = args.output or os.path.join(BENCH_DIR, "results", f"quantization-{commit}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\n📝 Results written to {output}")
+
+if __name__ == "__main__":
+    main()
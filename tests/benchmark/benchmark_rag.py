@@ -0,0 +1,298 @@
+"""
+Component benchmarks for the ingestion and retrieval pipeline.
+
+Each stage (extraction, splitting, chunk persistence, vector add, and vector
+query) is timed in isolation against a synthetic corpus, using the fake
+offline embedding provider and a throwaway SQLite database and vector store.
+Results are written to JSON so runs can be compared between commits.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(BENCH_DIR, "../../backend"))
+
+def configure_environment(work_dir: str) -> None:
+    """Point the backend at throwaway storage and offline providers before it is imported."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(work_dir, 'bench.db')}"
+    os.environ["VECTOR_DB_PATH"] = os.path.join(work_dir, "vector_db")
+    os.environ["UPLOAD_FOLDER"] = os.path.join(work_dir, "uploads")
+    os.environ.setdefault("EMBEDDING_PROVIDER", "fake")
+    os.environ.setdefault("LLM_PROVIDER", "fake")
+    sys.path.insert(0, BACKEND_DIR)
+    sys.path.insert(0, BENCH_DIR)
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+def latency_summary(samples: list) -> dict:
+    """Summarize latency samples (in seconds) as milliseconds."""
+    return {
+        "count": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "mean_ms": (sum(samples) / len(samples) * 1000) if samples else 0.0,
+    }
+
+def rate(count: int, seconds: float) -> float:
+    return count / seconds if seconds > 0 else 0.0
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+class RAGBenchmark:
+    def __init__(self, args, work_dir: str):
+        self.args = args
+        self.work_dir = work_dir
+        self.results = {}
+
+    def run(self) -> dict:
+        """Run every stage benchmark and return the results."""
+        from corpus import generate_corpus
+        from app.db.models import Base
+        from app.db.session import engine
+
+        Base.metadata.create_all(bind=engine)
+
+        print(f"📚 Generating corpus: {self.args.documents} documents x {self.args.pages} pages ({self.args.format})")
+        corpus = generate_corpus(
+            os.path.join(self.work_dir, "corpus"),
+            self.args.documents,
+            self.args.pages,
+            self.args.format,
+            self.args.seed,
+        )
+
+        texts = self.bench_extract(corpus)
+        chunk_sets = self.bench_split(texts, [content_type for _, content_type, _ in corpus])
+        documents = self.bench_persist(corpus, chunk_sets)
+        self.bench_vector_add(documents, chunk_sets)
+        self.bench_query(chunk_sets)
+        return self.results
+
+    def bench_extract(self, corpus: list) -> list:
+        from app.rag.document_processor import extract_text
+
+        texts = []
+        total_pages = 0
+        total_bytes = 0
+        start = time.perf_counter()
+        for path, content_type, pages in corpus:
+            texts.append(extract_text(path, content_type))
+            total_pages += pages
+            total_bytes += os.path.getsize(path)
+        elapsed = time.perf_counter() - start
+
+        self.results["extract_text"] = {
+            "documents": len(corpus),
+            "pages": total_pages,
+            "seconds": elapsed,
+            "pages_per_sec": rate(total_pages, elapsed),
+            "mb_per_sec": rate(total_bytes / 1e6, elapsed),
+        }
+        print(f"✅ extract_text: {self.results['extract_text']['pages_per_sec']:.1f} pages/sec")
+        return texts
+
+    def bench_split(self, texts: list, content_types: list) -> list:
+        from app.rag.document_processor import split_text
+
+        chunk_sets = []
+        start = time.perf_counter()
+        for text, content_type in zip(texts, content_types):
+            chunk_sets.append(split_text(text, content_type))
+        elapsed = time.perf_counter() - start
+
+        total_chunks = sum(len(chunks) for chunks in chunk_sets)
+        self.results["split_text"] = {
+            "chunks": total_chunks,
+            "seconds": elapsed,
+            "chunks_per_sec": rate(total_chunks, elapsed),
+            "mb_per_sec": rate(sum(len(text) for text in texts) / 1e6, elapsed),
+        }
+        print(f"✅ split_text: {self.results['split_text']['chunks_per_sec']:.1f} chunks/sec")
+        return chunk_sets
+
+    def bench_persist(self, corpus: list, chunk_sets: list) -> list:
+        from app.db.models import Document, DocumentChunk, User
+        from app.db.session import SessionLocal
+
+        db = SessionLocal()
+        try:
+            user = User(email="bench@example.com", hashed_password="x", is_active=True)
+            db.add(user)
+            db.commit()
+
+            documents = []
+            for path, content_type, _ in corpus:
+                document = Document(
+                    filename=os.path.basename(path),
+                    file_path=path,
+                    content_type=content_type,
+                    size=os.path.getsize(path),
+                    processed=False,
+                    owner_id=user.id,
+                )
+                db.add(document)
+                documents.append(document)
+            db.commit()
+
+            total_chunks = 0
+            start = time.perf_counter()
+            for document, chunks in zip(documents, chunk_sets):
+                for i, chunk in enumerate(chunks):
+                    db.add(DocumentChunk(
+                        chunk_id=f"{document.id}-chunk-{i}",
+                        content=chunk["text"],
+                        page_number=chunk.get("page_number"),
+                        section=chunk.get("section", ""),
+                        document_id=document.id,
+                    ))
+                db.commit()
+                total_chunks += len(chunks)
+            elapsed = time.perf_counter() - start
+
+            self.results["chunk_persistence"] = {
+                "chunks": total_chunks,
+                "seconds": elapsed,
+                "chunks_per_sec": rate(total_chunks, elapsed),
+            }
+            print(f"✅ chunk persistence: {self.results['chunk_persistence']['chunks_per_sec']:.1f} chunks/sec")
+            return [(document.id, document.filename) for document in documents]
+        finally:
+            db.close()
+
+    def bench_vector_add(self, documents: list, chunk_sets: list) -> None:
+        from app.rag.vector_store import add_chunks_to_vector_store
+
+        total_chunks = 0
+        start = time.perf_counter()
+        for (document_id, filename), chunks in zip(documents, chunk_sets):
+            if not chunks:
+                continue
+            add_chunks_to_vector_store(
+                [chunk["text"] for chunk in chunks],
+                [f"{document_id}-chunk-{i}" for i in range(len(chunks))],
+                [
+                    {
+                        "document_id": document_id,
+                        "document_name": filename,
+                        "chunk_id": f"{document_id}-chunk-{i}",
+                        "page_number": chunk.get("page_number") or 0,
+                        "section": chunk.get("section", ""),
+                    }
+                    for i, chunk in enumerate(chunks)
+                ],
+            )
+            total_chunks += len(chunks)
+        elapsed = time.perf_counter() - start
+
+        self.results["vector_add"] = {
+            "chunks": total_chunks,
+            "seconds": elapsed,
+            "chunks_per_sec": rate(total_chunks, elapsed),
+        }
+        print(f"✅ vector add: {self.results['vector_add']['chunks_per_sec']:.1f} chunks/sec")
+
+    def bench_query(self, chunk_sets: list) -> None:
+        from app.rag.vector_store import query_vector_store
+
+        rng = random.Random(self.args.seed)
+        all_chunks = [chunk for chunks in chunk_sets for chunk in chunks]
+        if not all_chunks:
+            print("⚠️ No chunks to query")
+            return
+
+        # Use a sentence from a random chunk as the question
+        questions = []
+        for _ in range(self.args.queries):
+            sentences = [s for s in rng.choice(all_chunks)["text"].split(". ") if s.strip()]
+            questions.append(rng.choice(sentences))
+
+        for question in questions[:self.args.warmup]:
+            query_vector_store(question, n_results=self.args.top_k)
+
+        samples = []
+        start = time.perf_counter()
+        for question in questions:
+            query_start = time.perf_counter()
+            query_vector_store(question, n_results=self.args.top_k)
+            samples.append(time.perf_counter() - query_start)
+        elapsed = time.perf_counter() - start
+
+        self.results["query_vector_store"] = dict(
+            latency_summary(samples),
+            top_k=self.args.top_k,
+            queries_per_sec=rate(len(samples), elapsed),
+        )
+        summary = self.results["query_vector_store"]
+        print(f"✅ query_vector_store: p50 {summary['p50_ms']:.1f}ms, p95 {summary['p95_ms']:.1f}ms, p99 {summary['p99_ms']:.1f}ms")
+
+def compare(current: dict, baseline: dict) -> None:
+    """Print the relative change of every numeric metric against a baseline run."""
+    print(f"\n=== Comparison with {baseline.get('commit', 'baseline')} ===\n")
+    for stage, metrics in current["results"].items():
+        base_metrics = baseline.get("results", {}).get(stage, {})
+        for name, value in metrics.items():
+            base_value = base_metrics.get(name)
+            if not isinstance(value, (int, float)) or not base_value:
+                continue
+            change = (value - base_value) / base_value * 100
+            print(f"{stage}.{name}: {base_value:.2f} -> {value:.2f} ({change:+.1f}%)")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark ingestion and retrieval components")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--format", choices=["pdf", "txt"], default="pdf")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="JSON results path (default: results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Baseline JSON results to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="qgenai-bench-") as work_dir:
+        configure_environment(work_dir)
+
+        print("\n=== Starting QGenAI Component Benchmark ===\n")
+        results = RAGBenchmark(args, work_dir).run()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "params": vars(args),
+        "results": results,
+    }
+
+    output = args.output or os.path.join(BENCH_DIR, "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\n📝 Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(report, json.load(file))
+
+if __name__ == "__main__":
+    main()
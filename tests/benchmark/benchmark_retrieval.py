@@ -0,0 +1,151 @@
+"""
+Retrieval benchmark: recall versus latency of two-stage (coarse-to-fine) search.
+
+Ingests a synthetic corpus into a throwaway vector store, then runs the same
+queries with every chunk searched (coarse_documents=0) and with the top-K
+documents picked by centroid first, for each K in --coarse. Recall@k is
+measured against an exact brute-force search over all chunk embeddings, so
+the flat search's own HNSW approximation shows up in its recall too.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from benchmark_rag import configure_environment, git_commit, latency_summary, rate  # noqa: E402
+from corpus import generate_document  # noqa: E402
+
+def ingest(args) -> tuple:
+    """Chunk and index the corpus; return (chunk_ids, chunk_texts, embeddings)."""
+    from app.db.models import Base
+    from app.db.session import engine
+    from app.rag.document_processor import split_text
+    from app.rag.embeddings import get_embeddings
+    from app.rag.vector_store import add_chunks_to_vector_store
+
+    # The vector store looks up its active index in the database
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(args.seed)
+    chunk_ids, chunk_texts = [], []
+    start = time.perf_counter()
+    for document_id in range(1, args.documents + 1):
+        _, pages = generate_document(rng, args.pages)
+        text = "".join(f"[Page {i + 1}]\n{page}\n\n" for i, page in enumerate(pages))
+        chunks = split_text(text, "application/pdf")
+        ids = [f"{document_id}-chunk-{i}" for i in range(len(chunks))]
+        add_chunks_to_vector_store(
+            [chunk["text"] for chunk in chunks],
+            ids,
+            [
+                {
+                    "document_id": document_id,
+                    "document_name": f"document-{document_id}.pdf",
+                    "chunk_id": chunk_id,
+                    "page_number": chunk["page_number"],
+                    "section": chunk["section"],
+                }
+                for chunk_id, chunk in zip(ids, chunks)
+            ],
+        )
+        chunk_ids.extend(ids)
+        chunk_texts.extend(chunk["text"] for chunk in chunks)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Indexed {len(chunk_ids)} chunks from {args.documents} documents in {elapsed:.1f}s")
+
+    return chunk_ids, chunk_texts, get_embeddings().embed_documents(chunk_texts)
+
+def exact_top_k(query_embeddings: list, embeddings: list, chunk_ids: list, k: int) -> list:
+    """Brute-force nearest chunks by L2 distance, the metric of the chunk collection."""
+    import numpy as np
+
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    truth = []
+    for query in np.asarray(query_embeddings, dtype=np.float32):
+        distances = ((matrix - query) ** 2).sum(axis=1)
+        truth.append({chunk_ids[i] for i in np.argsort(distances)[:k]})
+    return truth
+
+def bench_mode(questions: list, truth: list, coarse_documents: int, args) -> dict:
+    from app.rag.vector_store import query_vector_store
+
+    for question in questions[:args.warmup]:
+        query_vector_store(question, n_results=args.top_k, coarse_documents=coarse_documents)
+
+    samples = []
+    hits = 0
+    start = time.perf_counter()
+    for question, expected in zip(questions, truth):
+        query_start = time.perf_counter()
+        results = query_vector_store(question, n_results=args.top_k, coarse_documents=coarse_documents)
+        samples.append(time.perf_counter() - query_start)
+        hits += len(expected & {result["id"] for result in results})
+    elapsed = time.perf_counter() - start
+
+    result = dict(
+        latency_summary(samples),
+        coarse_documents=coarse_documents,
+        recall=hits / (len(questions) * args.top_k),
+        queries_per_sec=rate(len(samples), elapsed),
+    )
+    label = "flat" if coarse_documents == 0 else f"top {coarse_documents} docs"
+    print(
+        f"{label:>14} | recall@{args.top_k} {result['recall']:.3f} | "
+        f"p50 {result['p50_ms']:6.2f}ms | p95 {result['p95_ms']:6.2f}ms | {result['queries_per_sec']:7.1f} q/s"
+    )
+    return result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark recall versus latency of two-stage retrieval")
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--coarse", default="1,2,5,10,20,50", help="Comma-separated coarse_documents values to compare")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="JSON results path (default: results/retrieval-<commit>.json)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="qgenai-bench-") as work_dir:
+        configure_environment(work_dir)
+        from app.rag.embeddings import get_embeddings
+
+        print("\n=== Starting QGenAI Retrieval Benchmark ===\n")
+        chunk_ids, chunk_texts, embeddings = ingest(args)
+
+        # Use a sentence from a random chunk as the question
+        rng = random.Random(args.seed)
+        questions = []
+        for _ in range(args.queries):
+            sentences = [s for s in rng.choice(chunk_texts).split(". ") if s.strip()]
+            questions.append(rng.choice(sentences))
+        truth = exact_top_k(get_embeddings().embed_documents(questions), embeddings, chunk_ids, args.top_k)
+
+        print()
+        results = [bench_mode(questions, truth, 0, args)]
+        for coarse_documents in (int(value) for value in args.coarse.split(",") if value.strip()):
+            results.append(bench_mode(questions, truth, coarse_documents, args))
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "params": vars(args),
+        "chunks": len(chunk_ids),
+        "results": results,
+    }
+    output = args.output or os.path.join(BENCH_DIR, "results", f"retrieval-{commit}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\n📝 Results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Text splitter benchmark: the token-aware chunker versus the previous splitter.
+
+Splits a synthetic corpus with the previous character-based LangChain
+splitter (1000 characters, 200 overlap, built per call as before) and with
+the token-aware chunker configured in Settings, and reports throughput and
+how evenly each one sizes its chunks in tokens. The total number of tokens
+across chunks, overlap included, is what gets sent to the embedding model.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(BENCH_DIR, "../../backend"))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from benchmark_rag import git_commit, percentile, rate  # noqa: E402
+from corpus import generate_document  # noqa: E402
+
+def legacy_split(text: str) -> list:
+    """The splitter split_text used before the token-aware chunker."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, length_function=len)
+    return [chunk.page_content for chunk in text_splitter.create_documents([text])]
+
+def token_summary(chunks: list, count_tokens) -> dict:
+    counts = [count_tokens(chunk) for chunk in chunks]
+    mean = sum(counts) / len(counts)
+    return {
+        "tokens_total": sum(counts),
+        "tokens_mean": mean,
+        "tokens_stdev": math.sqrt(sum((count - mean) ** 2 for count in counts) / len(counts)),
+        "tokens_p5": percentile(counts, 5),
+        "tokens_p95": percentile(counts, 95),
+        "tokens_max": max(counts),
+    }
+
+def bench(name: str, split, pages: list, count_tokens, repeat: int) -> dict:
+    total_bytes = sum(len(page.encode("utf-8")) for page in pages) * repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        chunks = [chunk for page in pages for chunk in split(page)]
+    elapsed = time.perf_counter() - start
+
+    result = dict(
+        chunks=len(chunks),
+        seconds=elapsed,
+        chunks_per_sec=rate(len(chunks) * repeat, elapsed),
+        mb_per_sec=rate(total_bytes / 1e6, elapsed),
+        **token_summary(chunks, count_tokens),
+    )
+    print(
+        f"✅ {name}: {result['mb_per_sec']:.2f} MB/sec, {result['chunks']} chunks, "
+        f"{result['tokens_mean']:.0f} ± {result['tokens_stdev']:.0f} tokens/chunk "
+        f"(p5 {result['tokens_p5']}, p95 {result['tokens_p95']}, max {result['tokens_max']}), "
+        f"{result['tokens_total']} tokens to embed"
+    )
+    return result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the token-aware chunker against the previous splitter")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3, help="Times to split the corpus per splitter")
+    parser.add_argument("--content-type", default="application/pdf", help="Selects the chunker settings")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="JSON results path (default: results/splitter-<commit>.json)")
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    from app.rag.chunker import approximate_token_count, get_chunker, get_token_counter
+
+    rng = random.Random(args.seed)
+    pages = [page for _ in range(args.documents) for page in generate_document(rng, args.pages)[1]]
+    count_tokens = get_token_counter(settings.CHUNK_TOKENIZER)
+    chunker = get_chunker(args.content_type)
+
+    print("\n=== Starting QGenAI Splitter Benchmark ===\n")
+    print(
+        f"📚 {len(pages)} pages; chunker: {chunker.chunk_tokens} tokens, {chunker.overlap_tokens} overlap "
+        f"({'approximate' if count_tokens is approximate_token_count else settings.CHUNK_TOKENIZER} token counts)"
+    )
+
+    # Import LangChain outside the timed region
+    legacy_split("warm up")
+    results = {
+        "legacy": bench("RecursiveCharacterTextSplitter", legacy_split, pages, count_tokens, args.repeat),
+        "chunker": bench("TextChunker", chunker.split, pages, count_tokens, args.repeat),
+    }
+    speedup = rate(results["chunker"]["mb_per_sec"], results["legacy"]["mb_per_sec"])
+    print(f"\n⚡ Chunker throughput: {speedup:.1f}x the previous splitter")
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "params": vars(args),
+        "results": results,
+    }
+    output = args.output or os.path.join(BENCH_DIR, "results", f"splitter-{commit}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\n📝 Results written to {output}")
+
+if __name__ == "__main__":
+    main()
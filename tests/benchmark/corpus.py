@@ -0,0 +1,108 @@
+"""
+Synthetic corpus generator for the ingestion and retrieval benchmarks.
+
+Generates N documents of M pages of seeded, sentence-structured text so that
+benchmark runs are repeatable and comparable between commits.
+"""
+import argparse
+import os
+import random
+
+TOPICS = [
+    "employee onboarding", "contractor agreements", "expense reimbursement",
+    "security policy", "data retention", "incident response", "vendor management",
+    "remote work", "performance reviews", "travel policy", "procurement",
+    "software licensing", "customer support", "quarterly planning",
+]
+
+SUBJECTS = [
+    "The company", "Each employee", "The finance team", "A contractor", "The manager",
+    "The security office", "Every department", "The vendor", "The reviewer", "Human resources",
+]
+
+VERBS = [
+    "must submit", "is responsible for", "should review", "may request", "will approve",
+    "is required to document", "can escalate", "needs to archive", "must report", "will audit",
+]
+
+OBJECTS = [
+    "all receipts within thirty days", "the signed agreement before work begins",
+    "access credentials on a quarterly basis", "any suspected breach immediately",
+    "budget changes above the approved threshold", "customer records older than seven years",
+    "the onboarding checklist during the first week", "travel bookings through the approved portal",
+    "license usage at the end of each quarter", "exceptions with written justification",
+]
+
+QUALIFIERS = [
+    "unless otherwise agreed in writing", "in accordance with local regulations",
+    "as described in the appendix", "except during the annual freeze period",
+    "with approval from the department head", "to ensure compliance",
+]
+
+def make_sentence(rng: random.Random, topic: str) -> str:
+    sentence = f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)}"
+    if rng.random() < 0.4:
+        sentence += f" {rng.choice(QUALIFIERS)}"
+    if rng.random() < 0.3:
+        sentence += f" regarding {topic}"
+    return sentence + "."
+
+def make_page(rng: random.Random, topic: str, paragraphs: int = 6) -> str:
+    """Generate one page of text as a few paragraphs of sentences."""
+    return "\n\n".join(
+        " ".join(make_sentence(rng, topic) for _ in range(rng.randint(4, 8)))
+        for _ in range(paragraphs)
+    )
+
+def generate_document(rng: random.Random, pages: int) -> tuple:
+    """Generate a (topic, pages) tuple for one document."""
+    topic = rng.choice(TOPICS)
+    return topic, [make_page(rng, topic) for _ in range(pages)]
+
+def write_txt(path: str, pages: list) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("\n\n".join(pages))
+
+def write_pdf(path: str, pages: list) -> None:
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.set_font("Arial", size=11)
+    for page in pages:
+        pdf.add_page()
+        pdf.multi_cell(0, 6, txt=page)
+    pdf.output(path)
+
+def generate_corpus(output_dir: str, documents: int, pages: int, file_format: str = "pdf", seed: int = 42) -> list:
+    """Write a synthetic corpus and return a list of (file_path, content_type, pages) tuples."""
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    corpus = []
+
+    for i in range(documents):
+        topic, doc_pages = generate_document(rng, pages)
+        filename = f"doc_{i:05d}_{topic.replace(' ', '_')}.{file_format}"
+        path = os.path.join(output_dir, filename)
+
+        if file_format == "pdf":
+            write_pdf(path, doc_pages)
+            content_type = "application/pdf"
+        else:
+            write_txt(path, doc_pages)
+            content_type = "text/plain"
+
+        corpus.append((path, content_type, len(doc_pages)))
+
+    return corpus
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark corpus")
+    parser.add_argument("output_dir")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--format", choices=["pdf", "txt"], default="pdf")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    files = generate_corpus(args.output_dir, args.documents, args.pages, args.format, args.seed)
+    print(f"Generated {len(files)} documents in {args.output_dir}")
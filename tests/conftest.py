@@ -0,0 +1,89 @@
+"""
+Shared setup for the backend tests.
+
+Settings are read once, when app.core.config is first imported, so every test
+module shares one throwaway SQLite database, vector store and uploads folder,
+and the offline fake LLM and embedding providers. Nothing here needs network
+access.
+"""
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend"))
+WORK_DIR = tempfile.mkdtemp(prefix="qgenai-tests-")
+
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(WORK_DIR, 'tests.db')}",
+    "VECTOR_DB_PATH": os.path.join(WORK_DIR, "vector_db"),
+    "UPLOAD_FOLDER": os.path.join(WORK_DIR, "uploads"),
+    "EMBEDDING_PROVIDER": "fake",
+    "LLM_PROVIDER": "fake",
+    "CHUNK_TOKENIZER": "approximate",
+})
+sys.path.insert(0, BACKEND_DIR)
+
+@pytest.fixture(scope="session")
+def migrated_db():
+    """Migrate the shared test database to head with Alembic."""
+    from alembic import command
+    from alembic.config import Config
+
+    command.upgrade(Config(os.path.join(BACKEND_DIR, "alembic.ini")), "head")
+
+@pytest.fixture
+def user_id(migrated_db):
+    """Create an active user of its own for a test; returns the user's ID."""
+    from app.db.models import User
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        user = User(email=f"{uuid.uuid4().hex}@example.com", hashed_password="x", is_active=True)
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+@pytest.fixture(scope="module")
+def client(migrated_db):
+    """A TestClient for the app, with its background workers running."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+def auth_headers(user_id: int) -> dict:
+    from app.core.security import create_access_token
+
+    return {"Authorization": f"Bearer {create_access_token(subject=user_id)}"}
+
+def ingest_text(user_id: int, text: str, filename: str = "notes.txt") -> int:
+    """Store a text document for a user and ingest it like an upload; returns its ID."""
+    from app.core.config import settings
+    from app.db.models import Document
+    from app.db.session import SessionLocal
+    from app.rag.document_processor import process_document
+
+    os.makedirs(settings.UPLOAD_FOLDER, exist_ok=True)
+    file_path = os.path.join(settings.UPLOAD_FOLDER, f"{uuid.uuid4().hex}-{filename}")
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.write(text)
+
+    db = SessionLocal()
+    try:
+        document = Document(
+            filename=filename, file_path=file_path, content_type="text/plain",
+            size=len(text.encode()), owner_id=user_id
+        )
+        db.add(document)
+        db.commit()
+        assert process_document(document, db)
+        return document.id
+    finally:
+        db.close()
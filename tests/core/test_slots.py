@@ -0,0 +1,92 @@
+"""
+Tests for the LLM generation slots shared by the server's worker processes.
+
+Other workers are played by subprocesses that open the same slot directory.
+
+Run with: python -m pytest tests/core
+"""
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app.core.slots import SharedSlots
+from app.rag.query_engine import AdmissionController, AdmissionRejected
+
+from conftest import BACKEND_DIR
+
+def run_worker(slot_dir: str, code: str) -> str:
+    """Run `code` in another process with `slots` opened on slot_dir; returns its output."""
+    script = f"from app.core.slots import SharedSlots\nslots = SharedSlots({slot_dir!r}, 'fake', 2)\n{code}"
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        env={"PYTHONPATH": BACKEND_DIR}, capture_output=True, text=True, check=True, timeout=30
+    )
+    return result.stdout.strip()
+
+def test_slots_are_shared_across_processes(tmp_path):
+    slots = SharedSlots(str(tmp_path), "fake", 2)
+    held = [slots.try_acquire(), slots.try_acquire()]
+    assert sorted(held) == [0, 1]
+    assert slots.try_acquire() is None
+    assert run_worker(str(tmp_path), "print(slots.try_acquire())") == "None"
+
+    slots.release(held[0])
+    assert run_worker(str(tmp_path), "print(slots.try_acquire())") == str(held[0])
+
+def test_slots_of_a_dead_process_are_released(tmp_path):
+    # The worker exits without releasing, as a crashed worker would
+    output = run_worker(str(tmp_path), "print(slots.try_acquire(), slots.try_acquire())")
+    assert output == "0 1"
+
+    slots = SharedSlots(str(tmp_path), "fake", 2)
+    assert slots.try_acquire() is not None
+    assert slots.try_acquire() is not None
+
+def test_one_worker_may_use_the_whole_limit(tmp_path):
+    controller = AdmissionController(
+        "fake", max_concurrency=2, max_queue=4, queue_timeout=1,
+        shared_slots=SharedSlots(str(tmp_path), "fake", 2)
+    )
+    controller.acquire()
+    controller.acquire()
+    controller.release(0.1)
+    controller.release(0.1)
+
+def test_waiter_is_admitted_when_another_worker_frees_a_slot(tmp_path):
+    controller = AdmissionController(
+        "fake", max_concurrency=2, max_queue=4, queue_timeout=5,
+        shared_slots=SharedSlots(str(tmp_path), "fake", 2)
+    )
+    worker = subprocess.Popen(
+        [sys.executable, "-c",
+         f"import sys, time\nfrom app.core.slots import SharedSlots\n"
+         f"slots = SharedSlots({str(tmp_path)!r}, 'fake', 2)\n"
+         f"print(slots.try_acquire(), slots.try_acquire(), flush=True)\ntime.sleep(0.5)"],
+        env={"PYTHONPATH": BACKEND_DIR}, stdout=subprocess.PIPE, text=True
+    )
+    try:
+        assert worker.stdout.readline().strip() == "0 1"
+        start = time.monotonic()
+        controller.acquire()
+        # Admitted once the other worker exits, well before the queue timeout
+        assert 0.2 < time.monotonic() - start < 4
+        controller.release(0.1)
+    finally:
+        worker.wait(10)
+
+def test_waiter_is_rejected_when_other_workers_hold_every_slot(tmp_path):
+    other = SharedSlots(str(tmp_path), "fake", 2)
+    held = [other.try_acquire(), other.try_acquire()]
+    controller = AdmissionController(
+        "fake", max_concurrency=2, max_queue=4, queue_timeout=0.2,
+        shared_slots=SharedSlots(str(tmp_path), "fake", 2)
+    )
+    # A lock taken through another open file blocks this controller as another process would
+    with pytest.raises(AdmissionRejected):
+        controller.acquire()
+    for slot in held:
+        other.release(slot)
+    controller.acquire()
+    controller.release(0.1)
@@ -0,0 +1,193 @@
+"""
+Query-plan regression tests for the ORM queries behind the API endpoints.
+
+Drives every read endpoint in app/api/*.py against a seeded SQLite database,
+captures the SQL the endpoints issue, and runs EXPLAIN QUERY PLAN on each
+statement. A test fails if any statement scans a whole table instead of
+searching an index, which usually means a query changed shape or an index
+went missing.
+
+Run with: python -m pytest tests/db
+"""
+import re
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, text
+
+from app.core.security import get_password_hash
+from app.db.models import Document, DocumentChunk, Query, QuerySource, User
+from app.db.session import SessionLocal, engine
+
+from conftest import auth_headers
+
+USERS = 5
+DOCUMENTS_PER_USER = 40
+CHUNKS_PER_DOCUMENT = 10
+QUERIES_PER_USER = 200
+SOURCES_PER_QUERY = 3
+
+# A plan step that reads every row of a table: "SCAN queries" (or "SCAN TABLE
+# queries" on older SQLite) without a "USING ... INDEX" clause
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?(?P<table>\w+)(?! USING)(?: AS \w+)?$")
+
+SEEDED_TABLES = ("users", "documents", "document_chunks", "queries", "query_sources")
+
+# Tables small enough that scanning them is expected
+SCAN_ALLOWED = {"alembic_version"}
+
+@pytest.fixture(scope="module")
+def seeded_db(migrated_db):
+    """Seed the test database with realistic volumes.
+
+    Returns the IDs of the first seeded user, its documents and a query, and a
+    document of another user.
+    """
+    db = SessionLocal()
+    password_hash = get_password_hash("password")
+    seeded = {"user_id": None, "document_ids": [], "query_id": None, "other_document_id": None}
+    for u in range(USERS):
+        user = User(email=f"plans-user{u}@example.com", hashed_password=password_hash, is_active=True)
+        db.add(user)
+        db.flush()
+        document_ids = []
+        for d in range(DOCUMENTS_PER_USER):
+            document = Document(
+                filename=f"doc{d}.pdf", file_path=f"/tmp/doc{u}_{d}.pdf",
+                content_type="application/pdf", size=1000, processed=True, owner_id=user.id
+            )
+            db.add(document)
+            db.flush()
+            document_ids.append(document.id)
+            db.add_all([
+                DocumentChunk(chunk_id=f"{document.id}-chunk-{c}", content="text", document_id=document.id)
+                for c in range(CHUNKS_PER_DOCUMENT)
+            ])
+        queries = [
+            Query(
+                query_text=f"question {q}", response="answer", user_id=user.id,
+                sources=[
+                    QuerySource(chunk_id=f"{document_ids[0]}-chunk-{s}", document_id=document_ids[0])
+                    for s in range(SOURCES_PER_QUERY)
+                ]
+            )
+            for q in range(QUERIES_PER_USER)
+        ]
+        db.add_all(queries)
+        db.flush()
+        if u == 0:
+            seeded.update(user_id=user.id, document_ids=document_ids, query_id=queries[0].id)
+        elif u == 1:
+            seeded["other_document_id"] = document_ids[0]
+    db.commit()
+    db.close()
+
+    # Only the seeded tables get statistics; the planner assumes the others are
+    # large, so their lookups must still find an index however few rows they hold
+    with engine.connect() as conn:
+        for table in SEEDED_TABLES:
+            conn.execute(text(f"ANALYZE {table}"))
+        conn.commit()
+
+    return seeded
+
+@pytest.fixture
+def captured_sql():
+    """Record every SELECT statement (with its parameters) issued on the engine."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
+
+def full_scans(statements: list) -> list:
+    """EXPLAIN every captured statement and return the full-table-scan steps."""
+    problems = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            for row in plan:
+                detail = row[-1]
+                match = FULL_SCAN.match(detail)
+                if match and match.group("table") not in SCAN_ALLOWED:
+                    problems.append(f"{detail}\n    in: {' '.join(statement.split())}")
+    return problems
+
+def assert_no_full_scans(statements: list) -> None:
+    assert statements, "No SQL was captured"
+    problems = full_scans(statements)
+    assert not problems, "Full table scans:\n" + "\n".join(problems)
+
+ENDPOINTS = [
+    "/api/v1/documents/",
+    "/api/v1/documents/?limit=10",
+    "/api/v1/documents/?include_total=true",
+    "/api/v1/documents/?fields=filename,processed",
+    "/api/v1/documents/{document_id}",
+    "/api/v1/documents/{document_id}/status",
+    "/api/v1/queries/",
+    "/api/v1/queries/?limit=10",
+    "/api/v1/queries/?include_total=true",
+    "/api/v1/queries/?fields=query_text",
+    "/api/v1/queries/?fields=query_text,sources",
+    "/api/v1/queries/{query_id}",
+]
+
+@pytest.mark.parametrize("path", ENDPOINTS)
+def test_read_endpoints_use_indexes(seeded_db, client, captured_sql, path):
+    path = path.format(document_id=seeded_db["document_ids"][0], query_id=seeded_db["query_id"])
+    response = client.get(path, headers=auth_headers(seeded_db["user_id"]))
+    assert response.status_code == 200, response.text
+    assert_no_full_scans(captured_sql)
+
+@pytest.mark.parametrize("path", ["/api/v1/documents/?limit=10", "/api/v1/queries/?limit=10"])
+def test_next_page_uses_indexes(seeded_db, client, captured_sql, path):
+    headers = auth_headers(seeded_db["user_id"])
+    cursor = client.get(path, headers=headers).headers["X-Next-Cursor"]
+    captured_sql.clear()
+
+    response = client.get(f"{path}&cursor={cursor}", headers=headers)
+    assert response.status_code == 200, response.text
+    assert_no_full_scans(captured_sql)
+
+def test_login_uses_indexes(seeded_db, client, captured_sql):
+    response = client.post(
+        "/api/v1/auth/login",
+        data={"username": "plans-user0@example.com", "password": "password"}
+    )
+    assert response.status_code == 200, response.text
+    assert_no_full_scans(captured_sql)
+
+def test_upload_batch_progress_uses_indexes(seeded_db, client, captured_sql):
+    client.get("/api/v1/documents/upload/batch/0123456789abcdef", headers=auth_headers(seeded_db["user_id"]))
+    assert any("upload_batch_id" in statement for statement, _ in captured_sql)
+    assert_no_full_scans(captured_sql)
+
+def test_query_scope_uses_indexes(seeded_db, captured_sql):
+    from app.rag.query_engine import count_chunks, resolve_document_scope
+
+    db = SessionLocal()
+    try:
+        own_ids = seeded_db["document_ids"][:3]
+        document_ids = resolve_document_scope(
+            db, seeded_db["user_id"], document_ids=own_ids + [seeded_db["other_document_id"]],
+            created_after=datetime(2000, 1, 1)
+        )
+        assert document_ids == own_ids
+        assert count_chunks(db, document_ids) == 3 * CHUNKS_PER_DOCUMENT
+    finally:
+        db.close()
+    assert_no_full_scans(captured_sql)
+
+def test_vector_index_lookups_use_indexes(seeded_db, captured_sql):
+    from app.rag.index_versions import load_indexes
+    from app.rag.reembedding import reembedding_job
+
+    load_indexes()
+    reembedding_job.run_once()
+    assert any("vector_indexes" in statement for statement, _ in captured_sql)
+    assert_no_full_scans(captured_sql)
@@ -0,0 +1,106 @@
+"""
+Tests for the query history write-behind buffer.
+
+Each test uses its own QueryWriteBehind against the shared test database,
+so the app's query_writer singleton is never started.
+
+Run with: python -m pytest tests/db
+"""
+import threading
+
+from sqlalchemy.exc import IntegrityError
+
+from app.db.models import Query
+from app.db.session import SessionLocal
+from app.db.write_behind import QueryWriteBehind
+
+class RecordingWriteBehind(QueryWriteBehind):
+    """Records the size of every write, failing those that contain a "bad" record."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.writes = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def _write(self, records, existing_documents_only=False):
+        self.release.wait(10)
+        self.writes.append(len(records))
+        if any(record["query_text"] == "bad" for record in records):
+            raise IntegrityError("INSERT INTO queries", {}, Exception("constraint failed"))
+        super()._write(records, existing_documents_only)
+
+def saved_queries(user_id: int) -> list:
+    db = SessionLocal()
+    try:
+        return [
+            row.query_text for row in
+            db.query(Query.query_text).filter(Query.user_id == user_id).order_by(Query.id)
+        ]
+    finally:
+        db.close()
+
+def test_records_are_written_in_batches(user_id):
+    writer = RecordingWriteBehind(batch_size=4, flush_interval=0.05, max_queue=100)
+    # Hold the first write so the rest pile up in the queue
+    writer.release.clear()
+    for i in range(10):
+        writer.submit(f"question {i}", "answer", user_id, [])
+    writer.release.set()
+    writer.stop()
+
+    assert saved_queries(user_id) == [f"question {i}" for i in range(10)]
+    assert max(writer.writes) <= 4
+    assert len(writer.writes) < 10
+
+def test_stop_drains_the_queue(user_id):
+    writer = RecordingWriteBehind(batch_size=2, flush_interval=5, max_queue=100)
+    writer.release.clear()
+    for i in range(7):
+        writer.submit(f"question {i}", "answer", user_id, [])
+    writer.release.set()
+    writer.stop()
+
+    assert saved_queries(user_id) == [f"question {i}" for i in range(7)]
+
+def test_integrity_error_drops_only_the_bad_record(user_id):
+    writer = RecordingWriteBehind(batch_size=10, flush_interval=0.05, max_queue=100)
+    writer.release.clear()
+    for text in ["first", "bad", "last"]:
+        writer.submit(text, "answer", user_id, [])
+    writer.release.set()
+    writer.stop()
+
+    assert saved_queries(user_id) == ["first", "last"]
+    # The batch isn't retried whole; its records are written one by one instead
+    batch, *one_by_one = writer.writes
+    assert batch == 3
+    assert one_by_one == [1, 1, 1]
+
+def test_flush_user_waits_for_the_users_queued_records(user_id):
+    writer = RecordingWriteBehind(batch_size=10, flush_interval=5, max_queue=100)
+    try:
+        writer.release.clear()
+        writer.submit("question", "answer", user_id, [])
+        assert not writer.flush_user(user_id, timeout=0.1)
+        assert saved_queries(user_id) == []
+
+        writer.release.set()
+        assert writer.flush_user(user_id)
+        assert saved_queries(user_id) == ["question"]
+    finally:
+        writer.release.set()
+        writer.stop()
+
+def test_flush_user_returns_at_once_without_queued_records(user_id):
+    writer = QueryWriteBehind(batch_size=10, flush_interval=5, max_queue=100)
+    assert writer.flush_user(user_id, timeout=0)
+
+def test_dropped_records_do_not_block_flush_user(user_id):
+    writer = RecordingWriteBehind(batch_size=10, flush_interval=5, max_queue=100)
+    try:
+        writer.submit("bad", "answer", user_id, [])
+        assert writer.flush_user(user_id)
+        assert saved_queries(user_id) == []
+    finally:
+        writer.stop()
@@ -0,0 +1,152 @@
+"""
+Tests for per-provider LLM admission control.
+
+Waiters run in threads; a test waits for them to queue by watching the
+controller's wait queue before releasing the slot they are waiting for.
+
+Run with: python -m pytest tests/rag
+"""
+import threading
+import time
+
+import pytest
+
+from app.rag.query_engine import AdmissionController, AdmissionRejected
+
+from conftest import auth_headers
+
+def wait_for(condition, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+def queued(controller: AdmissionController, count: int) -> None:
+    wait_for(lambda: len(controller._waiters) == count)
+
+def start_waiter(controller: AdmissionController, priority: str, admitted: list) -> threading.Thread:
+    """Queue a request in a thread; it records its priority once admitted, then releases."""
+    def run():
+        with controller.slot(priority):
+            admitted.append(priority)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+def test_requests_within_the_limit_are_admitted_at_once():
+    controller = AdmissionController("fake", max_concurrency=2, max_queue=0, queue_timeout=5)
+    controller.acquire()
+    controller.acquire()
+    with pytest.raises(AdmissionRejected):
+        controller.acquire()
+    controller.release(0.1)
+    controller.acquire()
+
+def test_waiter_is_admitted_when_a_slot_is_released():
+    controller = AdmissionController("fake", max_concurrency=1, max_queue=4, queue_timeout=5)
+    controller.acquire()
+    admitted = []
+    waiter = start_waiter(controller, "interactive", admitted)
+    queued(controller, 1)
+    assert admitted == []
+
+    controller.release(0.1)
+    waiter.join(5)
+    assert admitted == ["interactive"]
+    assert controller._active == 0
+
+def test_interactive_requests_are_served_before_batch_ones():
+    controller = AdmissionController("fake", max_concurrency=1, max_queue=4, queue_timeout=5)
+    controller.acquire()
+    admitted = []
+    waiters = [start_waiter(controller, "batch", admitted)]
+    queued(controller, 1)
+    waiters.append(start_waiter(controller, "interactive", admitted))
+    queued(controller, 2)
+
+    controller.release(0.1)
+    for waiter in waiters:
+        waiter.join(5)
+    assert admitted == ["interactive", "batch"]
+
+def test_batch_requests_may_only_fill_half_the_queue():
+    controller = AdmissionController("fake", max_concurrency=1, max_queue=4, queue_timeout=5)
+    controller.acquire()
+    admitted = []
+    waiters = [start_waiter(controller, "batch", admitted) for _ in range(2)]
+    queued(controller, 2)
+
+    with pytest.raises(AdmissionRejected):
+        controller.acquire("batch")
+    # Interactive requests may still use the rest of the queue
+    waiters.append(start_waiter(controller, "interactive", admitted))
+    queued(controller, 3)
+
+    controller.release(0.1)
+    for waiter in waiters:
+        waiter.join(5)
+    assert admitted == ["interactive", "batch", "batch"]
+
+def test_full_queue_rejects_with_a_retry_estimate():
+    controller = AdmissionController("fake", max_concurrency=1, max_queue=1, queue_timeout=5)
+    controller.acquire()
+    admitted = []
+    waiter = start_waiter(controller, "interactive", admitted)
+    queued(controller, 1)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire()
+    assert rejected.value.provider == "fake"
+    assert rejected.value.retry_after >= 1
+
+    controller.release(0.1)
+    waiter.join(5)
+
+def test_retry_estimate_grows_with_the_backlog():
+    controller = AdmissionController("fake", max_concurrency=1, max_queue=4, queue_timeout=5)
+    controller.acquire()
+    controller.release(10)
+    empty = controller.retry_after()
+    controller.acquire()
+    waiters = [start_waiter(controller, "interactive", []) for _ in range(3)]
+    queued(controller, 3)
+    assert controller.retry_after() > empty
+
+    controller.release(0.1)
+    for waiter in waiters:
+        waiter.join(5)
+
+def test_waiter_times_out_and_leaves_the_queue():
+    controller = AdmissionController("fake", max_concurrency=1, max_queue=4, queue_timeout=0.1)
+    controller.acquire()
+    start = time.monotonic()
+    with pytest.raises(AdmissionRejected):
+        controller.acquire()
+    assert time.monotonic() - start >= 0.1
+    assert controller._waiters == []
+
+    controller.release(0.1)
+    controller.acquire()
+
+def test_slot_is_released_when_the_block_raises():
+    controller = AdmissionController("fake", max_concurrency=1, max_queue=0, queue_timeout=5)
+    with pytest.raises(ValueError):
+        with controller.slot():
+            raise ValueError
+    with controller.slot() as waited:
+        assert waited >= 0
+
+def test_rejected_query_gets_429_with_retry_after(client, user_id, monkeypatch):
+    from app.api import queries
+
+    def overloaded(*args, **kwargs):
+        raise AdmissionRejected("fake", 7)
+
+    monkeypatch.setattr(queries, "process_query", overloaded)
+    response = client.post(
+        "/api/v1/queries/", json={"query_text": "What is QGenAI?"}, headers=auth_headers(user_id)
+    )
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+    assert "overloaded" in response.json()["detail"]
@@ -0,0 +1,134 @@
+"""
+Tests for the bulk ingestion CLI and its checkpoint.
+
+The CLI runs in-process with --offline against the test database and
+vector store; each test ingests its own folder under its own user.
+
+Run with: python -m pytest tests/rag
+"""
+import json
+import sys
+import zipfile
+
+import pytest
+
+import ingest
+from app.db.models import Document, DocumentChunk
+from app.db.session import SessionLocal
+from ingest import Checkpoint
+
+TEXT = "\n\n".join(f"Paragraph {i} about bulk ingestion and checkpoints." for i in range(40))
+
+def run(monkeypatch, *args) -> None:
+    monkeypatch.setattr(sys, "argv", ["ingest.py", *args])
+    ingest.main()
+
+def owned_documents(user_id: int) -> dict:
+    """The chunk count of each of a user's documents, by filename."""
+    db = SessionLocal()
+    try:
+        return {
+            document.filename: db.query(DocumentChunk).filter(DocumentChunk.document_id == document.id).count()
+            for document in db.query(Document).filter(Document.owner_id == user_id)
+        }
+    finally:
+        db.close()
+
+@pytest.fixture
+def source(tmp_path):
+    """A folder of text files, with files the CLI ignores; returns its path."""
+    folder = tmp_path / "source"
+    (folder / "nested").mkdir(parents=True)
+    for name in ["a.txt", "b.txt", "nested/c.txt"]:
+        (folder / name).write_text(TEXT)
+    (folder / "notes.md").write_text("not ingested")
+    (folder / ".hidden.txt").write_text("not ingested")
+    return folder
+
+@pytest.fixture
+def checkpoint_path(tmp_path) -> str:
+    return str(tmp_path / "ingest.checkpoint.jsonl")
+
+def statuses(checkpoint_path: str) -> dict:
+    checkpoint = Checkpoint(checkpoint_path)
+    checkpoint.close()
+    return {source: entry["status"] for source, entry in checkpoint.entries.items()}
+
+def test_embedded_index_requires_offline(source, user_id, monkeypatch):
+    monkeypatch.setattr(ingest.settings, "CHROMA_MODE", "embedded")
+    with pytest.raises(RuntimeError, match="--offline"):
+        run(monkeypatch, str(source), "--owner", str(user_id))
+    assert owned_documents(user_id) == {}
+
+def test_quantized_index_requires_offline(source, user_id, monkeypatch):
+    monkeypatch.setattr(ingest.settings, "CHROMA_MODE", "server")
+    monkeypatch.setattr(ingest.settings, "VECTOR_INDEX_MODE", "int8")
+    with pytest.raises(RuntimeError, match="--offline"):
+        run(monkeypatch, str(source), "--owner", str(user_id))
+
+def test_folder_is_ingested_and_checkpointed(source, user_id, checkpoint_path, monkeypatch):
+    run(monkeypatch, str(source), "--owner", str(user_id), "--checkpoint", checkpoint_path, "--offline")
+    documents = owned_documents(user_id)
+    assert sorted(documents) == ["a.txt", "b.txt", "c.txt"]
+    assert all(chunks > 0 for chunks in documents.values())
+    assert statuses(checkpoint_path) == {"a.txt": "completed", "b.txt": "completed", "nested/c.txt": "completed"}
+
+def test_zip_is_ingested(source, tmp_path, user_id, checkpoint_path, monkeypatch):
+    archive = tmp_path / "source.zip"
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.write(source / "a.txt", "docs/a.txt")
+        zip_file.write(source / "notes.md", "docs/notes.md")
+        zip_file.writestr("__MACOSX/docs/._a.txt", "resource fork")
+    run(monkeypatch, str(archive), "--owner", str(user_id), "--checkpoint", checkpoint_path, "--offline")
+    assert list(owned_documents(user_id)) == ["a.txt"]
+    assert statuses(checkpoint_path) == {"docs/a.txt": "completed"}
+
+def test_rerun_skips_completed_files(source, user_id, checkpoint_path, monkeypatch):
+    args = [str(source), "--owner", str(user_id), "--checkpoint", checkpoint_path, "--offline"]
+    run(monkeypatch, *args)
+    before = owned_documents(user_id)
+
+    processed = []
+    monkeypatch.setattr(ingest, "process_document", lambda document, db: processed.append(document.filename))
+    run(monkeypatch, *args)
+    assert processed == []
+    assert owned_documents(user_id) == before
+
+def test_file_in_flight_during_a_crash_is_redone(source, user_id, checkpoint_path, monkeypatch):
+    args = [str(source), "--owner", str(user_id), "--checkpoint", checkpoint_path, "--offline"]
+    run(monkeypatch, *args)
+    before = owned_documents(user_id)
+    # As if the run had crashed while b.txt was processed, cutting its last line short
+    checkpoint = Checkpoint(checkpoint_path)
+    checkpoint.record("b.txt", checkpoint.entries["b.txt"]["document_id"], "started")
+    checkpoint.close()
+    with open(checkpoint_path, "a") as file:
+        file.write('{"source": "a.txt", "docum')
+
+    run(monkeypatch, *args)
+    # Its document is reused and its chunks replaced, not duplicated
+    assert owned_documents(user_id) == before
+    assert statuses(checkpoint_path)["b.txt"] == "completed"
+
+def test_failed_files_are_only_retried_when_asked(source, user_id, checkpoint_path, monkeypatch):
+    args = [str(source), "--owner", str(user_id), "--checkpoint", checkpoint_path, "--offline"]
+    process_document = ingest.process_document
+    monkeypatch.setattr(
+        ingest, "process_document",
+        lambda document, db: document.filename != "c.txt" and process_document(document, db)
+    )
+    run(monkeypatch, *args)
+    assert statuses(checkpoint_path)["nested/c.txt"] == "error"
+
+    monkeypatch.setattr(ingest, "process_document", process_document)
+    run(monkeypatch, *args)
+    assert statuses(checkpoint_path)["nested/c.txt"] == "error"
+
+    run(monkeypatch, *args, "--retry-failed")
+    assert statuses(checkpoint_path)["nested/c.txt"] == "completed"
+    assert len(owned_documents(user_id)) == 3
+    assert owned_documents(user_id)["c.txt"] > 0
+
+def test_unknown_owner_is_refused(source, checkpoint_path, monkeypatch):
+    with pytest.raises(SystemExit):
+        run(monkeypatch, str(source), "--owner", "nobody@example.com", "--checkpoint", checkpoint_path, "--offline")
@@ -0,0 +1,131 @@
+"""
+Tests for document and page centroids and coarse-to-fine retrieval.
+
+Documents are ingested into the test vector store with the fake embeddings,
+which embed texts that share words close together.
+
+Run with: python -m pytest tests/rag
+"""
+import itertools
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.db.models import Document
+from app.db.session import SessionLocal
+from app.rag.deletion import DocumentPurger
+from app.rag.embeddings import get_embeddings
+from app.rag.vector_store import (
+    backfill_centroids,
+    get_centroid_collection,
+    query_vector_store,
+    select_documents,
+    update_centroids,
+)
+
+from conftest import ingest_text
+
+# Document IDs no ingested document will reach, for centroids built by hand
+_fake_document_ids = itertools.count(10 ** 9)
+
+TOPICS = {
+    "volcano": "Volcano eruptions spew lava, magma and ash over the crater.",
+    "orchestra": "The orchestra tuned violins, cellos and flutes before the symphony.",
+    "compiler": "The compiler parses tokens, builds syntax trees and emits bytecode.",
+}
+
+def topic_document(topic: str, pages: int = 3) -> str:
+    return "\n\n".join(f"[Page {page}]\n{TOPICS[topic]} Page {page} of the {topic} notes." for page in range(1, pages + 1))
+
+def centroids(document_id: int) -> dict:
+    stored = get_centroid_collection().get(
+        where={"document_id": document_id}, include=["embeddings", "metadatas"]
+    )
+    return {
+        centroid_id: (np.asarray(embedding), metadata)
+        for centroid_id, embedding, metadata in zip(stored["ids"], stored["embeddings"], stored["metadatas"])
+    }
+
+def embed(text: str):
+    return get_embeddings().embed_query(text)
+
+@pytest.fixture
+def topic_documents(user_id) -> dict:
+    return {topic: ingest_text(user_id, topic_document(topic), f"{topic}.txt") for topic in TOPICS}
+
+def test_ingestion_stores_document_and_page_centroids(topic_documents):
+    document_id = topic_documents["volcano"]
+    stored = centroids(document_id)
+    assert set(stored) == {f"{document_id}-doc", *(f"{document_id}-page-{page}" for page in (1, 2, 3))}
+    assert stored[f"{document_id}-doc"][1]["level"] == "document"
+    assert stored[f"{document_id}-page-2"][1]["page_number"] == 2
+    assert stored[f"{document_id}-doc"][1]["chunk_count"] == sum(
+        metadata["chunk_count"] for _, metadata in stored.values() if metadata["level"] == "page"
+    )
+
+def test_centroids_built_in_batches_match_one_built_at_once():
+    vectors = [np.random.default_rng(seed).random(settings.FAKE_EMBEDDING_DIM).tolist() for seed in range(6)]
+    batched, at_once = next(_fake_document_ids), next(_fake_document_ids)
+
+    def metadatas(document_id):
+        return [{"document_id": document_id, "document_name": "d", "page_number": i % 2} for i in range(6)]
+
+    update_centroids(vectors[:2], metadatas(batched)[:2])
+    update_centroids(vectors[2:], metadatas(batched)[2:])
+    update_centroids(vectors, metadatas(at_once))
+
+    for suffix in ("doc", "page-0", "page-1"):
+        embedding, metadata = centroids(batched)[f"{batched}-{suffix}"]
+        expected, expected_metadata = centroids(at_once)[f"{at_once}-{suffix}"]
+        assert np.allclose(embedding, expected)
+        assert metadata["chunk_count"] == expected_metadata["chunk_count"]
+    assert np.allclose(centroids(batched)[f"{batched}-doc"][0], np.mean(vectors, axis=0))
+
+def test_documents_are_selected_by_centroid(topic_documents):
+    scope = {"document_id": {"$in": list(topic_documents.values())}}
+    selected = select_documents(embed("lava and magma from the crater"), 1, scope)
+    assert selected == [topic_documents["volcano"]]
+    assert len(select_documents(embed("lava"), 2, scope)) == 2
+
+def test_coarse_search_only_searches_the_selected_documents(topic_documents):
+    scope = {"document_id": {"$in": list(topic_documents.values())}}
+    hits = query_vector_store("violins and cellos in the symphony", n_results=5, document_filter=scope, coarse_documents=1)
+    assert hits
+    assert {hit["metadata"]["document_id"] for hit in hits} == {topic_documents["orchestra"]}
+
+    flat = query_vector_store("violins and cellos in the symphony", n_results=5, document_filter=scope, coarse_documents=0)
+    assert len({hit["metadata"]["document_id"] for hit in flat}) > 1
+
+def test_search_falls_back_to_every_chunk_without_centroids(topic_documents):
+    document_id = topic_documents["compiler"]
+    get_centroid_collection().delete(where={"document_id": document_id})
+    hits = query_vector_store(
+        "syntax trees", n_results=3, document_filter={"document_id": document_id}, coarse_documents=2
+    )
+    assert {hit["metadata"]["document_id"] for hit in hits} == {document_id}
+
+def test_backfill_rebuilds_missing_centroids(topic_documents):
+    document_id = topic_documents["compiler"]
+    before = centroids(document_id)
+    get_centroid_collection().delete(where={"document_id": document_id})
+
+    assert backfill_centroids() >= 1
+    after = centroids(document_id)
+    assert set(after) == set(before)
+    for centroid_id, (embedding, metadata) in before.items():
+        assert np.allclose(after[centroid_id][0], embedding)
+        assert after[centroid_id][1]["chunk_count"] == metadata["chunk_count"]
+
+def test_purged_documents_lose_their_centroids(topic_documents):
+    document_id = topic_documents["volcano"]
+    db = SessionLocal()
+    try:
+        db.query(Document).filter(Document.id == document_id).update({"deleted_at": datetime.now(timezone.utc)})
+        db.commit()
+    finally:
+        db.close()
+
+    DocumentPurger(batch_size=10, compaction_interval=60).purge_document(document_id)
+    assert centroids(document_id) == {}
@@ -0,0 +1,92 @@
+"""
+Tests for the compressed chunk store and lazy chunk text fetching.
+
+Run with: python -m pytest tests/rag
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import event, text
+
+from app.db.models import DocumentChunk
+from app.db.session import SessionLocal, engine
+from app.db.types import compress_text, decompress_text
+from app.rag.chunk_store import attach_chunk_texts
+from app.rag.vector_store import get_collection
+
+from conftest import ingest_text
+
+TEXT = "Chunk text is stored once, compressed, in the relational store. " * 20
+
+@pytest.mark.parametrize("value", ["", "plain ascii", "ünïcödé – 漢字 🙂", TEXT])
+def test_compression_round_trips(value):
+    assert decompress_text(compress_text(value)) == value
+
+def test_compression_is_thread_safe():
+    values = [f"{TEXT} {i}" for i in range(200)]
+    with ThreadPoolExecutor(8) as pool:
+        assert list(pool.map(lambda value: decompress_text(compress_text(value)), values)) == values
+
+@pytest.fixture
+def document_id(user_id) -> int:
+    return ingest_text(user_id, f"{TEXT}\n\nA second paragraph.")
+
+def test_chunk_text_is_stored_compressed(document_id):
+    db = SessionLocal()
+    try:
+        chunk = db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).first()
+        raw = db.execute(
+            text("SELECT content_zstd FROM document_chunks WHERE id = :id"), {"id": chunk.id}
+        ).scalar()
+    finally:
+        db.close()
+    assert isinstance(raw, bytes)
+    assert len(raw) < len(chunk.content.encode())
+    assert decompress_text(raw) == chunk.content
+
+def test_missing_content_round_trips_as_none(document_id):
+    db = SessionLocal()
+    try:
+        chunk = DocumentChunk(chunk_id="no-content", content=None, document_id=document_id)
+        db.add(chunk)
+        db.commit()
+        db.expire_all()
+        assert db.get(DocumentChunk, chunk.id).content is None
+    finally:
+        db.close()
+
+def test_vector_store_keeps_no_chunk_text(document_id):
+    stored = get_collection().get(where={"document_id": document_id}, include=["documents", "metadatas"])
+    assert stored["ids"]
+    assert not any(stored["documents"])
+
+def test_attach_chunk_texts_fetches_missing_texts_in_one_query(document_id):
+    chunk_ids = get_collection().get(where={"document_id": document_id})["ids"]
+    hits = [
+        {"id": chunk_ids[0], "metadata": {}},
+        {"id": "vanished-chunk", "metadata": {}},
+        {"id": "already-there", "metadata": {}, "text": "kept as is"},
+    ] + [{"id": chunk_id, "metadata": {}} for chunk_id in chunk_ids[1:]]
+    selects = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    db = SessionLocal()
+    try:
+        hydrated = attach_chunk_texts(db, hits)
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert len(selects) == 1
+    # Hits whose chunk is gone are dropped; the rest keep their order
+    assert [hit["id"] for hit in hydrated] == [chunk_ids[0], "already-there", *chunk_ids[1:]]
+    assert hydrated[1]["text"] == "kept as is"
+    assert hydrated[0]["text"].startswith("Chunk text is stored once")
+
+def test_attach_chunk_texts_skips_the_query_when_nothing_is_missing():
+    hits = [{"id": "a", "metadata": {}, "text": "already here"}]
+    assert attach_chunk_texts(None, hits) == hits
@@ -0,0 +1,133 @@
+"""
+Tests for the token-aware chunker.
+
+Token counts use character counts, so every separator the chunker inserts
+costs as much as it would in the worst case.
+
+Run with: python -m pytest tests/rag
+"""
+import random
+import re
+
+import pytest
+
+from app.core.config import settings
+from app.rag import chunker as chunker_module
+from app.rag.chunker import TextChunker, approximate_token_count, get_token_counter, iter_paragraphs
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda".split()
+
+def make_text(paragraphs: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return "\n\n".join(
+        " ".join(
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12))).capitalize() + "."
+            for _ in range(rng.randint(1, 6))
+        )
+        for _ in range(paragraphs)
+    )
+
+def sentences(text: str) -> list:
+    return [sentence for sentence in re.split(r"(?<=[.!?])\s+", text) if sentence]
+
+@pytest.mark.parametrize("chunk_tokens", [50, 80, 200])
+@pytest.mark.parametrize("count_tokens", [len, approximate_token_count], ids=["chars", "approximate"])
+def test_chunks_never_exceed_the_limit(chunk_tokens, count_tokens):
+    chunker = TextChunker(chunk_tokens, chunk_tokens // 4, count_tokens)
+    chunks = chunker.split(make_text(200))
+    assert len(chunks) > 10
+    assert max(count_tokens(chunk) for chunk in chunks) <= chunk_tokens
+
+def test_whole_paragraphs_are_kept_together():
+    paragraphs = ["One short paragraph.", "Another short one.", "And a third."]
+    chunker = TextChunker(200, 0, len)
+    assert chunker.split("\n\n".join(paragraphs)) == ["\n\n".join(paragraphs)]
+
+def test_chunks_end_at_sentence_boundaries():
+    text = make_text(50, seed=1)
+    all_sentences = set(sentences(text))
+    chunker = TextChunker(120, 30, len)
+    for chunk in chunker.split(text):
+        for sentence in sentences(chunk):
+            assert sentence in all_sentences
+
+def test_every_sentence_is_in_some_chunk_in_order():
+    text = make_text(50, seed=2)
+    chunker = TextChunker(120, 0, len)
+    chunked = [sentence for chunk in chunker.split(text) for sentence in sentences(chunk)]
+    assert chunked == sentences(text)
+
+def shared_sentences(previous: str, chunk: str) -> list:
+    """The longest run of sentences that ends the previous chunk and starts the next one."""
+    previous_sentences, chunk_sentences = sentences(previous), sentences(chunk)
+    for n in range(min(len(previous_sentences), len(chunk_sentences)), 0, -1):
+        if chunk_sentences[:n] == previous_sentences[-n:]:
+            return chunk_sentences[:n]
+    return []
+
+def test_consecutive_chunks_share_trailing_sentences():
+    text = make_text(50, seed=3)
+    overlap_tokens = 60
+    chunker = TextChunker(200, overlap_tokens, len)
+    chunks = chunker.split(text)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        overlap = shared_sentences(previous, chunk)
+        # The overlap, with the spaces joining it, fits in overlap_tokens
+        assert len(" ".join(overlap)) <= overlap_tokens
+        if len(sentences(previous)[-1]) <= overlap_tokens:
+            assert overlap, (previous, chunk)
+
+def test_overlap_is_capped_at_half_a_chunk():
+    assert TextChunker(100, 80, len).overlap_tokens == 50
+
+def test_sentences_longer_than_a_chunk_are_split_at_words():
+    sentence = " ".join(f"word{i}" for i in range(300))
+    chunker = TextChunker(50, 10, len)
+    chunks = chunker.split(sentence)
+    assert len(chunks) > 1
+    assert max(len(chunk) for chunk in chunks) <= 50
+    # No word is cut, and with overlap, words only repeat across chunk boundaries
+    words = [word for chunk in chunks for word in chunk.split()]
+    assert set(words) == set(sentence.split())
+    assert all(re.fullmatch(r"word\d+", word) for word in words)
+
+def test_iter_chunks_streams_paragraphs():
+    text = make_text(30, seed=4)
+    chunker = TextChunker(100, 20, len)
+    blocks = [text[i:i + 37] for i in range(0, len(text), 37)]
+    assert list(chunker.iter_chunks(iter_paragraphs(blocks, 1000))) == chunker.split(text)
+
+def test_iter_paragraphs_bounds_text_without_paragraph_breaks():
+    text = "line of a log file\n" * 1000
+    blocks = [text[i:i + 100] for i in range(0, len(text), 100)]
+    paragraphs = list(iter_paragraphs(blocks, 500))
+    assert "".join(paragraphs) == text
+    assert max(len(paragraph) for paragraph in paragraphs) <= 600
+
+def test_tokenizer_that_is_not_downloaded_counts_approximately(tmp_path, monkeypatch):
+    import tiktoken
+
+    def no_network(name):
+        raise AssertionError("the chunker must not fetch tokenizers")
+
+    monkeypatch.setattr(settings, "TIKTOKEN_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(tiktoken, "get_encoding", no_network)
+    assert get_token_counter.__wrapped__("cl100k_base") is approximate_token_count
+
+def test_approximate_tokenizer_is_used_as_configured():
+    assert get_token_counter.__wrapped__("approximate") is approximate_token_count
+
+def test_downloaded_tokenizer_is_loaded_from_the_cache(tmp_path, monkeypatch):
+    import tiktoken
+
+    class Encoding:
+        def encode_ordinary(self, text):
+            return text.split()
+
+    monkeypatch.setattr(settings, "TIKTOKEN_CACHE_DIR", str(tmp_path))
+    # Restored afterwards, since loading points tiktoken at TIKTOKEN_CACHE_DIR
+    monkeypatch.setenv("TIKTOKEN_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: Encoding())
+    chunker_module.download_encoding("fake_base")
+    count_tokens = get_token_counter.__wrapped__("fake_base")
+    assert count_tokens("three little words") == 3
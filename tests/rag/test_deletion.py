@@ -0,0 +1,142 @@
+"""
+Tests for document tombstones and the background purger.
+
+Documents are ingested into the test vector store with the fake embeddings.
+
+Run with: python -m pytest tests/rag
+"""
+from datetime import datetime, timezone
+
+import pytest
+
+from app.db.models import Document, DocumentChunk, Query, QuerySource, User
+from app.db.session import SessionLocal
+from app.rag import deletion
+from app.rag.deletion import DocumentPurger, get_deleted_document_ids, invalidate_deleted_documents
+from app.rag.query_engine import retrieve_chunks
+from app.rag.vector_store import get_collection
+
+from conftest import auth_headers, ingest_text
+
+TEXT = "\n\n".join(f"Paragraph {i} about tombstones and purging documents." for i in range(12))
+
+def tombstone(document_id: int) -> None:
+    db = SessionLocal()
+    try:
+        db.query(Document).filter(Document.id == document_id).update(
+            {"deleted_at": datetime.now(timezone.utc)}
+        )
+        db.commit()
+    finally:
+        db.close()
+    invalidate_deleted_documents()
+
+def deleted_ids() -> set:
+    db = SessionLocal()
+    try:
+        return get_deleted_document_ids(db)
+    finally:
+        db.close()
+
+def vector_ids(document_id: int) -> list:
+    return get_collection().get(where={"document_id": document_id})["ids"]
+
+@pytest.fixture
+def documents(user_id) -> list:
+    return [ingest_text(user_id, TEXT, f"doc{i}.txt") for i in range(2)]
+
+def test_tombstoned_documents_are_not_retrieved(documents):
+    deleted, kept = documents
+    tombstone(deleted)
+    db = SessionLocal()
+    try:
+        hits = retrieve_chunks(db, "tombstones and purging", n_results=50)
+    finally:
+        db.close()
+    assert hits
+    assert deleted not in {hit["metadata"]["document_id"] for hit in hits}
+    assert kept in {hit["metadata"]["document_id"] for hit in hits}
+
+def test_tombstones_are_cached_until_invalidated(documents):
+    db = SessionLocal()
+    try:
+        before = get_deleted_document_ids(db)
+        db.query(Document).filter(Document.id == documents[0]).update(
+            {"deleted_at": datetime.now(timezone.utc)}
+        )
+        db.commit()
+        assert get_deleted_document_ids(db) == before
+        invalidate_deleted_documents()
+        assert documents[0] in get_deleted_document_ids(db)
+    finally:
+        db.close()
+
+def test_purge_removes_chunks_vectors_and_sources(documents, user_id):
+    deleted, kept = documents
+    db = SessionLocal()
+    try:
+        query = Query(
+            query_text="question", response="answer", user_id=user_id,
+            sources=[
+                QuerySource(chunk_id=f"{deleted}-chunk-0", document_id=deleted),
+                QuerySource(chunk_id=f"{kept}-chunk-0", document_id=kept),
+            ]
+        )
+        db.add(query)
+        db.commit()
+        query_id = query.id
+        queries_version = db.get(User, user_id).queries_version
+    finally:
+        db.close()
+    tombstone(deleted)
+    assert vector_ids(deleted)
+
+    DocumentPurger(batch_size=3, compaction_interval=60).purge_document(deleted)
+
+    db = SessionLocal()
+    try:
+        assert db.get(Document, deleted) is None
+        assert db.query(DocumentChunk).filter(DocumentChunk.document_id == deleted).count() == 0
+        # The query stays, citing only the document that is left
+        sources = db.query(QuerySource.document_id).filter(QuerySource.query_id == query_id).all()
+        assert [source.document_id for source in sources] == [kept]
+        assert db.get(User, user_id).queries_version > queries_version
+        assert db.query(DocumentChunk).filter(DocumentChunk.document_id == kept).count() > 0
+    finally:
+        db.close()
+    assert vector_ids(deleted) == []
+    assert vector_ids(kept)
+    assert deleted not in deleted_ids()
+
+def test_live_documents_are_never_purged(documents):
+    DocumentPurger(batch_size=3, compaction_interval=60).purge_document(documents[0])
+    db = SessionLocal()
+    try:
+        assert db.get(Document, documents[0]) is not None
+    finally:
+        db.close()
+    assert vector_ids(documents[0])
+
+def test_purging_twice_is_harmless(documents):
+    tombstone(documents[0])
+    purger = DocumentPurger(batch_size=3, compaction_interval=60)
+    purger.purge_document(documents[0])
+    purger.purge_document(documents[0])
+
+def test_start_resumes_documents_tombstoned_before_a_restart(documents):
+    tombstone(documents[0])
+    purger = DocumentPurger(batch_size=3, compaction_interval=60)
+    purger.start()
+    purger.stop()
+    assert vector_ids(documents[0]) == []
+
+def test_deleted_document_disappears_at_once(client, user_id, monkeypatch):
+    document_id = ingest_text(user_id, TEXT)
+    # Leave the purge to the test, so only the tombstone hides the document
+    monkeypatch.setattr(deletion.document_purger, "enqueue", lambda document_id: None)
+    headers = auth_headers(user_id)
+    assert client.delete(f"/api/v1/documents/{document_id}", headers=headers).status_code == 204
+
+    assert client.get(f"/api/v1/documents/{document_id}", headers=headers).status_code == 404
+    assert document_id not in [row["id"] for row in client.get("/api/v1/documents/", headers=headers).json()]
+    assert document_id in deleted_ids()
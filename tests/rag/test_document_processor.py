@@ -0,0 +1,102 @@
+"""
+Tests for streaming TXT ingestion and "[Page N]" markers.
+
+Run with: python -m pytest tests/rag
+"""
+import io
+from collections import defaultdict
+
+import pytest
+
+from app.core.config import settings
+from app.db.models import Document, DocumentChunk
+from app.db.session import SessionLocal
+from app.rag.document_processor import iter_pages, read_text_blocks, split_text, stream_txt_chunks
+
+from conftest import ingest_text
+
+def paged_text(pages: int = 12) -> str:
+    return "".join(
+        f"[Page {page}]\n" + "\n\n".join(
+            f"Sentence {i} of page {page} talks about streaming. It ends here." for i in range(8)
+        ) + "\n\n"
+        for page in range(1, pages + 1)
+    )
+
+def blocks_of(text: str, size: int) -> list:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def pages_of(pieces) -> dict:
+    pages = {}
+    for page_number, text in pieces:
+        pages[page_number] = pages.get(page_number, "") + text
+    return pages
+
+def test_multibyte_characters_survive_block_boundaries():
+    text = "ünïcödé – 漢字 🙂 " * 50
+    assert "".join(read_text_blocks(io.BytesIO(text.encode()), 1)) == text
+    assert "".join(read_text_blocks(io.BytesIO(text.encode()), 7)) == text
+
+@pytest.mark.parametrize("block_size", [1, 2, 5, 9, 64, 10_000])
+def test_page_markers_are_found_across_block_boundaries(block_size):
+    text = "Preamble.\n[Page 1]\nfirst\n[Page 2]\nsecond\n[Page 10]\ntenth\n"
+    assert pages_of(iter_pages(blocks_of(text, block_size))) == {
+        None: "Preamble.\n", 1: "\nfirst\n", 2: "\nsecond\n", 10: "\ntenth\n"
+    }
+
+def test_text_that_only_looks_like_a_marker_is_kept():
+    text = "See [Papers] and [Page x] and [Pa"
+    assert "".join(piece for _, piece in iter_pages(blocks_of(text, 3))) == text
+
+def test_streamed_chunks_match_splitting_the_whole_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TXT_READ_BLOCK_SIZE", 97)
+    text = paged_text()
+    path = tmp_path / "paged.txt"
+    path.write_text(text, encoding="utf-8")
+
+    streamed = [chunk for chunk, _ in stream_txt_chunks(str(path), defaultdict(float))]
+    assert [(chunk["text"], chunk["page_number"]) for chunk in streamed] == [
+        (chunk["text"], chunk["page_number"]) for chunk in split_text(text, "text/plain")
+    ]
+    assert {chunk["page_number"] for chunk in streamed} == set(range(1, 13))
+
+def test_no_chunk_spans_two_pages(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TXT_READ_BLOCK_SIZE", 50)
+    path = tmp_path / "paged.txt"
+    path.write_text(paged_text(), encoding="utf-8")
+    for chunk, _ in stream_txt_chunks(str(path), defaultdict(float)):
+        assert "[Page" not in chunk["text"]
+        assert all(
+            f"of page {chunk['page_number']} " in sentence
+            for sentence in chunk["text"].split("Sentence")[1:]
+        )
+
+def test_progress_grows_to_the_whole_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TXT_READ_BLOCK_SIZE", 200)
+    path = tmp_path / "paged.txt"
+    path.write_text(paged_text(), encoding="utf-8")
+    progress = [fraction for _, fraction in stream_txt_chunks(str(path), defaultdict(float))]
+    assert progress == sorted(progress)
+    assert 0 < progress[0] < 1
+    assert progress[-1] == 1.0
+
+def test_txt_is_ingested_in_batches_with_page_numbers(user_id, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "TXT_READ_BLOCK_SIZE", 128)
+    text = paged_text(4)
+    document_id = ingest_text(user_id, text)
+
+    db = SessionLocal()
+    try:
+        document = db.get(Document, document_id)
+        assert (document.processing_status, document.processing_progress) == ("completed", 100)
+        chunks = (
+            db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id)
+            .order_by(DocumentChunk.id).all()
+        )
+    finally:
+        db.close()
+    assert [chunk.chunk_id for chunk in chunks] == [f"{document_id}-chunk-{i}" for i in range(len(chunks))]
+    assert [(chunk.content, chunk.page_number) for chunk in chunks] == [
+        (chunk["text"], chunk["page_number"]) for chunk in split_text(text, "text/plain")
+    ]
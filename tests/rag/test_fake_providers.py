@@ -0,0 +1,92 @@
+"""
+Tests for the offline fake LLM and embedding providers used in load tests.
+
+Run with: python -m pytest tests/rag
+"""
+import math
+import random
+import time
+
+from langchain.schema import HumanMessage
+
+from app.rag import llms
+from app.rag.fake_embeddings import FakeEmbeddings
+from app.rag.llms import FakeLLM
+
+PROMPT = """Here are the relevant document chunks:
+
+Document: guide.pdf
+Location: Page 3
+Content: QGenAI answers questions about uploaded documents.
+
+Document: notes.txt
+Content: Answers cite their sources.
+
+Question: What does QGenAI do?"""
+
+def cosine(a, b) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+def test_same_text_always_embeds_the_same():
+    text = "The quick brown fox"
+    assert FakeEmbeddings(64).embed_query(text) == FakeEmbeddings(64).embed_query(text)
+    assert FakeEmbeddings(64).embed_documents([text]) == [FakeEmbeddings(64).embed_query(text)]
+
+def test_embeddings_are_unit_vectors_of_the_configured_size():
+    for text in ["The quick brown fox", ""]:
+        vector = FakeEmbeddings(64).embed_query(text)
+        assert len(vector) == 64
+        assert math.isclose(math.sqrt(sum(value * value for value in vector)), 1.0)
+
+def test_texts_sharing_words_embed_closer():
+    embeddings = FakeEmbeddings(256)
+    query = embeddings.embed_query("uploaded documents questions")
+    related = embeddings.embed_query("questions about uploaded documents")
+    unrelated = embeddings.embed_query("weather forecast for tomorrow")
+    assert cosine(query, related) > cosine(query, unrelated)
+
+def test_embeddings_work_as_a_chroma_embedding_function():
+    embeddings = FakeEmbeddings(32)
+    assert embeddings(["a text"]) == embeddings.embed_documents(["a text"])
+
+def test_fake_llm_cites_every_chunk_in_the_prompt():
+    answer = FakeLLM(latency_ms=0).invoke([HumanMessage(content=PROMPT)]).content
+    assert answer.splitlines() == [
+        "QGenAI answers questions about uploaded documents. [guide.pdf - Page 3]",
+        "Answers cite their sources. [notes.txt]",
+    ]
+    assert FakeLLM(latency_ms=0).invoke([HumanMessage(content=PROMPT)]).content == answer
+
+def test_fake_llm_without_chunks_finds_nothing():
+    answer = FakeLLM(latency_ms=0).invoke([HumanMessage(content="Question: anything?")]).content
+    assert answer == "I couldn't find information about this in your documents."
+
+def test_fake_llm_sleeps_for_latency_and_generation_time():
+    llm = FakeLLM(latency_ms=50, tokens_per_sec=100)
+    answer = llm.invoke([HumanMessage(content=PROMPT)]).content
+    start = time.monotonic()
+    llm.invoke([HumanMessage(content=PROMPT)])
+    assert time.monotonic() - start >= 0.05 + len(answer.split()) / 100
+
+def test_injected_errors_repeat_for_the_same_seed(monkeypatch):
+    def failures(seed: int) -> list:
+        monkeypatch.setattr(llms, "_fake_llm_rng", random.Random(seed))
+        llm = FakeLLM(latency_ms=0, error_rate=0.3)
+        pattern = []
+        for _ in range(50):
+            try:
+                llm.invoke([HumanMessage(content=PROMPT)])
+                pattern.append(False)
+            except Exception:
+                pattern.append(True)
+        return pattern
+
+    pattern = failures(42)
+    assert 0 < sum(pattern) < 50
+    assert failures(42) == pattern
+
+def test_fake_llm_never_fails_without_an_error_rate():
+    llm = FakeLLM(latency_ms=0)
+    for _ in range(20):
+        llm.invoke([HumanMessage(content=PROMPT)])
+
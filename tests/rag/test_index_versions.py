@@ -0,0 +1,115 @@
+"""
+Tests for versioned vector indexes and the re-embedding job's bookkeeping.
+
+The shared test store is already on the configured fake embedding model, so
+these tests never re-embed it; an index built for another model is only
+added to check that the job abandons it.
+
+Run with: python -m pytest tests/rag
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.db.models import VectorIndex
+from app.db.session import SessionLocal
+from app.rag.embeddings import embedding_signature
+from app.rag.index_versions import (
+    LEGACY_INDEX_NAME,
+    get_write_indexes,
+    invalidate_index_cache,
+    load_indexes,
+)
+from app.rag.reembedding import EmbeddingBudget, ReembeddingJob
+
+@pytest.fixture
+def job() -> ReembeddingJob:
+    return ReembeddingJob(batch_size=10, tokens_per_minute=0, lease_seconds=30, cache_ttl_seconds=0)
+
+def index_rows() -> list:
+    db = SessionLocal()
+    try:
+        return [(row.name, row.status) for row in db.query(VectorIndex).order_by(VectorIndex.id)]
+    finally:
+        db.close()
+
+def test_legacy_collection_is_adopted_once(migrated_db):
+    first = load_indexes()
+    assert first["active"]["name"] == LEGACY_INDEX_NAME
+    assert (first["active"]["embedding_provider"], first["active"]["embedding_model"]) == embedding_signature()
+    assert first["building"] is None
+    assert load_indexes() == first
+    assert [status for _, status in index_rows()].count("active") == 1
+
+def test_nothing_to_do_on_the_configured_model(job):
+    assert job.run_once()
+    db = SessionLocal()
+    try:
+        active = db.query(VectorIndex).filter(VectorIndex.status == "active").one()
+        # The lease is only taken when there is work to do
+        assert active.lease_owner is None
+    finally:
+        db.close()
+
+def test_lease_is_held_by_one_process_at_a_time(job):
+    other = ReembeddingJob(batch_size=10, tokens_per_minute=0, lease_seconds=30, cache_ttl_seconds=0)
+    other.owner = "other-host:1"
+    active_id = load_indexes()["active"]["id"]
+    db = SessionLocal()
+    try:
+        assert job.renew_lease(db, active_id)
+        assert job.renew_lease(db, active_id)
+        assert not other.renew_lease(db, active_id)
+
+        job.release_lease(db, active_id)
+        assert other.renew_lease(db, active_id)
+        # An expired lease may be taken over
+        db.query(VectorIndex).filter(VectorIndex.id == active_id).update(
+            {"lease_expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}
+        )
+        db.commit()
+        assert job.renew_lease(db, active_id)
+        job.release_lease(db, active_id)
+    finally:
+        db.close()
+
+def test_index_built_for_another_model_is_abandoned(job):
+    db = SessionLocal()
+    try:
+        db.add(VectorIndex(
+            name="document_chunks_vabandoned", embedding_provider="fake", embedding_model="fake-8", status="building"
+        ))
+        db.commit()
+    finally:
+        db.close()
+    invalidate_index_cache()
+    assert [index["name"] for index in get_write_indexes()] == [LEGACY_INDEX_NAME, "document_chunks_vabandoned"]
+
+    try:
+        assert job.run_once()
+    finally:
+        invalidate_index_cache()
+    assert "document_chunks_vabandoned" not in [name for name, _ in index_rows()]
+    assert [index["name"] for index in get_write_indexes()] == [LEGACY_INDEX_NAME]
+
+def test_budget_holds_calls_to_the_rate():
+    budget = EmbeddingBudget(tokens_per_minute=6000)
+    stop = threading.Event()
+    assert budget.wait(6000, stop)
+    start = time.monotonic()
+    # 50 tokens refill in half a second
+    assert budget.wait(50, stop)
+    assert time.monotonic() - start >= 0.4
+
+def test_budget_wait_ends_when_stopped():
+    budget = EmbeddingBudget(tokens_per_minute=60)
+    stop = threading.Event()
+    assert budget.wait(60, stop)
+    stop.set()
+    assert not budget.wait(60, stop)
+
+def test_zero_budget_is_unlimited():
+    budget = EmbeddingBudget(tokens_per_minute=0)
+    assert all(budget.wait(10 ** 9, threading.Event()) for _ in range(3))
@@ -0,0 +1,150 @@
+"""
+Tests for the int8 and binary quantized chunk index.
+
+Run with: python -m pytest tests/rag
+"""
+import os
+
+import numpy as np
+import pytest
+
+from app.rag.quantized_index import QuantizedIndex
+
+DIM = 32
+ROWS = 300
+
+def vectors(count: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((count, DIM)).astype(np.float32)
+
+def metadata(i: int) -> dict:
+    # Every tenth chunk has no page number, as with TXT files without page markers
+    return {"document_id": i % 7, "page_number": None if i % 10 == 0 else i % 5, "chunk_id": f"chunk-{i}"}
+
+@pytest.fixture(params=["int8", "binary"])
+def filled(request, tmp_path):
+    """A quantized index of ROWS chunks; returns (index, vectors)."""
+    index = QuantizedIndex(str(tmp_path / "index"), request.param)
+    data = vectors(ROWS)
+    index.add([f"chunk-{i}" for i in range(ROWS)], data, [metadata(i) for i in range(ROWS)])
+    return index, data
+
+def brute_force(data: np.ndarray, query: np.ndarray, rows=None, n: int = 10) -> list:
+    rows = np.arange(len(data)) if rows is None else np.asarray(rows)
+    distances = ((data[rows] - query) ** 2).sum(axis=1)
+    return [f"chunk-{row}" for row in rows[np.argsort(distances, kind="stable")[:n]]]
+
+def ids(results) -> list:
+    return [result["id"] for result in results]
+
+def test_search_rescores_candidates_at_full_precision(filled):
+    index, data = filled
+    results = index.search(data[42], 5, candidates=50)
+    assert results[0]["id"] == "chunk-42"
+    assert results[0]["distance"] == pytest.approx(0, abs=1e-4)
+    distances = [result["distance"] for result in results]
+    assert distances == sorted(distances)
+    expected = ((data[int(results[1]["id"].split("-")[1])] - data[42]) ** 2).sum()
+    assert distances[1] == pytest.approx(expected, rel=1e-5)
+
+def test_int8_search_finds_the_exact_neighbours(tmp_path):
+    index = QuantizedIndex(str(tmp_path / "index"), "int8")
+    data = vectors(ROWS)
+    index.add([f"chunk-{i}" for i in range(ROWS)], data, [metadata(i) for i in range(ROWS)])
+    for query in vectors(10, seed=1):
+        assert ids(index.search(query, 10, candidates=100)) == brute_force(data, query)
+
+def test_exact_search_matches_brute_force(filled):
+    index, data = filled
+    query = vectors(1, seed=2)[0]
+    where = {"document_id": {"$in": [1, 2]}}
+    rows = [i for i in range(ROWS) if i % 7 in (1, 2)]
+    assert ids(index.exact_search(query, 10, where)) == brute_force(data, query, rows)
+
+@pytest.mark.parametrize("where, matches", [
+    ({"document_id": 3}, lambda i: i % 7 == 3),
+    ({"document_id": {"$nin": [0, 1, 2]}}, lambda i: i % 7 > 2),
+    ({"page_number": {"$gte": 2, "$lte": 3}}, lambda i: i % 10 and 2 <= i % 5 <= 3),
+    ({"page_number": {"$ne": 1}}, lambda i: i % 10 and i % 5 != 1),
+    ({"$and": [{"document_id": 2}, {"page_number": {"$lt": 2}}]}, lambda i: i % 7 == 2 and i % 10 and i % 5 < 2),
+    ({"$or": [{"document_id": 2}, {"page_number": 4}]}, lambda i: i % 7 == 2 or (i % 10 and i % 5 == 4)),
+    ({"chunk_id": {"$in": ["chunk-1", "chunk-2"]}}, lambda i: i in (1, 2)),
+    ({"chunk_id": {"$nin": ["chunk-1", "chunk-2"]}}, lambda i: i not in (1, 2)),
+])
+def test_filters_match_chroma_semantics(filled, where, matches):
+    index, data = filled
+    expected = [f"chunk-{i}" for i in range(ROWS) if matches(i)]
+    assert sorted(index.get(where)["ids"]) == sorted(expected)
+    results = index.search(vectors(1, seed=3)[0], 10, where=where, candidates=ROWS)
+    assert set(ids(results)) <= set(expected)
+
+def test_unsupported_filters_are_rejected(filled):
+    index, _ = filled
+    with pytest.raises(ValueError):
+        index.get({"section": "intro"})
+    with pytest.raises(ValueError):
+        index.get({"document_id": {"$contains": 1}})
+
+def test_adding_a_chunk_again_replaces_it(filled):
+    index, data = filled
+    replacement = vectors(1, seed=4)
+    index.add(["chunk-5"], replacement, [metadata(5)])
+    assert index.count() == ROWS
+    assert np.allclose(index.get({"chunk_id": "chunk-5"})["embeddings"], replacement)
+    assert index.search(replacement[0], 1)[0]["id"] == "chunk-5"
+
+def test_deleted_chunks_are_never_returned(filled):
+    index, data = filled
+    index.delete(ids=["chunk-42"])
+    index.delete(where={"document_id": 3})
+    assert index.count() == ROWS - 1 - len([i for i in range(ROWS) if i % 7 == 3 and i != 42])
+    assert "chunk-42" not in ids(index.search(data[42], 10, candidates=ROWS))
+    assert index.get({"document_id": 3})["ids"] == []
+    assert 3 not in index.document_ids()
+
+def test_compaction_drops_deleted_rows_and_keeps_results(filled):
+    index, data = filled
+    index.delete(where={"document_id": {"$in": [0, 1]}})
+    query = vectors(1, seed=5)[0]
+    before = index.search(query, 10, candidates=100)
+
+    index.compact()
+    assert index.size == index.count()
+    assert index.search(query, 10, candidates=100) == before
+    files = sorted(name for name in os.listdir(index.path) if name.startswith(("codes-", "vectors-")))
+    assert files == ["codes-1.bin", "vectors-1.f32"]
+
+    # New chunks are appended after the renumbered rows
+    index.add(["new-chunk"], vectors(1, seed=6), [{"document_id": 99}])
+    assert index.get({"document_id": 99})["ids"] == ["new-chunk"]
+
+def test_reopened_index_has_the_same_rows(filled):
+    index, data = filled
+    index.delete(ids=["chunk-7"])
+    index.compact()
+    query = vectors(1, seed=7)[0]
+    reopened = QuantizedIndex(index.path, index.mode)
+    assert reopened.count() == index.count()
+    assert reopened.search(query, 10, candidates=100) == index.search(query, 10, candidates=100)
+
+def test_interrupted_append_is_dropped_on_open(filled):
+    index, data = filled
+    # Bytes of rows whose metadata was never committed
+    with open(index._codes_file(), "ab") as file:
+        file.write(b"\x01" * index.code_size * 3)
+    reopened = QuantizedIndex(index.path, index.mode)
+    assert reopened.size == ROWS
+    reopened.add(["next"], vectors(1, seed=8), [{"document_id": 1}])
+    assert reopened.search(vectors(1, seed=8)[0], 1)[0]["id"] == "next"
+
+def test_mode_and_dimension_mismatches_are_rejected(filled):
+    index, _ = filled
+    other_mode = "binary" if index.mode == "int8" else "int8"
+    with pytest.raises(ValueError):
+        QuantizedIndex(index.path, other_mode)
+    with pytest.raises(ValueError):
+        index.add(["wrong"], np.zeros((1, DIM + 1)), [{"document_id": 1}])
+
+def test_codes_take_a_fraction_of_float32(filled):
+    index, _ = filled
+    ratio = 4 if index.mode == "int8" else 32
+    assert index.code_size * ratio == pytest.approx(DIM * 4, abs=ratio)
@@ -0,0 +1,84 @@
+"""
+Tests for scoping queries to documents, creation dates and page ranges.
+
+Run with: python -m pytest tests/rag
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.db.models import Document, User
+from app.db.session import SessionLocal
+from app.rag.query_engine import resolve_document_scope, retrieve_chunks
+
+from conftest import ingest_text
+
+TEXT = "\n\n".join(
+    f"[Page {page}]\nScoped retrieval notes, page {page}. Queries may be limited to some pages."
+    for page in range(1, 6)
+)
+
+@pytest.fixture
+def scoped(user_id) -> dict:
+    """Three documents of the user, one of another user, and an open session."""
+    db = SessionLocal()
+    other = User(email=f"{uuid.uuid4().hex}@example.com", hashed_password="x", is_active=True)
+    db.add(other)
+    db.commit()
+    documents = [ingest_text(user_id, TEXT, f"doc{i}.txt") for i in range(3)]
+    other_document = ingest_text(other.id, TEXT, "other.txt")
+    yield {"db": db, "user_id": user_id, "documents": documents, "other_document": other_document}
+    db.close()
+
+def created_at(db, document_id: int) -> datetime:
+    return db.query(Document.created_at).filter(Document.id == document_id).scalar()
+
+def test_unscoped_queries_resolve_to_none(scoped):
+    assert resolve_document_scope(scoped["db"], scoped["user_id"]) is None
+
+def test_scope_keeps_only_the_users_live_documents(scoped):
+    db, documents = scoped["db"], scoped["documents"]
+    db.query(Document).filter(Document.id == documents[2]).update({"deleted_at": datetime.now(timezone.utc)})
+    db.commit()
+    resolved = resolve_document_scope(
+        db, scoped["user_id"], document_ids=documents + [scoped["other_document"]]
+    )
+    assert sorted(resolved) == documents[:2]
+
+def test_query_scope_includes_documents_created_at_the_bound(scoped):
+    db, documents = scoped["db"], scoped["documents"]
+    bound = created_at(db, documents[1])
+    resolved = resolve_document_scope(db, scoped["user_id"], document_ids=documents, created_after=bound)
+    assert documents[1] in resolved
+    assert all(created_at(db, document_id) >= bound for document_id in resolved)
+
+def test_created_after_in_another_time_zone_is_the_same_instant(scoped):
+    db, documents = scoped["db"], scoped["documents"]
+    bound = created_at(db, documents[1]).replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=-5)))
+    assert documents[1] in resolve_document_scope(db, scoped["user_id"], document_ids=documents, created_after=bound)
+
+def test_created_after_the_newest_document_matches_nothing(scoped):
+    db = scoped["db"]
+    future = datetime.now(timezone.utc) + timedelta(days=1)
+    assert resolve_document_scope(db, scoped["user_id"], created_after=future) == []
+
+def test_empty_scope_retrieves_nothing(scoped):
+    assert retrieve_chunks(scoped["db"], "scoped retrieval", document_ids=[]) == []
+
+@pytest.mark.parametrize("exact_max_chunks", [0, 10_000], ids=["index", "exact"])
+def test_retrieval_stays_within_the_documents_and_pages(scoped, monkeypatch, exact_max_chunks):
+    monkeypatch.setattr(settings, "EXACT_SEARCH_MAX_CHUNKS", exact_max_chunks)
+    document_ids = scoped["documents"][:1]
+    hits = retrieve_chunks(scoped["db"], "scoped retrieval pages", n_results=20, document_ids=document_ids, pages=(2, 3))
+    assert hits
+    assert {hit["metadata"]["document_id"] for hit in hits} == set(document_ids)
+    assert {hit["metadata"]["page_number"] for hit in hits} == {2, 3}
+
+def test_open_ended_page_ranges(scoped):
+    document_ids = scoped["documents"][:1]
+    hits = retrieve_chunks(scoped["db"], "scoped retrieval", n_results=20, document_ids=document_ids, pages=(4, None))
+    assert {hit["metadata"]["page_number"] for hit in hits} == {4, 5}
+    hits = retrieve_chunks(scoped["db"], "scoped retrieval", n_results=20, document_ids=document_ids, pages=(None, 1))
+    assert {hit["metadata"]["page_number"] for hit in hits} == {1}
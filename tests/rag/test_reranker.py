@@ -0,0 +1,125 @@
+"""
+Tests for the budgeted reranker and its fallback to vector-search order.
+
+The reranker is replaced by one that records its calls and can be made slow
+or failing.
+
+Run with: python -m pytest tests/rag
+"""
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.core.metrics import RERANK_FALLBACKS
+from app.rag import reranker
+from app.rag.reranker import FakeReranker, rerank_chunks
+
+class RecordingReranker(FakeReranker):
+    """Word-overlap scores, sleeping per batch; records the size of every batch scored."""
+
+    def __init__(self, delay: float = 0, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.batches = []
+
+    def score(self, query_text, texts):
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        self.batches.append(len(texts))
+        return super().score(query_text, texts)
+
+def chunks(*texts) -> list:
+    return [{"id": f"chunk-{i}", "text": text, "metadata": {}} for i, text in enumerate(texts)]
+
+def fallbacks(reason: str) -> float:
+    return RERANK_FALLBACKS.labels(reason=reason)._value.get()
+
+@pytest.fixture
+def use_reranker(monkeypatch):
+    """Enable reranking with a given reranker and an empty score cache."""
+    monkeypatch.setattr(settings, "RERANK_PROVIDER", "fake")
+    monkeypatch.setattr(settings, "RERANK_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "RERANK_BUDGET_MS", 2000)
+    reranker._score_cache.clear()
+
+    def use(instance):
+        monkeypatch.setattr(reranker, "_reranker", instance)
+        monkeypatch.setattr(reranker, "_reranker_loaded", True)
+        return instance
+
+    yield use
+    reranker._score_cache.clear()
+
+CANDIDATES = chunks(
+    "nothing relevant here",
+    "the reranker scores passages",
+    "passages about the budget of the reranker",
+    "unrelated text",
+)
+
+def test_chunks_are_reordered_by_score(use_reranker):
+    use_reranker(RecordingReranker())
+    reranked = rerank_chunks("reranker budget passages", CANDIDATES, top_n=3)
+    assert [chunk["id"] for chunk in reranked] == ["chunk-2", "chunk-1", "chunk-0"]
+    assert reranked[0]["rerank_score"] == 1.0
+    # Ties keep their vector-search order
+    assert reranked[2]["rerank_score"] == 0.0
+
+def test_disabled_reranking_keeps_vector_order(monkeypatch):
+    monkeypatch.setattr(settings, "RERANK_PROVIDER", "none")
+    assert rerank_chunks("reranker budget", CANDIDATES, top_n=2) == CANDIDATES[:2]
+
+def test_cached_scores_are_reused(use_reranker):
+    scorer = use_reranker(RecordingReranker())
+    first = rerank_chunks("reranker budget passages", CANDIDATES, top_n=3)
+    batches = list(scorer.batches)
+    assert rerank_chunks("reranker budget passages", CANDIDATES, top_n=3) == first
+    assert scorer.batches == batches
+
+def test_budget_overrun_keeps_vector_order_and_cancels_the_job(use_reranker, monkeypatch):
+    monkeypatch.setattr(settings, "RERANK_BUDGET_MS", 50)
+    scorer = use_reranker(RecordingReranker(delay=0.2))
+    candidates = chunks(*(f"passage {i} about the reranker" for i in range(10)))
+    before = fallbacks("budget")
+
+    start = time.monotonic()
+    assert rerank_chunks("reranker", candidates, top_n=5) == candidates[:5]
+    assert time.monotonic() - start < 0.2
+    assert fallbacks("budget") == before + 1
+
+    # The job stops after the batch it was scoring, keeping that batch's scores
+    time.sleep(0.6)
+    assert scorer.batches == [2]
+    assert reranker._score_cache.get(("reranker", "chunk-0")) is not None
+    assert reranker._score_cache.get(("reranker", "chunk-2")) is None
+
+def test_saturated_pool_skips_reranking(use_reranker, monkeypatch):
+    monkeypatch.setattr(settings, "RERANK_MAX_PENDING", 0)
+    scorer = use_reranker(RecordingReranker())
+    before = fallbacks("saturated")
+    assert rerank_chunks("reranker budget", CANDIDATES, top_n=2) == CANDIDATES[:2]
+    assert fallbacks("saturated") == before + 1
+    assert scorer.batches == []
+
+def test_reranker_errors_keep_vector_order(use_reranker):
+    use_reranker(RecordingReranker(error=RuntimeError("model crashed")))
+    before = fallbacks("error")
+    assert rerank_chunks("reranker budget", CANDIDATES, top_n=2) == CANDIDATES[:2]
+    assert fallbacks("error") == before + 1
+
+def test_unavailable_reranker_keeps_vector_order(use_reranker):
+    use_reranker(None)
+    before = fallbacks("unscored")
+    assert rerank_chunks("reranker budget", CANDIDATES, top_n=2) == CANDIDATES[:2]
+    assert fallbacks("unscored") == before + 1
+
+def test_pending_jobs_are_counted_down(use_reranker):
+    use_reranker(RecordingReranker())
+    for i in range(10):
+        rerank_chunks(f"query {i}", CANDIDATES, top_n=2)
+    deadline = time.monotonic() + 5
+    while reranker._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert reranker._pending == 0
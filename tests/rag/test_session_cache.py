@@ -0,0 +1,165 @@
+"""
+Tests for conversational sessions and their cache.
+
+The Ollama context reuse test replaces retrieval and generation with stubs,
+so it runs without a vector store or a model.
+
+Run with: python -m pytest tests/rag
+"""
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.rag import query_engine
+from app.rag.session_cache import ConversationSession, SessionCache
+
+def chunk(chunk_id: str, document_id: int = 1) -> dict:
+    return {
+        "id": chunk_id,
+        "text": f"text of {chunk_id}",
+        "metadata": {"document_name": "doc.pdf", "document_id": document_id}
+    }
+
+def test_least_recently_used_session_is_evicted():
+    cache = SessionCache(max_sessions=2, ttl_seconds=60)
+    first = cache.get_or_create(1, "a")
+    second = cache.get_or_create(1, "b")
+    assert cache.get_or_create(1, "a") is first
+    cache.get_or_create(1, "c")
+
+    assert cache.get_or_create(1, "a") is first
+    assert cache.get_or_create(1, "b") is not second
+
+def test_idle_session_expires():
+    cache = SessionCache(max_sessions=10, ttl_seconds=0.05)
+    session = cache.get_or_create(1, "a")
+    assert cache.get_or_create(1, "a") is session
+    time.sleep(0.1)
+    assert cache.get_or_create(1, "a") is not session
+
+def test_sessions_are_kept_per_user():
+    cache = SessionCache(max_sessions=10, ttl_seconds=60)
+    assert cache.get_or_create(1, "a") is not cache.get_or_create(2, "a")
+
+def test_dropped_session_starts_over():
+    cache = SessionCache(max_sessions=10, ttl_seconds=60)
+    session = cache.get_or_create(1, "a")
+    cache.drop(1, "a")
+    assert cache.get_or_create(1, "a") is not session
+
+def test_only_new_chunks_are_added_in_order():
+    session = ConversationSession("a", 1)
+    assert session.add_chunks([chunk("c1"), chunk("c2")]) == [chunk("c1"), chunk("c2")]
+    assert session.add_chunks([chunk("c2"), chunk("c3")]) == [chunk("c3")]
+    assert list(session.chunks) == ["c1", "c2", "c3"]
+
+def test_evicting_chunks_resets_the_ollama_context(monkeypatch):
+    monkeypatch.setattr(settings, "SESSION_MAX_CHUNKS", 2)
+    session = ConversationSession("a", 1)
+    session.add_chunks([chunk("c1"), chunk("c2")])
+    session.ollama_context = [1, 2, 3]
+    session.add_chunks([chunk("c3")])
+    assert list(session.chunks) == ["c2", "c3"]
+    assert session.ollama_context is None
+
+def test_dropping_deleted_documents_resets_the_ollama_context():
+    session = ConversationSession("a", 1)
+    session.add_chunks([chunk("c1", document_id=1), chunk("c2", document_id=2)])
+    session.ollama_context = [1, 2, 3]
+    session.drop_documents({3})
+    assert session.ollama_context == [1, 2, 3]
+    session.drop_documents({1})
+    assert list(session.chunks) == ["c2"]
+    assert session.ollama_context is None
+
+def test_only_recent_turns_are_kept(monkeypatch):
+    monkeypatch.setattr(settings, "SESSION_MAX_TURNS", 2)
+    session = ConversationSession("a", 1)
+    for i in range(3):
+        session.add_turn(f"question {i}", f"answer {i}")
+    assert session.turns == [("question 1", "answer 1"), ("question 2", "answer 2")]
+
+class FakeOllama:
+    last_context = None
+
+@pytest.fixture
+def stub_pipeline(monkeypatch):
+    """Stub retrieval and generation; returns the retrieval filters and generation calls."""
+    retrievals, generations = [], []
+    results = iter([[chunk("c1"), chunk("c2")], [chunk("c3")]])
+
+    def retrieve_chunks(db, text, n_results, filter_dict=None, **scope):
+        retrievals.append(filter_dict)
+        return next(results)
+
+    def generate_answer(llm, prompt, inputs, priority="interactive", **llm_kwargs):
+        generations.append((inputs, llm_kwargs))
+        llm.last_context = [len(generations)]
+        return f"answer {len(generations)}"
+
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "ollama")
+    monkeypatch.setattr(query_engine, "get_llm", FakeOllama)
+    monkeypatch.setattr(query_engine, "retrieve_chunks", retrieve_chunks)
+    monkeypatch.setattr(query_engine, "generate_answer", generate_answer)
+    monkeypatch.setattr(query_engine, "attach_chunk_texts", lambda db, chunks: chunks)
+    monkeypatch.setattr(query_engine, "rerank_chunks", lambda text, chunks, top_n: chunks[:top_n])
+    monkeypatch.setattr(query_engine, "get_deleted_document_ids", lambda db: set())
+    monkeypatch.setattr(query_engine, "save_query_to_db", lambda *args, **kwargs: [])
+    return retrievals, generations
+
+def test_follow_up_reuses_the_ollama_context(stub_pipeline):
+    retrievals, generations = stub_pipeline
+    session = ConversationSession("a", 1)
+
+    query_engine.process_session_query("First question?", 1, None, session)
+    first_inputs, first_kwargs = generations[0]
+    assert first_kwargs == {}
+    assert "text of c1" in first_inputs["context"] and "text of c2" in first_inputs["context"]
+
+    result = query_engine.process_session_query("And then?", 1, None, session)
+    assert result["answer"] == "answer 2"
+    # Chunks already in the session are excluded from retrieval
+    assert retrievals[1] == {"chunk_id": {"$nin": ["c1", "c2"]}}
+    # Only the new chunk is sent, continuing the previous generation's context
+    followup_inputs, followup_kwargs = generations[1]
+    assert followup_kwargs == {"context": [1]}
+    assert "text of c3" in followup_inputs["context"]
+    assert "text of c1" not in followup_inputs["context"]
+    assert session.ollama_context == [2]
+    assert session.turns == [("First question?", "answer 1"), ("And then?", "answer 2")]
+
+def test_follow_up_resends_everything_without_an_ollama_context(stub_pipeline, monkeypatch):
+    retrievals, generations = stub_pipeline
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "fake")
+    session = ConversationSession("a", 1)
+
+    query_engine.process_session_query("First question?", 1, None, session)
+    query_engine.process_session_query("And then?", 1, None, session)
+    followup_inputs, followup_kwargs = generations[1]
+    assert followup_kwargs == {}
+    # Earlier chunks keep their place ahead of the new one, so the prompt prefix is stable
+    context = followup_inputs["context"]
+    assert context.index("text of c1") < context.index("text of c2") < context.index("text of c3")
+    assert "First question?" in followup_inputs["history"]
+
+def test_session_new_to_this_worker_restores_recent_turns(user_id, monkeypatch):
+    from app.db.models import Query
+    from app.db.session import SessionLocal
+
+    monkeypatch.setattr(settings, "SESSION_MAX_TURNS", 2)
+    db = SessionLocal()
+    try:
+        db.add_all([
+            Query(query_text=f"question {i}", response=f"answer {i}", user_id=user_id, session_id="a")
+            for i in range(3)
+        ])
+        db.add(Query(query_text="elsewhere", response="answer", user_id=user_id, session_id="b"))
+        db.commit()
+
+        session = ConversationSession("a", user_id)
+        query_engine.load_session_history(db, session)
+        assert session.turns == [("question 1", "answer 1"), ("question 2", "answer 2")]
+        assert session.history_loaded
+    finally:
+        db.close()
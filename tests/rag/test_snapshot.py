@@ -0,0 +1,176 @@
+"""
+Tests for exporting and importing vector index snapshots.
+
+The tests share one database and vector store, so a snapshot holds every
+completed document of the suite; each test checks its own documents, and a
+"new node" is simulated by removing their vectors or rows before importing.
+
+Run with: python -m pytest tests/rag
+"""
+import json
+import tarfile
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app.db.models import Document, DocumentChunk, User
+from app.db.session import SessionLocal
+from app.rag import snapshot
+from app.rag.snapshot import export_snapshot, import_snapshot
+from app.rag.vector_store import delete_document_from_vector_store, get_chunk_vectors
+
+from conftest import ingest_text
+
+TEXT = "\n\n".join(f"Paragraph {i} about snapshots, bootstrapping and nodes." for i in range(80))
+
+def chunk_rows(document_id: int) -> list:
+    """The (chunk_id, content) of a document's chunks, in order."""
+    db = SessionLocal()
+    try:
+        return [
+            (row.chunk_id, row.content) for row in
+            db.query(DocumentChunk.chunk_id, DocumentChunk.content)
+            .filter(DocumentChunk.document_id == document_id)
+            .order_by(DocumentChunk.id)
+        ]
+    finally:
+        db.close()
+
+def chunk_ids(document_id: int) -> list:
+    return [chunk_id for chunk_id, _ in chunk_rows(document_id)]
+
+def vectors(ids: list) -> dict:
+    return {chunk_id: np.asarray(embedding) for chunk_id, (embedding, _) in get_chunk_vectors(ids).items()}
+
+def forget_vectors(*document_ids: int) -> None:
+    for document_id in document_ids:
+        delete_document_from_vector_store(document_id)
+
+@pytest.fixture
+def documents(user_id) -> list:
+    return [ingest_text(user_id, TEXT, f"snapshot{i}.txt") for i in range(2)]
+
+@pytest.fixture
+def archive(documents, tmp_path) -> str:
+    path = str(tmp_path / "snapshot.tar")
+    export_snapshot(path, batch_size=2)
+    return path
+
+def test_snapshot_holds_every_completed_document(documents, archive, tmp_path):
+    with tarfile.open(archive) as tar:
+        manifest = json.load(tar.extractfile("manifest.json"))
+        exported = [json.loads(line)["id"] for line in tar.extractfile("documents.jsonl")]
+        chunks = [json.loads(line) for line in tar.extractfile("chunks.jsonl")]
+        size = tar.getmember("vectors.f32").size
+    assert set(documents) <= set(exported)
+    assert manifest["documents"] == len(exported)
+    assert manifest["chunks"] == len(chunks)
+    assert size == manifest["chunks"] * manifest["dimensions"] * 4
+    assert [chunk["chunk_id"] for chunk in chunks if chunk["document_id"] == documents[0]] == chunk_ids(documents[0])
+    # No temporary files are left next to the snapshot
+    assert [path.name for path in tmp_path.iterdir()] == ["snapshot.tar"]
+
+def test_import_restores_vectors_of_existing_documents(documents, archive):
+    ids = chunk_ids(documents[0]) + chunk_ids(documents[1])
+    before = vectors(ids)
+    forget_vectors(*documents)
+    assert vectors(ids) == {}
+
+    counts = import_snapshot(archive, batch_size=2)
+    after = vectors(ids)
+    assert after.keys() == before.keys()
+    assert all(np.allclose(after[chunk_id], before[chunk_id]) for chunk_id in ids)
+    assert counts["inserted_documents"] == 0
+    assert counts["skipped_documents"] == counts["skipped_chunks"] == 0
+
+    # Importing again is harmless
+    assert import_snapshot(archive)["chunks"] == counts["chunks"]
+    assert vectors(ids).keys() == before.keys()
+
+def test_import_inserts_missing_documents_with_their_chunks(documents, archive):
+    document_id = documents[0]
+    rows = chunk_rows(document_id)
+    db = SessionLocal()
+    try:
+        db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).delete()
+        db.query(Document).filter(Document.id == document_id).delete()
+        db.commit()
+    finally:
+        db.close()
+    forget_vectors(document_id)
+
+    counts = import_snapshot(archive)
+    assert counts["inserted_documents"] == 1
+    db = SessionLocal()
+    try:
+        document = db.get(Document, document_id)
+        assert document.filename == "snapshot0.txt"
+        assert document.processing_status == "completed"
+    finally:
+        db.close()
+    assert chunk_rows(document_id) == rows
+    assert vectors(chunk_ids(document_id)).keys() == {chunk_id for chunk_id, _ in rows}
+
+def test_documents_without_an_owner_are_skipped(documents, archive, user_id):
+    document_id = documents[0]
+    db = SessionLocal()
+    try:
+        db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).delete()
+        db.query(Document).filter(Document.id == document_id).delete()
+        db.commit()
+        # Another user's data, so the snapshot's owner no longer exists
+        db.query(Document).filter(Document.owner_id == user_id).update({"owner_id": None})
+        db.query(User).filter(User.id == user_id).delete()
+        db.commit()
+    finally:
+        db.close()
+    forget_vectors(document_id)
+
+    counts = import_snapshot(archive)
+    assert counts["skipped_documents"] == 1
+    assert counts["inserted_documents"] == 0
+    db = SessionLocal()
+    try:
+        assert db.get(Document, document_id) is None
+    finally:
+        db.close()
+
+def test_documents_deleted_locally_are_not_resurrected(documents, archive):
+    deleted, kept = documents
+    db = SessionLocal()
+    try:
+        db.query(Document).filter(Document.id == deleted).update({"deleted_at": datetime.now(timezone.utc)})
+        db.commit()
+    finally:
+        db.close()
+    forget_vectors(*documents)
+
+    counts = import_snapshot(archive)
+    assert counts["skipped_documents"] == 1
+    assert counts["skipped_chunks"] == len(chunk_ids(deleted))
+    assert vectors(chunk_ids(deleted)) == {}
+    assert vectors(chunk_ids(kept)).keys() == set(chunk_ids(kept))
+
+def test_only_chunks_this_node_has_get_vectors(documents, archive):
+    document_id = documents[0]
+    ids = chunk_ids(document_id)
+    assert len(ids) > 2
+    removed, remaining = ids[:2], ids[2:]
+    db = SessionLocal()
+    try:
+        db.query(DocumentChunk).filter(DocumentChunk.chunk_id.in_(removed)).delete()
+        db.commit()
+    finally:
+        db.close()
+    forget_vectors(document_id)
+
+    counts = import_snapshot(archive)
+    assert counts["skipped_chunks"] == len(removed)
+    assert counts["skipped_documents"] == 0
+    assert vectors(ids).keys() == set(remaining)
+
+def test_snapshot_from_another_embedding_model_is_refused(archive, monkeypatch):
+    monkeypatch.setattr(snapshot, "embedding_signature", lambda index: {"provider": "other", "model": "other"})
+    with pytest.raises(ValueError):
+        import_snapshot(archive)